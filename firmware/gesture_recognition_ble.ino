@@ -57,6 +57,31 @@ Adafruit_SSD1306 display(SCREEN_WIDTH, SCREEN_HEIGHT, &Wire, OLED_RESET);
 #define WINDOW_SIZE 50
 #define CONFIDENCE_THRESHOLD 0.75
 
+// ===== CHANNEL MASK =====
+// Bit r of entry c: read sensor row r while the mux selects column c.
+// Paste channel_mask.h from train_gesture_model.py --select_channels here
+// to skip sensors the model does not use (their values stay 0).
+const uint8_t SENSOR_ROW_MASK[NUM_COLS] = {
+  0xF, 0xF, 0xF, 0xF, 0xF, 0xF, 0xF, 0xF, 0xF, 0xF, 0xF, 0xF, 0xF, 0xF, 0xF
+};
+
+// ===== GESTURE FRAME FORMAT =====
+// 1 = compact binary frame (see integration/gesture_protocol.py),
+// 0 = legacy JSON. The receiver auto-detects either.
+#define USE_BINARY_GESTURE_FRAME 1
+#define GESTURE_FRAME_VERSION 1
+#define GESTURE_FRAME_FLAG_IMU 0x01
+#define GESTURE_FRAME_SIZE 12
+
+// ===== RAW FRAME STREAMING =====
+// One 112-byte frame per sample on SENSOR_CHAR_UUID when the host sends
+// {"action": "raw_stream", "enabled": true}. Layout: integration/gesture_protocol.py
+#define RAW_FRAME_VERSION 1
+#define RAW_FRAME_SIZE 112
+#define RAW_ADC_OFFSET 10
+#define RAW_IMU_OFFSET 100
+#define RAW_NOTIFY_CHUNK 20  // ATT payload at the default MTU; raise after MTU exchange
+
 // ===== GLOBAL VARIABLES =====
 BLEServer* pServer = NULL;
 BLECharacteristic* pGestureCharacteristic = NULL;
@@ -72,6 +97,8 @@ float gyro_x, gyro_y, gyro_z;
 String currentGesture = "idle";
 float gestureConfidence = 0.0;
 unsigned long lastGestureTime = 0;
+bool rawStreamEnabled = false;
+uint16_t rawFrameSequence = 0;
 int gestureBuffer[WINDOW_SIZE][TOTAL_SENSORS + 6];  // Sensor + IMU data
 int bufferIndex = 0;
 
@@ -167,6 +194,10 @@ void loop() {
     readIMU();
     updateBuffer();
     
+    if (rawStreamEnabled) {
+      sendRawFrame();
+    }
+    
     // Perform gesture recognition every window
     if (bufferIndex >= WINDOW_SIZE) {
       String detectedGesture = recognizeGesture();
@@ -293,14 +324,20 @@ void initializeBLE() {
 // ===== SENSOR READING =====
 
 void readAllSensors() {
+  static const uint8_t ROW_PINS[NUM_ROWS] = {ROW_0, ROW_1, ROW_2, ROW_3};
+  
   for (int col = 0; col < NUM_COLS; col++) {
+    uint8_t rows = SENSOR_ROW_MASK[col];
+    if (rows == 0) continue;  // No mux switch or settle time for unused columns
+    
     selectMuxChannel(col);
     delayMicroseconds(10);
     
-    sensorMatrix[0][col] = analogRead(ROW_0);
-    sensorMatrix[1][col] = analogRead(ROW_1);
-    sensorMatrix[2][col] = analogRead(ROW_2);
-    sensorMatrix[3][col] = analogRead(ROW_3);
+    for (int row = 0; row < NUM_ROWS; row++) {
+      if (rows & (1 << row)) {
+        sensorMatrix[row][col] = analogRead(ROW_PINS[row]);
+      }
+    }
   }
 }
 
@@ -423,9 +460,44 @@ float calculatePitch() {
 
 // ===== BLE COMMUNICATION =====
 
+int gestureId(const String& gesture) {
+  for (int i = 0; i < NUM_GESTURES; i++) {
+    if (gesture == GESTURE_LABELS[i]) return i;
+  }
+  return 0;  // idle
+}
+
+void writeLE16(uint8_t* out, int16_t value) {
+  out[0] = value & 0xFF;
+  out[1] = (value >> 8) & 0xFF;
+}
+
+void writeLE32(uint8_t* out, uint32_t value) {
+  for (int i = 0; i < 4; i++) {
+    out[i] = (value >> (8 * i)) & 0xFF;
+  }
+}
+
 void sendGesture(String gesture, float confidence) {
   if (!deviceConnected) return;
   
+#if USE_BINARY_GESTURE_FRAME
+  // Fixed 12-byte frame: version, flags, gesture id, confidence (0-255),
+  // millis(), pitch and roll in centidegrees - all little-endian
+  uint8_t frame[GESTURE_FRAME_SIZE];
+  frame[0] = GESTURE_FRAME_VERSION;
+  frame[1] = GESTURE_FRAME_FLAG_IMU;
+  frame[2] = gestureId(gesture);
+  frame[3] = (uint8_t)constrain((int)(confidence * 255.0 + 0.5), 0, 255);
+  writeLE32(&frame[4], millis());
+  writeLE16(&frame[8], (int16_t)(calculatePitch() * 100.0));
+  writeLE16(&frame[10], (int16_t)(calculateRoll() * 100.0));
+  
+  pGestureCharacteristic->setValue(frame, GESTURE_FRAME_SIZE);
+  pGestureCharacteristic->notify();
+  
+  Serial.println("Sent: " + gesture + " (binary)");
+#else
   // Create JSON payload
   StaticJsonDocument<256> doc;
   doc["gesture"] = gesture;
@@ -443,6 +515,51 @@ void sendGesture(String gesture, float confidence) {
   pGestureCharacteristic->notify();
   
   Serial.println("Sent: " + jsonString);
+#endif
+}
+
+void sendRawFrame() {
+  if (!deviceConnected) return;
+  
+  uint8_t frame[RAW_FRAME_SIZE];
+  frame[0] = 0xA5;
+  frame[1] = 0x5A;
+  frame[2] = RAW_FRAME_VERSION;
+  frame[4] = rawFrameSequence & 0xFF;
+  frame[5] = (rawFrameSequence >> 8) & 0xFF;
+  writeLE32(&frame[6], millis());
+  rawFrameSequence++;
+  
+  // Pack consecutive pairs of the row-major 60-value vector, two 12-bit
+  // readings per three bytes (a pair can span two rows, NUM_COLS is odd)
+  int i = 0;
+  uint8_t* adc = &frame[RAW_ADC_OFFSET];
+  for (int s = 0; s < TOTAL_SENSORS; s += 2) {
+    uint16_t a = sensorMatrix[s / NUM_COLS][s % NUM_COLS] & 0x0FFF;
+    uint16_t b = sensorMatrix[(s + 1) / NUM_COLS][(s + 1) % NUM_COLS] & 0x0FFF;
+    adc[i++] = a & 0xFF;
+    adc[i++] = (a >> 8) | ((b & 0x0F) << 4);
+    adc[i++] = b >> 4;
+  }
+  
+  writeLE16(&frame[RAW_IMU_OFFSET + 0], (int16_t)(accel_x * 1000.0));
+  writeLE16(&frame[RAW_IMU_OFFSET + 2], (int16_t)(accel_y * 1000.0));
+  writeLE16(&frame[RAW_IMU_OFFSET + 4], (int16_t)(accel_z * 1000.0));
+  writeLE16(&frame[RAW_IMU_OFFSET + 6], (int16_t)(gyro_x * 10.0));
+  writeLE16(&frame[RAW_IMU_OFFSET + 8], (int16_t)(gyro_y * 10.0));
+  writeLE16(&frame[RAW_IMU_OFFSET + 10], (int16_t)(gyro_z * 10.0));
+  
+  uint8_t checksum = 0;
+  for (int j = 4; j < RAW_FRAME_SIZE; j++) {
+    checksum += frame[j];
+  }
+  frame[3] = checksum;
+  
+  for (int offset = 0; offset < RAW_FRAME_SIZE; offset += RAW_NOTIFY_CHUNK) {
+    int len = min(RAW_NOTIFY_CHUNK, RAW_FRAME_SIZE - offset);
+    pSensorCharacteristic->setValue(&frame[offset], len);
+    pSensorCharacteristic->notify();
+  }
 }
 
 float calculateRoll() {
@@ -464,6 +581,9 @@ void handleCommand(const char* action, JsonDocument& doc) {
   } else if (strcmp(action, "feedback") == 0) {
     int duration = doc["duration"] | 100;
     hapticFeedback(duration, 1);
+  } else if (strcmp(action, "raw_stream") == 0) {
+    rawStreamEnabled = doc["enabled"] | false;
+    rawFrameSequence = 0;
   }
 }
 
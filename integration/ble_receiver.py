@@ -11,22 +11,40 @@ Requirements:
 Usage:
     python ble_receiver.py --device "OpenMuscle-FlexGrid"
 
+    # Stream raw sensor frames and run a trained model on this host
+    python ble_receiver.py --raw --model_dir ../ml_training/output --model_type random_forest
+
 Author: OpenMuscle Community
 License: MIT
 """
 
 import asyncio
+import contextlib
+import copy
 import json
+import os
+import random
+import re
+import socket
 import sys
+import threading
+import time
 import argparse
+from collections import deque
 from datetime import datetime
 from bleak import BleakClient, BleakScanner
 import aiohttp
 
+from event_log import DEFAULT_FLUSH_INTERVAL, WriterStream, open_writers
+from gesture_protocol import GESTURE_IDS, GESTURE_LABELS, RawFrameAssembler, decode_gesture
+
 # BLE UUIDs (must match firmware)
 SERVICE_UUID = "4fafc201-1fb5-459e-8fcc-c5c9c331914b"
 GESTURE_CHAR_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"
 COMMAND_CHAR_UUID = "ca73b3ba-39f6-4ab3-91ae-186dc9577d99"
+SENSOR_CHAR_UUID = "d1e2f3a4-5b6c-7d8e-9f0a-1b2c3d4e5f6a"
+
+ML_TRAINING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ml_training")
 
 # Configuration
 CONFIG = {
@@ -37,315 +55,1366 @@ CONFIG = {
     "uber_api_key": "your-uber-api-key-here",
     "home_assistant_url": "http://homeassistant.local:8123",
     "home_assistant_token": "your-ha-token-here",
+    "phone_webhook_url": "http://192.168.1.50:8765/unlock",
+    "gesture_recognition": {
+        "confidence_threshold": 0.75,
+        "debounce_time_seconds": 1.0,
+        "enabled_gestures": None,  # None = every mapped gesture
+    },
+    "gesture_actions": {
+        "point_up": {"action": "light", "target": "ceiling_light", "state": "on"},
+        "point_down": {"action": "light", "target": "ceiling_light", "state": "off"},
+        "point_left": {"action": "direction", "direction": "left"},
+        "point_right": {"action": "direction", "direction": "right"},
+        "fist_close": {"action": "uber"},
+        "swipe_left": {"action": "media", "command": "previous"},
+        "swipe_right": {"action": "media", "command": "next"},
+        "twist_cw": {"action": "unlock_door", "target": "front_door"},
+        "pinch": {"action": "unlock_phone"},
+    },
+    "device": {
+        "name": "OpenMuscle-FlexGrid",
+        "bluetooth_address": None,
+        "startup_attempts": 3,
+        "reconnect_attempts": 5,
+        "reconnect_delay_seconds": 2.0,
+        "reconnect_max_delay_seconds": 30.0,
+        "scan_timeout_seconds": 10.0,
+        "connect_timeout_seconds": 10.0,
+    },
+    "http": {
+        "limit_per_host": 4,
+        "keepalive_timeout_seconds": 60,
+        "dns_cache_ttl_seconds": 300,
+        "timeouts_seconds": {
+            "default": 5.0,
+            "unlock_phone": 2.0,
+            "call_uber": 10.0,
+        },
+    },
+    "event_queue": {
+        "max_size": 32,
+        "workers": 2,
+        "overflow": "coalesce",
+    },
+    "raw_stream": {
+        "model_dir": os.path.join(ML_TRAINING_DIR, "output"),
+        "model_type": "random_forest",
+        "stride": 1,
+        "confidence_threshold": 0.75,
+    },
+    "logging": {
+        "file": None,  # None = console only
+        "console": True,
+        "save_gestures": False,
+        "gestures_file": "logs/gesture_history.jsonl",
+        "batch_size": 256,
+        "flush_interval_seconds": DEFAULT_FLUSH_INTERVAL,
+        "max_bytes": 10 * 1024 * 1024,
+        "backup_count": 3,
+    },
+}
+
+
+# Device toggled by the "direction" action for each pointing direction
+DIRECTION_DEVICES = {
+    "left": "lamp_1",
+    "right": "lamp_2",
+    "up": "ceiling_fan",
+    "down": "floor_lamp"
+}
+
+MEDIA_SERVICES = {
+    "play": "media_player.media_play",
+    "pause": "media_player.media_pause",
+    "next": "media_player.media_next_track",
+    "previous": "media_player.media_previous_track"
 }
 
 
+def is_ble_address(value):
+    """
+    True for a MAC address (Linux/Windows) or CoreBluetooth UUID (macOS)
+    """
+    return bool(re.fullmatch(r"([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}", value)
+                or re.fullmatch(r"[0-9A-Fa-f]{8}(-[0-9A-Fa-f]{4}){3}-[0-9A-Fa-f]{12}", value))
+
+
+class DispatchTable:
+    """
+    Gesture-to-action table compiled from config
+    
+    actions is indexed by gesture id (see gesture_protocol.GESTURE_LABELS);
+    each entry is (action name, async callable taking the gesture dict) or
+    None when the gesture is unmapped or disabled. Entity IDs, URLs and
+    headers are bound into the callables when the table is compiled, so
+    handling an event is one lookup plus the threshold and debounce checks.
+    """
+    
+    def __init__(self, actions, confidence_threshold=0.0, debounce_seconds=1.0):
+        self.actions = actions
+        self.confidence_threshold = confidence_threshold
+        self.debounce_seconds = debounce_seconds
+    
+    def lookup(self, gesture_id):
+        if gesture_id is None or gesture_id >= len(self.actions):
+            return None
+        return self.actions[gesture_id]
+
+
+class MQTTPublisher:
+    """
+    One persistent MQTT broker connection shared by every MQTT action
+    
+    paho's network thread owns the socket: keepalive pings, QoS 1/2
+    handshakes and reconnecting with backoff. publish() only hands a message
+    to it and returns, so acknowledgements are pipelined instead of awaited
+    per gesture. While the broker is unreachable, publishes wait in a
+    bounded buffer (oldest dropped first) and go out on reconnect.
+    """
+    
+    def __init__(self, broker, port=1883, username=None, password=None, client_id="",
+                 keepalive=60, max_offline=100, max_inflight=20,
+                 reconnect_min_delay=1, reconnect_max_delay=30):
+        self.broker = broker
+        self.port = port
+        self.username = username
+        self.password = password
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self.max_inflight = max_inflight
+        self.reconnect_delays = (reconnect_min_delay, reconnect_max_delay)
+        self.client = None
+        self.connected = False
+        # Reentrant: paho may run on_publish inside client.publish() itself
+        self.lock = threading.RLock()
+        self.offline = deque(maxlen=max_offline)
+        self.sent_at = {}  # message id -> send time, until the broker acknowledges it
+        self.ack_times = deque(maxlen=1000)
+        self.published = 0
+        self.acked = 0
+        self.dropped = 0
+        self.connections = 0
+        self.disconnects = 0
+        
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(**settings)
+    
+    def start(self):
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError:
+            raise RuntimeError("MQTT actions need paho-mqtt: pip install paho-mqtt")
+        
+        if hasattr(mqtt, "CallbackAPIVersion"):  # paho-mqtt 2.x
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id)
+        else:
+            client = mqtt.Client(client_id=self.client_id)
+        if self.username:
+            client.username_pw_set(self.username, self.password)
+        client.max_inflight_messages_set(self.max_inflight)
+        client.reconnect_delay_set(*self.reconnect_delays)
+        client.on_connect = self.on_connect
+        client.on_disconnect = self.on_disconnect
+        client.on_publish = self.on_publish
+        
+        # Non-blocking: the network thread connects, and keeps reconnecting
+        client.connect_async(self.broker, self.port, self.keepalive)
+        client.loop_start()
+        self.client = client
+        return self
+    
+    def stop(self):
+        if self.client is not None:
+            self.client.disconnect()
+            self.client.loop_stop()
+            self.client = None
+        self.connected = False
+    
+    # Callbacks run on paho's network thread; the extra arguments differ
+    # between the paho 1.x and 2.x callback APIs.
+    
+    def on_connect(self, client, userdata, flags, reason_code, *args):
+        if reason_code != 0:
+            print(f"✗ MQTT broker {self.broker}:{self.port} refused connection: {reason_code}")
+            return
+        # Without this, Nagle holds each small PUBLISH until the broker's
+        # TCP ACK for the previous one, which it delays until its PUBACK
+        with contextlib.suppress(AttributeError, OSError):
+            client.socket().setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.lock:
+            self.connected = True
+            self.connections += 1
+            backlog = list(self.offline)
+            self.offline.clear()
+            for message in backlog:
+                self.send(*message)
+        print(f"✓ MQTT connected to {self.broker}:{self.port}"
+              + (f" ({len(backlog)} queued messages sent)" if backlog else ""))
+    
+    def on_disconnect(self, client, userdata, *args):
+        with self.lock:
+            was_connected = self.connected
+            self.connected = False
+            if was_connected and self.client is not None:
+                self.disconnects += 1
+        if was_connected and self.client is not None:
+            print(f"⚠ MQTT connection to {self.broker}:{self.port} lost, reconnecting...")
+    
+    def on_publish(self, client, userdata, mid, *args):
+        # send() records sent_at under the lock after publish() returns, so
+        # taking it here means even a fast PUBACK finds its entry
+        with self.lock:
+            sent = self.sent_at.pop(mid, None)
+            if sent is not None:
+                self.acked += 1
+                self.ack_times.append(time.perf_counter() - sent)
+    
+    # ===== PUBLISHING =====
+    
+    def send(self, topic, payload, qos, retain):
+        """
+        Hand one message to the network thread (caller holds self.lock)
+        """
+        info = self.client.publish(topic, payload, qos=qos, retain=retain)
+        if info.rc != 0 and qos == 0:
+            # Link dropped before on_disconnect ran; paho keeps QoS 1/2
+            # messages for resending itself, QoS 0 would be lost
+            self.queue_offline(topic, payload, qos, retain)
+            return False
+        if qos:
+            self.sent_at[info.mid] = time.perf_counter()
+        self.published += 1
+        return True
+    
+    def queue_offline(self, topic, payload, qos, retain):
+        if len(self.offline) == self.offline.maxlen:
+            self.dropped += 1
+        self.offline.append((topic, payload, qos, retain))
+    
+    def publish(self, topic, payload, qos=0, retain=False):
+        """
+        Publish without waiting on the broker; returns "sent" or "queued"
+        """
+        with self.lock:
+            if self.connected and self.send(topic, payload, qos, retain):
+                return "sent"
+            if not self.connected:
+                self.queue_offline(topic, payload, qos, retain)
+            return "queued"
+    
+    def snapshot(self):
+        return {
+            "connected": self.connected,
+            "published": self.published,
+            "acked": self.acked,
+            "queued": len(self.offline),
+            "dropped": self.dropped,
+            "connections": self.connections,
+            "disconnects": self.disconnects,
+        }
+
+
 class GestureActionController:
     """
     Maps gestures to actions and executes them
+    
+    The mapping lives in config["gesture_actions"] and is compiled into a
+    DispatchTable; reload() swaps in a new table without touching events
+    already being handled.
     """
     
     def __init__(self, config):
         self.config = config
-        self.last_gesture = None
-        self.last_gesture_time = None
-        self.gesture_cooldown = 1.0  # seconds
+        self.last_gestures = {}  # device id -> (gesture, time), for per-device debounce
+        self.session = None
+        self.mqtt = None  # MQTTPublisher, connected on first use
+        self.table = self.compile(config)
+        self.history = None  # BatchedWriter for the gesture history JSONL, if enabled
+        self.stats = {"actions": 0, "failed": 0, "unmapped": 0, "below_threshold": 0, "debounced": 0}
+        
+    # ===== HTTP SESSION =====
+    
+    async def start(self):
+        """
+        Open the shared HTTP session (and MQTT connection, if configured)
+        so the first gesture doesn't pay for it
+        """
+        await self.get_session()
+        mqtt = resolve_backends(self.config)["mqtt"]
+        if mqtt:
+            self.get_mqtt(mqtt["connection"])
+    
+    async def get_session(self):
+        """
+        Return the controller's long-lived HTTP session, creating it on first use
+        
+        All actions share one connection pool, so repeat requests to the same
+        host reuse a kept-alive socket instead of a fresh TCP (and TLS) handshake.
+        """
+        if self.session is None or self.session.closed:
+            http = self.config.get("http", {})
+            connector = aiohttp.TCPConnector(
+                limit_per_host=http.get("limit_per_host", 4),
+                keepalive_timeout=http.get("keepalive_timeout_seconds", 60),
+                use_dns_cache=True,
+                ttl_dns_cache=http.get("dns_cache_ttl_seconds", 300),
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+    
+    def action_timeout(self, action):
+        """
+        Per-action request timeout from config["http"]["timeouts_seconds"]
+        """
+        timeouts = self.config.get("http", {}).get("timeouts_seconds", {})
+        return aiohttp.ClientTimeout(total=timeouts.get(action, timeouts.get("default", 5.0)))
+    
+    async def close(self):
+        """
+        Close the shared HTTP session and its pooled connections
+        """
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        if self.mqtt is not None:
+            self.mqtt.stop()
+            self.mqtt = None
+    
+    # ===== MQTT CONNECTION =====
+    
+    def get_mqtt(self, connection):
+        """
+        Return the shared MQTTPublisher, reconnecting if a reload changed the broker
+        """
+        if self.mqtt is None or self.mqtt_connection != connection:
+            if self.mqtt is not None:
+                self.mqtt.stop()
+            self.mqtt = MQTTPublisher.from_settings(connection).start()
+            self.mqtt_connection = connection
+        return self.mqtt
+    
+    # ===== DISPATCH TABLE =====
+    
+    def reload(self, config):
+        """
+        Compile config and swap the table in; in-flight events keep the old one
+        """
+        previous = self.config
+        self.config = config  # compile() binds timeouts from self.config
+        try:
+            table = self.compile(config)
+        except Exception:
+            self.config = previous
+            raise
+        self.table = table
+        return table
+    
+    def compile(self, config):
+        """
+        Build a DispatchTable from config["gesture_actions"]
+        
+        Raises ValueError for unknown gestures or action types, so a bad
+        hot-reloaded config never replaces a working table.
+        """
+        recognition = config.get("gesture_recognition", {})
+        enabled = recognition.get("enabled_gestures")
+        enabled = set(enabled) if enabled is not None else None
+        backends = resolve_backends(config)
         
-    async def handle_gesture(self, gesture_data):
+        actions = [None] * len(GESTURE_LABELS)
+        for gesture, spec in config.get("gesture_actions", {}).items():
+            if gesture not in GESTURE_IDS:
+                raise ValueError(f"Unknown gesture '{gesture}' in gesture_actions")
+            if enabled is not None and gesture not in enabled:
+                continue
+            kind = spec.get("action")
+            binder = getattr(self, f"bind_{kind}", None)
+            if binder is None:
+                raise ValueError(f"Unknown action '{kind}' for gesture '{gesture}'")
+            actions[GESTURE_IDS[gesture]] = (kind, binder(spec, backends))
+        
+        return DispatchTable(actions,
+                             confidence_threshold=recognition.get("confidence_threshold", 0.0),
+                             debounce_seconds=recognition.get("debounce_time_seconds", 1.0))
+    
+    async def handle_gesture(self, gesture_data, device_id=None):
         """
         Main gesture handler - routes to appropriate action
+        
+        Debounce state is kept per device_id, so two wristbands making the
+        same gesture each trigger it.
         """
+        table = self.table
         gesture = gesture_data.get("gesture")
+        gesture_id = gesture_data.get("gesture_id", GESTURE_IDS.get(gesture))
         confidence = gesture_data.get("confidence", 0)
-        timestamp = gesture_data.get("timestamp", 0)
-        imu = gesture_data.get("imu", {})
         
-        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Gesture: {gesture} ({confidence*100:.1f}%)")
+        source = f" [{device_id}]" if device_id is not None else ""
+        print(f"\n[{datetime.now().strftime('%H:%M:%S')}]{source} Gesture: {gesture} ({confidence*100:.1f}%)")
+        
+        entry = table.lookup(gesture_id)
+        if entry is None:
+            self.stats["unmapped"] += 1
+            print(f"  → No action mapped for '{gesture}'")
+            self.record(gesture_data, device_id, "unmapped")
+            return
+        if confidence < table.confidence_threshold:
+            self.stats["below_threshold"] += 1
+            print(f"  → Ignored: below confidence threshold ({table.confidence_threshold*100:.0f}%)")
+            self.record(gesture_data, device_id, "below_threshold")
+            return
         
         # Debounce - avoid triggering same gesture multiple times
-        if gesture == self.last_gesture:
-            if self.last_gesture_time and (datetime.now().timestamp() - self.last_gesture_time < self.gesture_cooldown):
-                return
+        now = time.monotonic()
+        last = self.last_gestures.get(device_id)
+        if last and last[0] == gesture and now - last[1] < table.debounce_seconds:
+            self.stats["debounced"] += 1
+            self.record(gesture_data, device_id, "debounced")
+            return
         
-        self.last_gesture = gesture
-        self.last_gesture_time = datetime.now().timestamp()
+        self.last_gestures[device_id] = (gesture, now)
         
-        # Route gesture to action
+        self.stats["actions"] += 1
+        failed = self.stats["failed"]
         try:
-            if gesture == "point_up":
-                await self.control_light("ceiling_light", "on", imu)
-            elif gesture == "point_down":
-                await self.control_light("ceiling_light", "off", imu)
-            elif gesture == "point_left":
-                await self.control_device_in_direction("left", imu)
-            elif gesture == "point_right":
-                await self.control_device_in_direction("right", imu)
-            elif gesture == "fist_close":
-                await self.call_uber()
-            elif gesture == "swipe_left":
-                await self.media_control("previous")
-            elif gesture == "swipe_right":
-                await self.media_control("next")
-            elif gesture == "twist_cw":
-                await self.unlock_door()
-            elif gesture == "pinch":
-                await self.unlock_phone()
-            else:
-                print(f"  → No action mapped for '{gesture}'")
-                
+            await entry[1](gesture_data)
         except Exception as e:
+            self.stats["failed"] += 1
             print(f"  ✗ Error executing action: {e}")
+        self.record(gesture_data, device_id, entry[0] if self.stats["failed"] == failed else "failed")
     
-    # ===== ACTION IMPLEMENTATIONS =====
+    def record(self, gesture_data, device_id, outcome):
+        """
+        Append a gesture to the history file (buffered; written off the loop)
+        
+        Lines carry time, gesture, confidence and imu, so a history file can
+        be fed straight back to load_test.py replay --input.
+        """
+        if self.history is None:
+            return
+        self.history.write({
+            "time": time.time(),
+            "device": device_id,
+            "gesture": gesture_data.get("gesture"),
+            "confidence": gesture_data.get("confidence", 0),
+            "imu": gesture_data.get("imu", {}),
+            "outcome": outcome,
+        })
     
-    async def control_light(self, light_id, action, imu):
+    # ===== ACTION BINDINGS =====
+    # Each bind_<action> resolves its config once and returns the coroutine
+    # function the dispatch table calls with the gesture dict.
+    
+    def bind_light(self, spec, backends):
         """
         Control smart light via Philips Hue or Home Assistant
         """
-        print(f"  → Controlling light: {light_id} -> {action}")
-        
-        # Option 1: Philips Hue
-        hue_bridge = self.config.get("philips_hue_bridge")
-        hue_token = self.config.get("philips_hue_token")
-        
-        if hue_bridge and hue_token:
-            url = f"http://{hue_bridge}/api/{hue_token}/lights/1/state"
-            payload = {"on": action == "on"}
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.put(url, json=payload) as response:
-                    if response.status == 200:
-                        print(f"  ✓ Light turned {action}")
-                    else:
-                        print(f"  ✗ Failed to control light: {response.status}")
-        
-        # Option 2: Home Assistant
-        elif self.config.get("home_assistant_url"):
-            await self.call_home_assistant_service(
-                "light.turn_on" if action == "on" else "light.turn_off",
-                {"entity_id": f"light.{light_id}"}
-            )
+        target = spec.get("target", "ceiling_light")
+        state = spec.get("state", "on")
+        hue = backends["hue"]
+        ha = backends["home_assistant"]
         
+        if hue:
+            light = hue["lights"].get(target, 1)
+            request = self.bind_request("PUT", f"http://{hue['bridge']}/api/{hue['token']}/lights/{light}/state",
+                                        {"on": state == "on"}, None, "control_light", 200,
+                                        f"Light turned {state}", "Failed to control light")
+        elif ha:
+            request = self.bind_home_assistant(ha, "light.turn_on" if state == "on" else "light.turn_off",
+                                               ha["entities"].get(target, f"light.{target}"), "control_light")
+        elif backends["mqtt"] and "light_control" in backends["mqtt"]["topics"]:
+            request = self.bind_publish(backends["mqtt"], "light_control", {"target": target, "state": state})
         else:
-            print("  ⚠ No smart light system configured (simulation)")
+            request = self.bind_simulation("No smart light system configured (simulation)")
+        
+        async def control_light(gesture_data):
+            print(f"  → Controlling light: {target} -> {state}")
+            await request()
+        return control_light
     
-    async def control_device_in_direction(self, direction, imu):
+    def bind_direction(self, spec, backends):
         """
         Control device in pointed direction using IMU orientation
         """
-        pitch = imu.get("pitch", 0)
-        roll = imu.get("roll", 0)
-        
-        print(f"  → Controlling device in direction: {direction} (pitch={pitch:.1f}°, roll={roll:.1f}°)")
-        
-        # Determine which device is in that direction
+        direction = spec.get("direction", "left")
         # This would require spatial mapping in a real implementation
-        device_map = {
-            "left": "lamp_1",
-            "right": "lamp_2",
-            "up": "ceiling_fan",
-            "down": "floor_lamp"
-        }
+        device = spec.get("device") or DIRECTION_DEVICES.get(direction)
+        toggle = self.bind_toggle({"target": device}, backends)
         
-        device = device_map.get(direction)
-        if device:
-            await self.toggle_device(device)
+        async def control_device_in_direction(gesture_data):
+            imu = gesture_data.get("imu", {})
+            print(f"  → Controlling device in direction: {direction} "
+                  f"(pitch={imu.get('pitch', 0):.1f}°, roll={imu.get('roll', 0):.1f}°)")
+            await toggle(gesture_data)
+        return control_device_in_direction
     
-    async def toggle_device(self, device_id):
+    def bind_toggle(self, spec, backends):
         """
         Toggle any smart home device
         """
-        print(f"  → Toggling device: {device_id}")
-        
-        if self.config.get("home_assistant_url"):
-            await self.call_home_assistant_service(
-                "homeassistant.toggle",
-                {"entity_id": device_id}
-            )
+        device_id = spec.get("target")
+        ha = backends["home_assistant"]
+        if ha:
+            request = self.bind_home_assistant(ha, "homeassistant.toggle",
+                                               ha["entities"].get(device_id, device_id), "toggle_device")
         else:
-            print(f"  ⚠ Device toggle simulation: {device_id}")
+            request = self.bind_simulation(f"Device toggle simulation: {device_id}")
+        
+        async def toggle_device(gesture_data):
+            print(f"  → Toggling device: {device_id}")
+            await request()
+        return toggle_device
     
-    async def call_uber(self):
+    def bind_uber(self, spec, backends):
         """
         Request an Uber ride via API
         """
-        print("  → Calling Uber...")
-        
-        # Uber Rides API requires OAuth - simplified for demo
-        uber_api_key = self.config.get("uber_api_key")
-        
-        if uber_api_key:
-            # This is a simplified example - real implementation needs OAuth
-            url = "https://api.uber.com/v1.2/requests"
-            headers = {
-                "Authorization": f"Bearer {uber_api_key}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "product_id": "a1111c8c-c720-46c3-8534-2fcdd730040d",
-                "start_latitude": 37.7749,  # Replace with actual location
-                "start_longitude": -122.4194,
-                "end_latitude": 37.7849,
-                "end_longitude": -122.4294
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=headers) as response:
-                    if response.status == 202:
-                        data = await response.json()
-                        print(f"  ✓ Uber requested! ETA: {data.get('eta', 'unknown')} min")
-                    else:
-                        print(f"  ✗ Uber request failed: {response.status}")
-        else:
-            print("  ⚠ Uber API not configured (simulation)")
-            print("  ✓ [DEMO] Uber would be called to current location")
+        uber = backends["uber"]
+        if not uber:
+            async def call_uber(gesture_data):
+                print("  → Calling Uber...")
+                print("  ⚠ Uber API not configured (simulation)")
+                print("  ✓ [DEMO] Uber would be called to current location")
+            return call_uber
+        
+        # This is a simplified example - real implementation needs OAuth
+        url = "https://api.uber.com/v1.2/requests"
+        headers = {
+            "Authorization": f"Bearer {uber['api_key']}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "product_id": "a1111c8c-c720-46c3-8534-2fcdd730040d",
+            "start_latitude": 37.7749,  # Replace with actual location
+            "start_longitude": -122.4194,
+            "end_latitude": uber["destination"]["latitude"],
+            "end_longitude": uber["destination"]["longitude"]
+        }
+        timeout = self.action_timeout("call_uber")
+        
+        async def call_uber(gesture_data):
+            print("  → Calling Uber...")
+            session = await self.get_session()
+            async with session.post(url, json=payload, headers=headers, timeout=timeout) as response:
+                if response.status == 202:
+                    data = await response.json()
+                    print(f"  ✓ Uber requested! ETA: {data.get('eta', 'unknown')} min")
+                else:
+                    print(f"  ✗ Uber request failed: {response.status}")
+        return call_uber
     
-    async def unlock_door(self):
+    def bind_unlock_door(self, spec, backends):
         """
         Unlock smart door lock
         """
-        print("  → Unlocking door...")
-        
-        if self.config.get("home_assistant_url"):
-            await self.call_home_assistant_service(
-                "lock.unlock",
-                {"entity_id": "lock.front_door"}
-            )
+        ha = backends["home_assistant"]
+        if ha:
+            request = self.bind_home_assistant(ha, "lock.unlock",
+                                               ha["entities"].get(spec.get("target", "front_door"), "lock.front_door"),
+                                               "unlock_door")
+        elif backends["mqtt"] and "door_control" in backends["mqtt"]["topics"]:
+            request = self.bind_publish(backends["mqtt"], "door_control",
+                                        {"target": spec.get("target", "front_door"), "state": "unlocked"})
         else:
-            print("  ⚠ Smart lock not configured (simulation)")
-            print("  ✓ [DEMO] Front door unlocked")
+            request = self.bind_simulation("Smart lock not configured (simulation)",
+                                           "[DEMO] Front door unlocked")
+        
+        async def unlock_door(gesture_data):
+            print("  → Unlocking door...")
+            await request()
+        return unlock_door
     
-    async def unlock_phone(self):
+    def bind_unlock_phone(self, spec, backends):
         """
         Send unlock signal to phone
+        
+        This would typically use platform-specific APIs:
+        - iOS: Shortcuts app webhook
+        - Android: Tasker/Automate with HTTP request trigger
         """
-        print("  → Unlocking phone...")
+        request = self.bind_request("POST", spec.get("url", backends["phone_webhook"]), None, None,
+                                    "unlock_phone", 200, "Phone unlocked", "Failed to unlock phone")
         
-        # This would typically use platform-specific APIs:
-        # - iOS: Shortcuts app webhook
-        # - Android: Tasker/Automate with HTTP request trigger
+        async def unlock_phone(gesture_data):
+            print("  → Unlocking phone...")
+            try:
+                await request()
+            except Exception:
+                print(f"  ⚠ Phone unlock not available (simulation)")
+        return unlock_phone
+    
+    def bind_media(self, spec, backends):
+        """
+        Control media playback (Spotify, etc.)
+        """
+        command = spec.get("command", "play")
+        ha = backends["home_assistant"]
+        service = MEDIA_SERVICES.get(command)
+        if ha and service:
+            request = self.bind_home_assistant(ha, service,
+                                               ha["entities"].get("media_player", "media_player.spotify"),
+                                               "media_control")
+        else:
+            request = self.bind_simulation(f"Media control simulation: {command}")
         
-        # Example: Send HTTP request to phone's local webhook
-        phone_webhook = "http://192.168.1.50:8765/unlock"
+        async def media_control(gesture_data):
+            print(f"  → Media control: {command}")
+            await request()
+        return media_control
+    
+    def bind_mqtt(self, spec, backends):
+        """
+        Publish a fixed payload to an MQTT topic
         
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(phone_webhook, timeout=2) as response:
-                    if response.status == 200:
-                        print("  ✓ Phone unlocked")
+        spec["topic"] is a name from smart_home.mqtt.topics (which sets its
+        QoS and retain flag) or a literal topic; spec may override "qos".
+        """
+        topic = spec.get("topic")
+        if not topic:
+            raise ValueError("mqtt action needs a 'topic'")
+        payload = spec.get("payload", "")
+        if backends["mqtt"]:
+            request = self.bind_publish(backends["mqtt"], topic, payload, spec.get("qos"), spec.get("retain"))
+        else:
+            request = self.bind_simulation(f"MQTT not configured (simulation): {topic} <- {payload}")
+        
+        async def publish_mqtt(gesture_data):
+            print(f"  → MQTT publish: {topic}")
+            await request()
+        return publish_mqtt
+    
+    def bind_publish(self, mqtt, topic, payload, qos=None, retain=None):
+        """
+        Zero-argument coroutine function publishing one fixed MQTT message
+        
+        The payload is encoded once here; publishing never waits on the broker.
+        """
+        name = topic
+        topic, topic_qos, topic_retain = mqtt["topics"].get(name, (name, mqtt["qos"], False))
+        qos = topic_qos if qos is None else qos
+        retain = topic_retain if retain is None else retain
+        if not isinstance(payload, (str, bytes)):
+            payload = json.dumps(payload)
+        connection = mqtt["connection"]
+        
+        async def publish():
+            result = self.get_mqtt(connection).publish(topic, payload, qos, retain)
+            if result == "sent":
+                print(f"  ✓ MQTT: {topic} (QoS {qos})")
+            else:
+                print(f"  ⚠ MQTT broker offline, queued: {topic}")
+        return publish
+    
+    def bind_home_assistant(self, ha, service, entity_id, action):
+        """
+        Pre-built Home Assistant service call
+        """
+        return self.bind_request("POST", f"{ha['url']}/api/services/{service.replace('.', '/')}",
+                                 {"entity_id": entity_id}, ha["headers"], action, 200,
+                                 f"Home Assistant: {service} executed", "Home Assistant error")
+    
+    def bind_request(self, method, url, payload, headers, action, ok_status, ok_message, error_message):
+        """
+        Zero-argument coroutine function sending one fixed request
+        
+        Error statuses, timeouts and connection errors all count as failed.
+        """
+        timeout = self.action_timeout(action)
+        
+        async def request():
+            session = await self.get_session()
+            try:
+                async with session.request(method, url, json=payload, headers=headers,
+                                           timeout=timeout) as response:
+                    if response.status == ok_status:
+                        print(f"  ✓ {ok_message}")
                     else:
-                        print(f"  ✗ Failed to unlock phone: {response.status}")
+                        self.stats["failed"] += 1
+                        print(f"  ✗ {error_message}: {response.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.stats["failed"] += 1
+                print(f"  ✗ {error_message}: {str(e) or type(e).__name__}")
+        return request
+    
+    def bind_simulation(self, *messages):
+        async def simulate():
+            for message in messages:
+                print(f"  {'✓' if message.startswith('[DEMO]') else '⚠'} {message}")
+        return simulate
+
+
+def resolve_backends(config):
+    """
+    Service endpoints and credentials, from the nested config sections
+    (config.example.json) when present, else the flat top-level keys
+    
+    A present but disabled nested section means "not configured".
+    """
+    smart_home = config.get("smart_home", {})
+    services = config.get("services", {})
+    
+    if "home_assistant" in smart_home:
+        section = smart_home["home_assistant"]
+        url, token = (section.get("url"), section.get("token")) if section.get("enabled") else (None, None)
+        entities = section.get("entities", {})
+    else:
+        url, token, entities = config.get("home_assistant_url"), config.get("home_assistant_token"), {}
+    home_assistant = None
+    if url:
+        home_assistant = {
+            "url": url.rstrip("/"),
+            "entities": entities,
+            "headers": {"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+        }
+    
+    if "philips_hue" in smart_home:
+        section = smart_home["philips_hue"]
+        bridge, token = (section.get("bridge_ip"), section.get("api_token")) if section.get("enabled") else (None, None)
+        lights = section.get("lights", {})
+    else:
+        bridge, token, lights = config.get("philips_hue_bridge"), config.get("philips_hue_token"), {}
+    hue = {"bridge": bridge, "token": token, "lights": lights} if bridge and token else None
+    
+    if "uber" in services:
+        section = services["uber"]
+        api_key = section.get("api_key") if section.get("enabled") else None
+        destination = section.get("destinations", {}).get(section.get("default_destination"))
+    else:
+        api_key, destination = config.get("uber_api_key"), None
+    uber = None
+    if api_key:
+        uber = {"api_key": api_key,
+                "destination": destination or {"latitude": 37.7849, "longitude": -122.4294}}
+    
+    mqtt = None
+    section = smart_home.get("mqtt", {})
+    if section.get("enabled") and section.get("broker"):
+        qos = section.get("qos", 0)
+        topics = {}
+        for name, topic in section.get("topics", {}).items():
+            if isinstance(topic, str):
+                topic = {"topic": topic}
+            topics[name] = (topic["topic"], topic.get("qos", qos), topic.get("retain", False))
+        mqtt = {
+            "connection": {
+                "broker": section["broker"],
+                "port": section.get("port", 1883),
+                "username": section.get("username"),
+                "password": section.get("password"),
+                "client_id": section.get("client_id", ""),
+                "keepalive": section.get("keepalive_seconds", 60),
+                "max_offline": section.get("max_offline_messages", 100),
+                "max_inflight": section.get("max_inflight_messages", 20),
+            },
+            "topics": topics,
+            "qos": qos,
+        }
+    
+    return {
+        "home_assistant": home_assistant,
+        "hue": hue,
+        "uber": uber,
+        "mqtt": mqtt,
+        "phone_webhook": config.get("phone_webhook_url", "http://192.168.1.50:8765/unlock"),
+    }
+
+
+def load_config(path=None):
+    """
+    Defaults from CONFIG, with the top-level keys of a JSON file on top
+    """
+    config = copy.deepcopy(CONFIG)
+    if path:
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+
+class ConfigReloader:
+    """
+    Recompile the dispatch table when the config file changes
+    
+    Polls the file's mtime; a changed file is loaded and compiled before
+    being swapped in, so a broken edit leaves the running table alone.
+    Only gesture_actions, gesture_recognition, backend and http timeout
+    settings take effect live - device and queue settings need a restart.
+    """
+    
+    def __init__(self, path, controller, interval=1.0):
+        self.path = path
+        self.controller = controller
+        self.interval = interval
+        self.mtime = self._mtime()
+        self.reloads = 0
+        self.task = None
+    
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def check(self):
+        """
+        Reload if the file changed; returns True when a new table was swapped in
+        """
+        mtime = self._mtime()
+        if mtime is None or mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        try:
+            self.controller.reload(load_config(self.path))
         except Exception as e:
-            print(f"  ⚠ Phone unlock not available (simulation)")
+            print(f"⚠ Config reload failed, keeping current actions: {e}")
+            return False
+        self.reloads += 1
+        print(f"✓ Reloaded gesture actions from {self.path}")
+        return True
+    
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.check()
+    
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+    
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+class GestureEventQueue:
+    """
+    Bounded queue between BLE notifications and action execution
+    
+    Devices are pinned to one worker shard each, so a device's gestures run in
+    the order they arrived while different devices are handled in parallel.
+    Each shard holds at most max_size events. When one is full the overflow
+    policy decides what gives: "drop_oldest" discards the stalest queued event
+    of the same device and "drop_newest" the incoming one. "coalesce" folds a
+    gesture that repeats the newest one still queued for the same device into
+    it (it would be debounced anyway), then falls back to drop_oldest. A
+    device with nothing queued takes the slot of the stalest event of the
+    device holding the most, and only if that device holds more than one;
+    otherwise the incoming event is dropped. So a chatty wristband sharing a
+    shard never pushes out a quiet one's last gesture.
     
-    async def media_control(self, action):
+    handler is awaited as handler(gesture_data, device_id).
+    """
+    
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "coalesce")
+    
+    def __init__(self, handler, max_size=32, workers=2, overflow="drop_oldest"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'. "
+                             f"Choose from: {', '.join(self.OVERFLOW_POLICIES)}")
+        self.handler = handler
+        self.max_size = max(1, max_size)
+        self.num_workers = max(1, workers)
+        self.overflow = overflow
+        self.shards = [deque() for _ in range(self.num_workers)]
+        self.wakeups = [asyncio.Event() for _ in range(self.num_workers)]
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.device_shards = {}
+        self.unfinished = 0
+        self.tasks = []
+        self.stats = {
+            "enqueued": 0,
+            "processed": 0,
+            "dropped": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "max_depth": 0,
+            "lag_total": 0.0,
+            "lag_max": 0.0,
+            "lag_last": 0.0,
+        }
+    
+    @classmethod
+    def from_config(cls, handler, config):
+        queue_config = config.get("event_queue", {})
+        return cls(handler,
+                   max_size=queue_config.get("max_size", 32),
+                   workers=queue_config.get("workers", 2),
+                   overflow=queue_config.get("overflow", "drop_oldest"))
+    
+    @property
+    def depth(self):
+        return sum(len(shard) for shard in self.shards)
+    
+    def shard_for(self, device_id):
         """
-        Control media playback (Spotify, etc.)
+        Pin each device to a shard, round-robin in order of first appearance
         """
-        print(f"  → Media control: {action}")
+        if device_id not in self.device_shards:
+            self.device_shards[device_id] = len(self.device_shards) % self.num_workers
+        return self.device_shards[device_id]
+    
+    def put_nowait(self, device_id, gesture_data):
+        """
+        Queue a gesture without blocking (safe to call from a BLE callback)
+        
+        Returns False if the event was dropped or folded into a queued one.
+        """
+        index = self.shard_for(device_id)
+        shard = self.shards[index]
+        
+        if self.overflow == "coalesce":
+            # Newest queued event from this device; shards are short, so scan
+            for i in range(len(shard) - 1, -1, -1):
+                enqueued_at, queued_device, queued_data = shard[i]
+                if queued_device != device_id:
+                    continue
+                if queued_data.get("gesture") == gesture_data.get("gesture"):
+                    # Keep the original enqueue time so lag stays honest
+                    shard[i] = (enqueued_at, device_id, gesture_data)
+                    self.stats["coalesced"] += 1
+                    return False
+                break
+        
+        if len(shard) >= self.max_size:
+            self.stats["dropped"] += 1
+            if self.overflow == "drop_newest":
+                return False
+            victim = self.eviction_index(shard, device_id)
+            if victim is None:
+                return False
+            del shard[victim]
+            self.unfinished -= 1
+        
+        shard.append((time.monotonic(), device_id, gesture_data))
+        self.unfinished += 1
+        self.idle.clear()
+        self.stats["enqueued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.depth)
+        self.wakeups[index].set()
+        return True
+    
+    @staticmethod
+    def eviction_index(shard, device_id):
+        """
+        Position of the event to drop for device_id in a full shard, or None
         
-        if self.config.get("home_assistant_url"):
-            service_map = {
-                "play": "media_player.media_play",
-                "pause": "media_player.media_pause",
-                "next": "media_player.media_next_track",
-                "previous": "media_player.media_previous_track"
-            }
+        The device's own stalest event, else the stalest event of the device
+        with the most queued, provided it has more than one.
+        """
+        counts = {}
+        first = {}
+        for i, (_, queued_device, _) in enumerate(shard):
+            if queued_device == device_id:
+                return i
+            counts[queued_device] = counts.get(queued_device, 0) + 1
+            first.setdefault(queued_device, i)
+        busiest = max(counts, key=counts.get)
+        return first[busiest] if counts[busiest] > 1 else None
+    
+    async def worker(self, index):
+        shard = self.shards[index]
+        wakeup = self.wakeups[index]
+        
+        while True:
+            while not shard:
+                wakeup.clear()
+                await wakeup.wait()
             
-            service = service_map.get(action)
-            if service:
-                await self.call_home_assistant_service(
-                    service,
-                    {"entity_id": "media_player.spotify"}
-                )
-        else:
-            print(f"  ⚠ Media control simulation: {action}")
+            enqueued_at, device_id, gesture_data = shard.popleft()
+            lag = time.monotonic() - enqueued_at
+            self.stats["lag_total"] += lag
+            self.stats["lag_max"] = max(self.stats["lag_max"], lag)
+            self.stats["lag_last"] = lag
+            
+            try:
+                await self.handler(gesture_data, device_id)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"  ✗ Error handling gesture from {device_id}: {e}")
+            finally:
+                self.stats["processed"] += 1
+                self.unfinished -= 1
+                if self.unfinished == 0:
+                    self.idle.set()
+    
+    def start(self):
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self.worker(i)) for i in range(self.num_workers)]
     
-    async def call_home_assistant_service(self, service, entity_data):
+    async def join(self):
         """
-        Call Home Assistant service
+        Wait until every queued event has been handled
         """
-        url = f"{self.config['home_assistant_url']}/api/services/{service.replace('.', '/')}"
-        headers = {
-            "Authorization": f"Bearer {self.config['home_assistant_token']}",
-            "Content-Type": "application/json"
+        await self.idle.wait()
+    
+    async def stop(self, drain=True, timeout=5.0):
+        """
+        Stop the workers, by default after handling what is already queued
+        """
+        if drain and self.tasks:
+            try:
+                await asyncio.wait_for(self.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠ Gave up draining event queue ({self.depth} events left)")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+    
+    def snapshot(self):
+        """
+        Current counters, with lag in milliseconds
+        """
+        stats = dict(self.stats)
+        processed = stats.pop("processed")
+        lag_total = stats.pop("lag_total")
+        return {
+            "depth": self.depth,
+            "processed": processed,
+            **{k: v for k, v in stats.items() if not k.startswith("lag_")},
+            "lag_avg_ms": 1000 * lag_total / processed if processed else 0.0,
+            "lag_max_ms": 1000 * stats["lag_max"],
+            "lag_last_ms": 1000 * stats["lag_last"],
         }
+    
+    def report(self):
+        s = self.snapshot()
+        print(f"Event queue: {s['processed']} handled, {s['dropped']} dropped, "
+              f"{s['coalesced']} coalesced, max depth {s['max_depth']}, "
+              f"lag avg {s['lag_avg_ms']:.1f} ms / max {s['lag_max_ms']:.1f} ms")
+
+
+class RawStreamInference:
+    """
+    Host-side gesture recognition from the raw sensor characteristic
+    
+    Notifications are reassembled into 50 Hz frames, pushed through a
+    StreamingGestureClassifier (ml_training/realtime_inference.py) and
+    turned into the same gesture dicts the wristband sends, emitted when
+    the predicted gesture changes with enough confidence.
+    """
+    
+    def __init__(self, classifier, confidence_threshold=0.75):
+        self.assembler = RawFrameAssembler()
+        self.classifier = classifier
+        self.confidence_threshold = confidence_threshold
+        self.current_gesture = None
+        self.last_prediction = None
+        self.predictions = 0
+        self.latencies = deque(maxlen=10000)
+        self.started_at = None
+    
+    @classmethod
+    def from_config(cls, config, model_dir=None, model_type=None):
+        """
+        Load the trained model named in config["raw_stream"]
+        """
+        raw_config = config.get("raw_stream", {})
+        if ML_TRAINING_DIR not in sys.path:
+            sys.path.insert(0, ML_TRAINING_DIR)
+        from realtime_inference import StreamingGestureClassifier
+        from train_gesture_model import DEFAULT_FEATURES, load_model_meta
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=entity_data, headers=headers) as response:
-                if response.status == 200:
-                    print(f"  ✓ Home Assistant: {service} executed")
-                else:
-                    print(f"  ✗ Home Assistant error: {response.status}")
+        model_type = model_type or raw_config.get("model_type", "random_forest")
+        model_dir = model_dir or raw_config.get("model_dir", os.path.join(ML_TRAINING_DIR, "output"))
+        # Running statistics cover the default features only
+        features = load_model_meta(model_dir, model_type).get("feature_names", DEFAULT_FEATURES)
+        classifier = StreamingGestureClassifier(
+            model_dir,
+            model_type=model_type,
+            stride=raw_config.get("stride", 1),
+            incremental=model_type in ("random_forest", "sgd") and tuple(features) == tuple(DEFAULT_FEATURES),
+        )
+        return cls(classifier, raw_config.get("confidence_threshold", 0.75))
+    
+    def feed(self, data, received_at=None):
+        """
+        Process one notification; returns the gesture events it produced
+        
+        Latency is measured from received_at (default: now) to each
+        prediction, i.e. frame arrival to gesture on the host.
+        """
+        received_at = received_at if received_at is not None else time.perf_counter()
+        if self.started_at is None:
+            self.started_at = received_at
+        
+        decoded = self.assembler.feed(data)
+        if decoded is None:
+            return []
+        
+        _, timestamps, X = decoded
+        events = []
+        for i in range(len(X)):
+            result = self.classifier.push(X[i])
+            if result is None:
+                continue
+            self.predictions += 1
+            self.latencies.append(time.perf_counter() - received_at)
+            
+            self.last_prediction = result
+            label, confidence = result
+            if confidence >= self.confidence_threshold and label != self.current_gesture:
+                self.current_gesture = label
+                events.append({
+                    "gesture": str(label),
+                    "confidence": confidence,
+                    "timestamp": int(timestamps[i]),
+                    "imu": {},
+                    "source": "raw",
+                })
+        return events
+    
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+        pick = lambda q: 1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+        return {
+            "frames": self.assembler.frames,
+            "lost_frames": self.assembler.lost_frames,
+            "corrupt_frames": self.assembler.corrupt_frames,
+            "predictions": self.predictions,
+            "latency_p50_ms": pick(0.50),
+            "latency_p99_ms": pick(0.99),
+        }
+    
+    def report(self):
+        s = self.snapshot()
+        print(f"Raw stream: {s['frames']} frames ({s['lost_frames']} lost, {s['corrupt_frames']} corrupt), "
+              f"{s['predictions']} predictions, frame→gesture p50 {s['latency_p50_ms']:.2f} ms / "
+              f"p99 {s['latency_p99_ms']:.2f} ms")
 
 
 class OpenMuscleBLEClient:
     """
     BLE client for OpenMuscle wristband
+    
+    device_name is matched against advertised names, or taken as the exact
+    address. Once connected the address is cached, so reconnects go straight
+    to it; a scan that stops at the first match is only the fallback.
+    Failed attempts back off exponentially with jitter, using the "device"
+    config section. When several clients share a scan_lock and claimed set
+    (see MultiDeviceReceiver) they scan one at a time and never connect to
+    the same wristband twice. scanner_class/client_class default to Bleak
+    and can be swapped for a simulated backend.
     """
     
-    def __init__(self, device_name, action_controller):
+    def __init__(self, device_name, action_controller, event_queue=None, raw_inference=None,
+                 claimed=None, scan_lock=None, device_config=None,
+                 scanner_class=BleakScanner, client_class=BleakClient):
         self.device_name = device_name
         self.action_controller = action_controller
+        self.event_queue = event_queue
+        self.raw_inference = raw_inference
+        self.claimed = claimed if claimed is not None else set()
+        self.scan_lock = scan_lock
+        self.scanner_class = scanner_class
+        self.client_class = client_class
         self.client = None
+        self.address = device_name if is_ble_address(device_name) else None
+        if self.address is not None:
+            self.claimed.add(self.address)
         self.connected = False
+        self.running = False
+        self.disconnected = asyncio.Event()
+        
+        device_config = device_config or {}
+        self.startup_attempts = device_config.get("startup_attempts", 3)
+        self.reconnect_attempts = device_config.get("reconnect_attempts", 5)
+        self.reconnect_delay = device_config.get("reconnect_delay_seconds", 2.0)
+        self.reconnect_max_delay = device_config.get("reconnect_max_delay_seconds", 30.0)
+        self.scan_timeout = device_config.get("scan_timeout_seconds", 10.0)
+        self.connect_timeout = device_config.get("connect_timeout_seconds", 10.0)
+        
+        self.lost_at = None
+        self.reconnect_times = []
+        self.scans = 0
+        self.ever_connected = False
+    
+    @property
+    def device_id(self):
+        """
+        Key for per-device queue ordering and debounce state
+        """
+        return self.address or self.device_name
+    
+    def matches(self, device, advertisement_data=None):
+        if device.address in self.claimed and device.address != self.address:
+            return False
+        name = device.name or getattr(advertisement_data, "local_name", None)
+        return device.address == self.device_name or bool(name and self.device_name in name)
     
-    async def scan_and_connect(self):
+    def backoff_delay(self, failures):
+        """
+        Jittered exponential backoff: uniform in [d/2, d], d doubling per failure
         """
-        Scan for OpenMuscle device and connect
+        delay = min(self.reconnect_max_delay, self.reconnect_delay * 2 ** (failures - 1))
+        return random.uniform(delay / 2, delay)
+    
+    async def find_device(self):
+        """
+        Scan until the first advertisement matching this client
         """
         print(f"Scanning for device: {self.device_name}...")
         
-        devices = await BleakScanner.discover(timeout=10.0)
-        target_device = None
+        async with (self.scan_lock or contextlib.nullcontext()):
+            self.scans += 1
+            device = await self.scanner_class.find_device_by_filter(self.matches, timeout=self.scan_timeout)
+            if device is None:
+                print(f"✗ Device '{self.device_name}' not found")
+                return None
+            
+            # Claim before releasing the lock so no other client takes it
+            self.claimed.add(device.address)
         
-        for device in devices:
-            if device.name and self.device_name in device.name:
-                target_device = device
-                break
+        print(f"✓ Found device: {device.name} ({device.address})")
+        return device
+    
+    async def connect(self):
+        """
+        Connect to the cached or configured address, else scan for the device
+        """
+        if self.address is not None and await self.connect_to(self.address):
+            return True
         
-        if not target_device:
-            print(f"✗ Device '{self.device_name}' not found")
-            print("\nAvailable devices:")
-            for device in devices:
-                print(f"  - {device.name} ({device.address})")
+        device = await self.find_device()
+        if device is None:
             return False
+        if await self.connect_to(device.address, device.name):
+            return True
+        self.claimed.discard(device.address)
+        return False
+    
+    async def connect_to(self, address, name=None):
+        """
+        Connect to one address and subscribe to notifications
+        """
+        print(f"Connecting to {name or address}...")
         
-        print(f"✓ Found device: {target_device.name} ({target_device.address})")
-        print(f"Connecting...")
-        
-        self.client = BleakClient(target_device.address)
+        if self.client is None or self.client.address != address:
+            self.client = self.client_class(address, disconnected_callback=self.handle_disconnect)
         
+        linked = False
         try:
-            await self.client.connect()
+            await self.client.connect(timeout=self.connect_timeout)
+            linked = True
+            
+            if self.address is not None and self.address != address:
+                self.claimed.discard(self.address)
+            self.address = address
+            self.claimed.add(address)
             self.connected = True
-            print(f"✓ Connected to {target_device.name}")
+            self.disconnected.clear()
+            print(f"✓ Connected to {name or address}")
             
             # Subscribe to gesture notifications
             await self.client.start_notify(GESTURE_CHAR_UUID, self.gesture_notification_handler)
-            print("✓ Subscribed to gesture notifications\n")
+            print("✓ Subscribed to gesture notifications")
+            
+            if self.raw_inference is not None:
+                await self.client.start_notify(SENSOR_CHAR_UUID, self.raw_notification_handler)
+                await self.send_command({"action": "raw_stream", "enabled": True})
+                print("✓ Streaming raw frames for host-side inference")
+            
+            if self.lost_at is not None:
+                self.reconnect_times.append(time.monotonic() - self.lost_at)
+                print(f"✓ Reconnected in {self.reconnect_times[-1]:.2f} s")
+                self.lost_at = None
+            print()
             
             return True
             
         except Exception as e:
             print(f"✗ Connection failed: {e}")
+            self.connected = False
+            if linked:
+                # Setup failed on a live link: drop it so the next attempt starts clean
+                lost_at = self.lost_at
+                with contextlib.suppress(Exception):
+                    await self.client.disconnect()
+                self.lost_at = lost_at
+                if address != self.device_name:
+                    self.claimed.discard(address)
+                    if self.address == address:
+                        self.address = None
             return False
     
+    def handle_disconnect(self, client):
+        """
+        Bleak disconnected_callback - wakes run() instead of polling
+        """
+        if client is not self.client:
+            return
+        self.connected = False
+        if self.running and self.lost_at is None:
+            self.lost_at = time.monotonic()
+        self.disconnected.set()
+    
+    async def run(self):
+        """
+        Keep this wristband connected until stop() - one task per device
+        
+        Gives up after startup_attempts failures before the first connection,
+        or reconnect_attempts consecutive failures after it (0 = never).
+        """
+        self.running = True
+        failures = 0
+        
+        while self.running:
+            if await self.connect():
+                failures = 0
+                self.ever_connected = True
+                await self.disconnected.wait()
+                if self.running:
+                    print(f"⚠ Connection to {self.device_id} lost, reconnecting...")
+                continue
+            
+            failures += 1
+            limit = self.reconnect_attempts if self.ever_connected else self.startup_attempts
+            if limit and failures >= limit:
+                print(f"✗ Giving up on {self.device_name} after {failures} attempts")
+                break
+            await asyncio.sleep(self.backoff_delay(failures))
+        
+        self.running = False
+    
+    def stop(self):
+        self.running = False
+        self.disconnected.set()
+    
     def gesture_notification_handler(self, sender, data):
         """
         Handle incoming gesture notifications from wristband
         """
         try:
-            # Decode JSON data
-            gesture_json = data.decode('utf-8')
-            gesture_data = json.loads(gesture_json)
+            # Binary frame or legacy JSON, detected from the first byte
+            gesture_data = decode_gesture(data)
             
-            # Handle gesture asynchronously
-            asyncio.create_task(self.action_controller.handle_gesture(gesture_data))
+            self.dispatch(gesture_data)
             
         except Exception as e:
             print(f"Error processing gesture data: {e}")
     
+    def raw_notification_handler(self, sender, data):
+        """
+        Handle raw sensor frame notifications (host-side inference)
+        """
+        try:
+            for gesture_data in self.raw_inference.feed(data):
+                self.dispatch(gesture_data)
+        except Exception as e:
+            print(f"Error processing raw frame data: {e}")
+    
+    def dispatch(self, gesture_data):
+        """
+        Hand a gesture to the bounded queue; actions run on its workers
+        """
+        if self.event_queue is not None:
+            self.event_queue.put_nowait(self.device_id, gesture_data)
+        else:
+            asyncio.create_task(self.action_controller.handle_gesture(gesture_data, self.device_id))
+    
     async def send_command(self, command_data):
         """
         Send command to wristband
@@ -362,56 +1431,158 @@ class OpenMuscleBLEClient:
         """
         Disconnect from device
         """
+        self.running = False
         if self.client and self.connected:
             await self.client.disconnect()
             self.connected = False
-            print("\n✓ Disconnected from device")
+            print(f"✓ Disconnected from {self.device_id}")
+        self.claimed.discard(self.address)
+
+
+class MultiDeviceReceiver:
+    """
+    Fan-in of several wristbands into one controller and event queue
+    
+    Each device spec (name or address) gets its own OpenMuscleBLEClient and
+    connection task with its own reconnect loop. Gestures from all of them
+    go through the shared GestureEventQueue, which keeps per-device order,
+    and the controller keeps debounce state per device.
+    """
+    
+    def __init__(self, device_specs, action_controller, event_queue,
+                 raw_inference_factory=None, device_config=None, **client_kwargs):
+        self.scan_lock = asyncio.Lock()
+        self.claimed = set()
+        self.clients = [
+            OpenMuscleBLEClient(spec, action_controller, event_queue,
+                                raw_inference_factory() if raw_inference_factory else None,
+                                claimed=self.claimed, scan_lock=self.scan_lock,
+                                device_config=device_config, **client_kwargs)
+            for spec in device_specs
+        ]
+        self.tasks = []
+    
+    @property
+    def connected_count(self):
+        return sum(client.connected for client in self.clients)
+    
+    def start(self):
+        self.tasks = [asyncio.create_task(client.run()) for client in self.clients]
+    
+    async def stop(self):
+        for client in self.clients:
+            client.stop()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        await asyncio.gather(*(client.disconnect() for client in self.clients), return_exceptions=True)
+    
+    def report(self):
+        for client in self.clients:
+            if client.reconnect_times:
+                times = client.reconnect_times
+                print(f"[{client.device_id}] {len(times)} reconnects, "
+                      f"avg {sum(times) / len(times):.2f} s, max {max(times):.2f} s")
+            if client.raw_inference is not None:
+                print(f"[{client.device_id}] ", end="")
+                client.raw_inference.report()
 
 
 async def main():
-    parser = argparse.ArgumentParser(description='OpenMuscle BLE Receiver')
-    parser.add_argument('--device', type=str, default='OpenMuscle-FlexGrid',
-                       help='Device name to connect to')
+    parser = argparse.ArgumentParser(
+        description='OpenMuscle BLE Receiver',
+        epilog='Each device is tried device.startup_attempts times at startup (default 3) and '
+               'device.reconnect_attempts times after a dropped link (default 5); 0 retries '
+               'forever. Exits with status 1 once every device has given up.')
+    parser.add_argument('--device', type=str, action='append', default=None,
+                       help='Device name or address to connect to (repeat for several wristbands)')
     parser.add_argument('--config', type=str, default=None,
                        help='Path to JSON config file')
+    parser.add_argument('--raw', action='store_true',
+                       help='Stream raw sensor frames and classify on this host')
+    parser.add_argument('--model_dir', type=str, default=None,
+                       help='Trained model directory for --raw (default: config raw_stream.model_dir)')
+    parser.add_argument('--model_type', type=str, default=None,
+                       choices=['random_forest', 'sgd', 'cnn', 'tflite'],
+                       help='Model to run for --raw (default: config raw_stream.model_type)')
+    
+    parser.add_argument('--startup_attempts', type=int, default=None,
+                       help='Connection attempts per device before giving up at startup, 0 = retry forever '
+                            '(default: config device.startup_attempts)')
     
     args = parser.parse_args()
     
     # Load config from file if provided
-    config = CONFIG
-    if args.config:
-        with open(args.config, 'r') as f:
-            config.update(json.load(f))
+    config = load_config(args.config)
+    if args.startup_attempts is not None:
+        config["device"] = dict(config.get("device", {}), startup_attempts=args.startup_attempts)
+    
+    # Console/log output and gesture history are written by background
+    # threads, so a slow terminal or disk never stalls the event loop
+    console = sys.stdout
+    log_writer, history_writer = open_writers(config.get("logging", {}), console)
+    if log_writer is not None:
+        sys.stdout = WriterStream(log_writer)
+    
+    device_config = config.get("device", {})
+    devices = args.device or [device_config.get("bluetooth_address") or
+                              device_config.get("name", "OpenMuscle-FlexGrid")]
     
     # Initialize controller
     action_controller = GestureActionController(config)
+    action_controller.history = history_writer
+    await action_controller.start()
     
-    # Create BLE client
-    ble_client = OpenMuscleBLEClient(args.device, action_controller)
+    event_queue = GestureEventQueue.from_config(action_controller.handle_gesture, config)
+    event_queue.start()
     
-    # Connect to device
-    if not await ble_client.scan_and_connect():
-        sys.exit(1)
+    raw_inference_factory = None
+    if args.raw:
+        raw_inference_factory = lambda: RawStreamInference.from_config(config, args.model_dir, args.model_type)
     
-    print("=== Gesture Control Active ===")
+    # One connection task per wristband, all feeding the same queue
+    receiver = MultiDeviceReceiver(devices, action_controller, event_queue, raw_inference_factory,
+                                   device_config=device_config)
+    receiver.start()
+    
+    # Pick up edits to the config file without a restart
+    reloader = None
+    if args.config:
+        reloader = ConfigReloader(args.config, action_controller)
+        reloader.start()
+    
+    print(f"=== Gesture Control Active ({len(devices)} device{'s' if len(devices) > 1 else ''}) ===")
     print("Waiting for gestures...")
     print("Press Ctrl+C to exit\n")
     
+    exit_code = 0
     try:
-        # Keep running until interrupted
-        while True:
-            await asyncio.sleep(1)
-            
-            # Could add periodic health checks here
-            if not ble_client.connected:
-                print("⚠ Connection lost, attempting to reconnect...")
-                await ble_client.scan_and_connect()
+        # Keep running until interrupted; each client reconnects on its own
+        await asyncio.gather(*receiver.tasks)
+        # Every client returned on its own, i.e. gave up
+        print("✗ No wristband connected, exiting")
+        exit_code = 1
     
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\n\nShutting down...")
     
     finally:
-        await ble_client.disconnect()
+        if reloader is not None:
+            await reloader.stop()
+        await receiver.stop()
+        await event_queue.stop()
+        event_queue.report()
+        receiver.report()
+        await action_controller.close()
+        if history_writer is not None:
+            history_writer.close()
+        if log_writer is not None:
+            log_writer.close()
+            sys.stdout = console
+    
+    if exit_code:
+        sys.exit(exit_code)
 
 
 if __name__ == '__main__':
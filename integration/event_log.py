@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+OpenMuscle Event Log and Gesture History
+
+Non-blocking sinks for the receiver's console/log output and for the
+gesture history file (config "logging" section). Callers on the event loop
+only append to an in-memory buffer; a daemon thread formats and writes the
+buffered records in batches, when batch_size records are waiting or every
+flush_interval seconds, and rotates the file once it passes max_bytes.
+
+Author: OpenMuscle Community
+License: MIT
+"""
+
+import json
+import os
+import sys
+import threading
+from collections import deque
+
+
+# Seconds a record may sit in the buffer before the writer thread flushes it
+DEFAULT_FLUSH_INTERVAL = 0.2
+
+
+class BatchedWriter:
+    """
+    Buffer records in memory and write them in batches from a daemon thread
+
+    write() never touches the file: it appends to a deque and, when a batch
+    fills up, wakes the writer thread. Records are formatted to text on the
+    writer thread too. Output goes to path (rotated like logging's
+    RotatingFileHandler: path.1 is the newest backup) and/or to stream.
+    If the disk can't keep up, at most max_pending records are held and
+    the rest are counted in dropped. When a sink's write fails, that sink
+    keeps the batch and retries it ahead of newer records on the next
+    flush; the other sink doesn't get it twice. written counts records
+    that reached the file (or the stream when there is no file).
+    """
+
+    def __init__(self, path=None, stream=None, format=str, batch_size=256,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_bytes=10 * 1024 * 1024, backup_count=3, max_pending=100000):
+        self.path = path
+        self.stream = stream
+        self.format = format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_pending = max_pending
+
+        self.pending = deque()
+        self.unwritten = {}
+        self.wake = threading.Event()
+        self.stopping = False
+        self.file = None
+        self.thread = None
+
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def start(self):
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.thread = threading.Thread(target=self.run, name=f"writer:{self.path or 'stream'}", daemon=True)
+        self.thread.start()
+        return self
+
+    def write(self, record):
+        """
+        Queue one record; safe to call from the event loop or any thread
+        """
+        pending = self.pending
+        if len(pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        pending.append(record)
+        if len(pending) == self.batch_size:
+            self.wake.set()
+
+    def run(self):
+        while not self.stopping:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush_pending()
+        self.flush_pending()
+
+    def flush_pending(self):
+        """
+        Write everything buffered so far as one batch (writer thread only)
+        """
+        count = len(self.pending)
+        if count == 0 and not self.unwritten:
+            return
+        popleft = self.pending.popleft
+        records = [popleft() for _ in range(count)]
+        written = 0
+        if self.stream is not None:
+            written = self.write_sink("stream", self.stream, records)
+        if self.file is not None:
+            written = self.write_sink(self.path, self.file, records)
+        self.written += written
+        if count:
+            self.batches += 1
+
+        # A failed rotation must not write the batch again
+        try:
+            if self.file is not None and self.max_bytes and self.file.tell() >= self.max_bytes:
+                self.rotate()
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠ Log writer {self.path}: rotation failed: {e}", file=sys.__stderr__)
+
+    def write_sink(self, name, sink, records):
+        """
+        Write this sink's held-back records, then records; returns the count
+
+        On failure the records stay in unwritten[name] for the next flush,
+        so only the sink that failed sees them again.
+        """
+        records = self.unwritten.pop(name, []) + records
+        if not records:
+            return 0
+        try:
+            sink.write("".join(map(self.format, records)))
+            sink.flush()
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠ Log writer {name}: {e}", file=sys.__stderr__)
+            self.hold(name, records)
+            return 0
+        return len(records)
+
+    def hold(self, name, records):
+        """
+        Keep a failed batch for one sink, within max_pending records
+
+        Beyond that, the oldest records of the batch are counted in dropped.
+        """
+        if len(records) > self.max_pending:
+            self.dropped += len(records) - self.max_pending
+            records = records[len(records) - self.max_pending:]
+        self.unwritten[name] = records
+
+    def rotate(self):
+        """
+        path -> path.1 -> ... -> path.<backup_count>, then start a fresh file
+        """
+        self.file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+            self.file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self.file = open(self.path, 'w', encoding='utf-8')
+        self.rotations += 1
+
+    def close(self, timeout=5.0):
+        """
+        Stop the thread after a final flush and close the file
+        """
+        if self.thread is not None:
+            self.stopping = True
+            self.wake.set()
+            self.thread.join(timeout)
+            self.thread = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def snapshot(self):
+        return {
+            "written": self.written,
+            "batches": self.batches,
+            "pending": len(self.pending),
+            "unwritten": sum(map(len, self.unwritten.values())),
+            "rotations": self.rotations,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+class WriterStream:
+    """
+    File-like object that hands print() output to a BatchedWriter
+
+    Installed as sys.stdout, it lets the receiver's existing print calls
+    return immediately; the writer thread copies the text to the console
+    and/or the log file.
+    """
+
+    encoding = 'utf-8'
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, text):
+        if text:
+            self.writer.write(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def jsonl_line(record):
+    return json.dumps(record, separators=(',', ':')) + "\n"
+
+
+def open_writers(logging_config, console=None):
+    """
+    Start the writers described by a config "logging" section
+
+    Returns (log_writer, history_writer); either is None when the config
+    doesn't ask for it. log_writer copies text to console (the real stdout
+    by default) when logging.console is true and to logging.file when set.
+    """
+    options = dict(
+        batch_size=logging_config.get("batch_size", 256),
+        flush_interval=logging_config.get("flush_interval_seconds", DEFAULT_FLUSH_INTERVAL),
+        max_bytes=logging_config.get("max_bytes", 10 * 1024 * 1024),
+        backup_count=logging_config.get("backup_count", 3),
+    )
+
+    log_writer = None
+    log_file = logging_config.get("file")
+    stream = (console or sys.stdout) if logging_config.get("console", True) else None
+    if log_file or stream is not None:
+        log_writer = BatchedWriter(log_file, stream=stream, **options).start()
+
+    history_writer = None
+    if logging_config.get("save_gestures"):
+        history_writer = BatchedWriter(logging_config.get("gestures_file", "logs/gesture_history.jsonl"),
+                                       format=jsonl_line, **options).start()
+    return log_writer, history_writer
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+OpenMuscle Gesture Notification Protocol
+
+Wire formats for the gesture characteristic. Firmware v1.0 sends a JSON
+document; newer firmware sends a fixed-layout binary frame. decode_gesture()
+tells them apart by the first byte (JSON always starts with '{'), so the
+receiver works with either.
+
+The raw sensor characteristic carries one fixed-size frame per 50 Hz
+sample (see RAW FRAMES below), split across as many notifications as the
+negotiated MTU needs.
+
+Binary frame v1 (little-endian, 8 or 12 bytes):
+
+    offset  type    field
+    0       uint8   version (1)
+    1       uint8   flags (bit 0: IMU pitch/roll present)
+    2       uint8   gesture id (index into GESTURE_LABELS)
+    3       uint8   confidence, quantized to 0-255
+    4       uint32  timestamp (device millis())
+    8       int16   pitch, centidegrees   (if flags & 1)
+    10      int16   roll, centidegrees    (if flags & 1)
+
+Author: OpenMuscle Community
+License: MIT
+"""
+
+import json
+import struct
+
+import numpy as np
+
+# Must match GESTURE_LABELS in firmware/gesture_recognition_ble.ino
+GESTURE_LABELS = [
+    "idle",
+    "point_up",
+    "point_down",
+    "point_left",
+    "point_right",
+    "fist_close",
+    "fist_open",
+    "pinch",
+    "swipe_left",
+    "swipe_right",
+    "twist_cw",
+    "twist_ccw",
+]
+GESTURE_IDS = {name: i for i, name in enumerate(GESTURE_LABELS)}
+
+GESTURE_FRAME_VERSION = 1
+FLAG_IMU = 0x01
+
+HEADER = struct.Struct("<BBBBI")
+IMU = struct.Struct("<hh")
+
+
+def encode_gesture(gesture, confidence, timestamp, pitch=None, roll=None):
+    """
+    Pack a gesture into a binary v1 frame (what the firmware sends)
+    """
+    flags = FLAG_IMU if pitch is not None else 0
+    quantized = max(0, min(255, int(round(confidence * 255))))
+    frame = bytearray(HEADER.size + (IMU.size if flags else 0))
+    HEADER.pack_into(frame, 0, GESTURE_FRAME_VERSION, flags, GESTURE_IDS[gesture],
+                     quantized, timestamp & 0xFFFFFFFF)
+    if flags:
+        IMU.pack_into(frame, HEADER.size, int(round(pitch * 100)), int(round((roll or 0.0) * 100)))
+    return bytes(frame)
+
+
+def decode_binary_gesture(data):
+    """
+    Decode a binary gesture frame into the same dict the JSON format gives
+
+    Fields are read in place with struct.unpack_from, so a bytearray from
+    the BLE stack is never copied or sliced.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError(f"Gesture frame too short: {len(data)} bytes")
+    version, flags, gesture_id, quantized, timestamp = HEADER.unpack_from(data)
+    if version != GESTURE_FRAME_VERSION:
+        raise ValueError(f"Unsupported gesture frame version {version}")
+    if gesture_id >= len(GESTURE_LABELS):
+        raise ValueError(f"Unknown gesture id {gesture_id}")
+
+    gesture_data = {
+        "gesture": GESTURE_LABELS[gesture_id],
+        "gesture_id": gesture_id,
+        "confidence": quantized / 255.0,
+        "timestamp": timestamp,
+        "imu": {},
+    }
+    if flags & FLAG_IMU:
+        if len(data) < HEADER.size + IMU.size:
+            raise ValueError("Gesture frame flags IMU data but is truncated")
+        pitch, roll = IMU.unpack_from(data, HEADER.size)
+        gesture_data["imu"] = {"pitch": pitch / 100.0, "roll": roll / 100.0}
+    return gesture_data
+
+
+def decode_gesture(data):
+    """
+    Decode a gesture notification in either JSON or binary format
+    """
+    if len(data) and data[0] == 0x7B:  # '{'
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+    return decode_binary_gesture(data)
+
+
+# ===== RAW FRAMES =====
+#
+# Raw frame v1 (little-endian, 112 bytes):
+#
+#     offset  type        field
+#     0       2 bytes     magic A5 5A
+#     2       uint8       version (1)
+#     3       uint8       checksum: sum of bytes 4-111, mod 256
+#     4       uint16      sequence number (wraps)
+#     6       uint32      timestamp (device millis())
+#     10      90 bytes    60 ADC values, 12-bit packed, row-major S{row}_{col}
+#     100     6 x int16   accel x/y/z in milli-g, gyro x/y/z in 0.1 deg/s
+#
+# Two 12-bit values a, b share three bytes: a & 0xFF, (a >> 8) | (b & 0xF) << 4, b >> 4.
+
+RAW_FRAME_MAGIC = b"\xA5\x5A"
+RAW_FRAME_VERSION = 1
+RAW_NUM_SENSORS = 60
+RAW_NUM_IMU = 6
+RAW_HEADER = struct.Struct("<2sBBHI")
+RAW_ADC_OFFSET = RAW_HEADER.size
+RAW_ADC_BYTES = RAW_NUM_SENSORS * 3 // 2
+RAW_IMU_OFFSET = RAW_ADC_OFFSET + RAW_ADC_BYTES
+RAW_FRAME_SIZE = RAW_IMU_OFFSET + 2 * RAW_NUM_IMU
+RAW_IMU_SCALE = np.array([1000, 1000, 1000, 10, 10, 10], dtype=np.float32)
+
+
+def pack_raw_frames(sensors, imu, first_sequence=0, timestamps=None):
+    """
+    Pack (N, 60) ADC readings and (N, 6) IMU values into N raw frames
+
+    The inverse of unpack_raw_frames(); used by the firmware simulator and
+    load tests. Returns one bytes object of N * RAW_FRAME_SIZE bytes.
+    """
+    sensors = np.clip(np.rint(sensors), 0, 4095).astype(np.uint16)
+    n = len(sensors)
+    if timestamps is None:
+        timestamps = np.arange(n) * 20
+    frames = np.zeros((n, RAW_FRAME_SIZE), dtype=np.uint8)
+    frames[:, 0:2] = np.frombuffer(RAW_FRAME_MAGIC, dtype=np.uint8)
+    frames[:, 2] = RAW_FRAME_VERSION
+    frames[:, 4:6] = ((first_sequence + np.arange(n)) & 0xFFFF).astype('<u2').view(np.uint8).reshape(n, 2)
+    frames[:, 6:10] = (np.asarray(timestamps) & 0xFFFFFFFF).astype('<u4').view(np.uint8).reshape(n, 4)
+
+    a, b = sensors[:, 0::2], sensors[:, 1::2]
+    adc = frames[:, RAW_ADC_OFFSET:RAW_IMU_OFFSET].reshape(n, -1, 3)
+    adc[:, :, 0] = a & 0xFF
+    adc[:, :, 1] = (a >> 8) | ((b & 0x0F) << 4)
+    adc[:, :, 2] = b >> 4
+
+    imu_raw = np.clip(np.rint(np.asarray(imu, dtype=np.float32) * RAW_IMU_SCALE), -32768, 32767)
+    frames[:, RAW_IMU_OFFSET:] = imu_raw.astype('<i2').view(np.uint8).reshape(n, -1)
+    frames[:, 3] = raw_frame_checksums(frames)
+    return frames.tobytes()
+
+
+def raw_frame_checksums(frames):
+    """
+    Checksum byte for each row of an (N, RAW_FRAME_SIZE) uint8 array
+    """
+    return (frames[:, 4:].sum(axis=1, dtype=np.uint32) & 0xFF).astype(np.uint8)
+
+
+def unpack_raw_frames(buffer, count):
+    """
+    Decode count back-to-back raw frames at the start of buffer in one pass
+
+    Returns (sequence uint16 (N,), timestamp uint32 (N,), X float32 (N, 66))
+    with X laid out like the training CSV: 60 sensors then 6 IMU columns.
+    """
+    frames = np.frombuffer(buffer, dtype=np.uint8, count=count * RAW_FRAME_SIZE).reshape(count, RAW_FRAME_SIZE)
+    sequence = frames[:, 4:6].copy().view('<u2')[:, 0]
+    timestamp = frames[:, 6:10].copy().view('<u4')[:, 0]
+
+    adc = frames[:, RAW_ADC_OFFSET:RAW_IMU_OFFSET].reshape(count, -1, 3).astype(np.uint16)
+    X = np.empty((count, RAW_NUM_SENSORS + RAW_NUM_IMU), dtype=np.float32)
+    X[:, 0:RAW_NUM_SENSORS:2] = adc[:, :, 0] | ((adc[:, :, 1] & 0x0F) << 8)
+    X[:, 1:RAW_NUM_SENSORS:2] = (adc[:, :, 1] >> 4) | (adc[:, :, 2] << 4)
+    imu = frames[:, RAW_IMU_OFFSET:].copy().view('<i2')
+    np.divide(imu, RAW_IMU_SCALE, out=X[:, RAW_NUM_SENSORS:])
+    return sequence, timestamp, X
+
+
+class RawFrameAssembler:
+    """
+    Reassemble raw frames from notifications of any size
+
+    Notifications are appended to a byte buffer and every complete frame
+    is decoded in one vectorized call. A lost notification shows up as a
+    frame with a bad magic or checksum; it is dropped and the buffer skips
+    ahead to the next magic. Sequence gaps count frames the host never saw.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.next_sequence = None
+        self.frames = 0
+        self.corrupt_frames = 0
+        self.skipped_bytes = 0
+        self.lost_frames = 0
+
+    def _resync(self):
+        buffer = self.buffer
+        if len(buffer) < 2 or buffer[:2] == RAW_FRAME_MAGIC:
+            return
+        start = buffer.find(RAW_FRAME_MAGIC, 1)
+        skip = start if start > 0 else len(buffer) - 1
+        del buffer[:skip]
+        self.skipped_bytes += skip
+
+    def feed(self, data):
+        """
+        Add one notification; returns (sequence, timestamp, X) or None
+        """
+        buffer = self.buffer
+        buffer += data
+        decoded = []
+
+        while True:
+            self._resync()
+            count = len(buffer) // RAW_FRAME_SIZE
+            if count == 0:
+                break
+
+            frames = np.frombuffer(buffer, dtype=np.uint8, count=count * RAW_FRAME_SIZE).reshape(count, RAW_FRAME_SIZE)
+            valid = ((frames[:, 0] == RAW_FRAME_MAGIC[0]) & (frames[:, 1] == RAW_FRAME_MAGIC[1])
+                     & (frames[:, 3] == raw_frame_checksums(frames)))
+            good = count if valid.all() else int(np.argmin(valid))
+            del frames  # release the buffer export before resizing
+
+            if good:
+                decoded.append(unpack_raw_frames(buffer, good))
+            del buffer[:good * RAW_FRAME_SIZE]
+            if good == count:
+                break
+
+            # Step past the bad frame's magic and resync on the next one
+            del buffer[:2]
+            self.corrupt_frames += 1
+            self.skipped_bytes += 2
+
+        if not decoded:
+            return None
+        if len(decoded) == 1:
+            result = decoded[0]
+        else:
+            result = tuple(np.concatenate(parts) for parts in zip(*decoded))
+
+        sequence = result[0]
+        if self.next_sequence is not None:
+            self.lost_frames += (int(sequence[0]) - self.next_sequence) & 0xFFFF
+        self.lost_frames += int(((np.diff(sequence.astype(np.int32)) - 1) & 0xFFFF).sum())
+        self.next_sequence = (int(sequence[-1]) + 1) & 0xFFFF
+        self.frames += len(sequence)
+        return result
@@ -0,0 +1,1581 @@
+#!/usr/bin/env python3
+"""
+OpenMuscle Integration Load Tests
+
+Benchmarks for the BLE receiver's action path, run against local stand-ins
+so no wristband, Home Assistant or Hue bridge is needed.
+
+Usage:
+    # Per-call sessions vs the controller's pooled session
+    python load_test.py http --requests 500
+
+    # Notification bursts: unbounded tasks vs the bounded event queue
+    python load_test.py queue --devices 2 --events 200 --server_delay_ms 20 --server_jitter_ms 20
+
+    # Gesture notification decode throughput, JSON vs binary frames
+    python load_test.py decode --frames 200000
+
+    # Raw frame streaming: reassembly + host inference rate and latency
+    python load_test.py raw --seconds 60 --model_dir ../ml_training/output
+
+    # Several simulated wristbands into one receiver
+    python load_test.py fanin --device_counts 1 2 4 8 16 32
+
+    # Time to reconnect after a dropped link
+    python load_test.py reconnect --trials 10
+
+    # Rewrite the config file repeatedly while gestures keep flowing
+    python load_test.py reload --reloads 20
+
+    # Replay gestures through the full receiver path at rising rates
+    python load_test.py replay --rates 10 50 100 200 500 1000
+    python load_test.py replay --input logs/gesture_history.jsonl --speed 10
+    python load_test.py replay --rates 50 --max_p99_ms 50 --max_error_rate 0.01   # CI gate
+
+    # MQTT publishes vs Home Assistant HTTP calls, plus a broker outage
+    python load_test.py mqtt --events 500 --server_delay_ms 5
+
+    # Event-loop lag while logging thousands of gestures per second
+    python load_test.py history --rates 1000 2000 5000
+    python load_test.py history --rates 1000 --max_lag_p99_ms 5   # CI gate
+
+Author: OpenMuscle Community
+License: MIT
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import aiohttp
+from aiohttp import web
+import numpy as np
+
+from ble_receiver import (
+    CONFIG, GESTURE_CHAR_UUID, ML_TRAINING_DIR, ConfigReloader, GestureActionController,
+    GestureEventQueue, MultiDeviceReceiver, OpenMuscleBLEClient, RawStreamInference, resolve_backends
+)
+from event_log import BatchedWriter, WriterStream, jsonl_line
+from gesture_protocol import (
+    GESTURE_LABELS, decode_gesture, encode_gesture, pack_raw_frames, unpack_raw_frames
+)
+
+# Gestures whose default action is a Home Assistant service call
+HTTP_GESTURES = ["point_up", "point_down", "point_left", "point_right",
+                 "swipe_left", "swipe_right", "twist_cw"]
+
+
+# ===== STUB SERVERS =====
+
+class StubActionServer:
+    """
+    Local HTTP server answering the Home Assistant and Hue endpoints
+
+    Every request is counted; a delay (fixed plus uniform jitter) stands in
+    for the time a real hub takes to act on a service call, and error_rate
+    of the requests get a 500 response.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = np.random.default_rng(seed)
+        self.requests = 0
+        self.errors = 0
+        self.arrivals = []
+        self.connections = set()
+        self.runner = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def handle(self, request):
+        self.requests += 1
+        self.arrivals.append(time.perf_counter())
+        self.connections.add(request.transport.get_extra_info("peername"))
+        delay = self.delay + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        await request.read()
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"message": "stub error"}, status=500)
+        return web.json_response([])
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/api/services/{domain}/{service}", self.handle)
+        app.router.add_put("/api/{token}/lights/{light}/state", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+class StubMQTTBroker:
+    """
+    Minimal local MQTT 3.1.1 broker: accepts connections and acknowledges publishes
+
+    Handles CONNECT, PUBLISH (QoS 0-2), PINGREQ and DISCONNECT - enough for
+    the receiver's publisher. Each publish is recorded in received as
+    (topic, payload) and its arrival time in arrivals. stop() closes every
+    connection, which the client sees as a broker outage.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, ack_delay=0.0):
+        self.host = host
+        self.port = port
+        self.ack_delay = ack_delay
+        self.received = []
+        self.arrivals = []
+        self.connects = 0
+        self.server = None
+        self.writers = set()
+        self.handlers = set()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            for writer in list(self.writers):
+                writer.close()
+            await asyncio.gather(*self.handlers, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+
+    async def read_packet(self, reader):
+        header = (await reader.readexactly(1))[0]
+        length, shift = 0, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        return header, await reader.readexactly(length)
+
+    async def ack(self, writer, packet):
+        if self.ack_delay:
+            await asyncio.sleep(self.ack_delay)
+        writer.write(packet)
+
+    async def handle(self, reader, writer):
+        self.writers.add(writer)
+        self.handlers.add(asyncio.current_task())
+        try:
+            while True:
+                header, body = await self.read_packet(reader)
+                kind = header >> 4
+                if kind == 1:  # CONNECT -> CONNACK, accepted
+                    self.connects += 1
+                    writer.write(b"\x20\x02\x00\x00")
+                elif kind == 3:  # PUBLISH
+                    qos = (header >> 1) & 0x03
+                    topic_length = int.from_bytes(body[:2], "big")
+                    topic = body[2:2 + topic_length].decode()
+                    offset = 2 + topic_length
+                    packet_id = body[offset:offset + 2] if qos else b""
+                    self.arrivals.append(time.perf_counter())
+                    self.received.append((topic, body[offset + (2 if qos else 0):]))
+                    if qos == 1:
+                        asyncio.create_task(self.ack(writer, b"\x40\x02" + packet_id))  # PUBACK
+                    elif qos == 2:
+                        asyncio.create_task(self.ack(writer, b"\x50\x02" + packet_id))  # PUBREC
+                elif kind == 6:  # PUBREL -> PUBCOMP
+                    writer.write(b"\x70\x02" + body[:2])
+                elif kind == 12:  # PINGREQ -> PINGRESP
+                    writer.write(b"\xd0\x00")
+                elif kind == 14:  # DISCONNECT
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+
+# ===== SIMULATED BLE =====
+
+class SimulatedWristband:
+    """
+    A wristband that sends binary gesture frames at rate_hz once subscribed
+
+    The frame timestamp field carries a per-device counter, so the host can
+    look up when each notification was sent in sent_at. With rate_hz=None
+    it stays silent and the caller drives notify() (see the replay harness).
+    """
+
+    def __init__(self, name, address, rate_hz=2.0, seed=0, advertising_interval=0.1):
+        self.name = name
+        self.address = address
+        self.rate_hz = rate_hz
+        self.rng = np.random.default_rng(seed)
+        # When a scan first hears this wristband, relative to scan start
+        self.advertising_interval = advertising_interval
+        self.first_heard = self.rng.uniform(0, advertising_interval)
+        self.advertising = True
+        self.client = None
+        self.callbacks = {}
+        self.commands = []
+        self.sent_at = {}
+        self.counter = 0
+        self.task = None
+
+    def attach(self, client):
+        self.client = client
+        self.advertising = False
+
+    def detach(self):
+        self.stop()
+        self.client = None
+        self.callbacks = {}
+        self.advertising = True
+
+    def subscribe(self, uuid, callback):
+        self.callbacks[uuid] = callback
+        if uuid == GESTURE_CHAR_UUID and self.task is None and self.rate_hz:
+            self.task = asyncio.create_task(self.emit())
+
+    def notify(self, uuid, data):
+        callback = self.callbacks.get(uuid)
+        if callback is not None:
+            callback(None, bytearray(data))
+
+    async def emit(self):
+        interval = 1.0 / self.rate_hz
+        # Stagger devices so they don't all fire on the same tick
+        await asyncio.sleep(self.rng.uniform(0, interval))
+        while True:
+            self.counter += 1
+            gesture = str(self.rng.choice(HTTP_GESTURES))
+            pitch, roll = self.rng.uniform(-90, 90, 2)
+            self.sent_at[self.counter] = time.perf_counter()
+            self.notify(GESTURE_CHAR_UUID, encode_gesture(gesture, 0.9, self.counter, pitch, roll))
+            await asyncio.sleep(interval)
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def drop_connection(self):
+        """
+        Simulate the link going away (out of range, power loss)
+        """
+        client = self.client
+        self.detach()
+        if client is not None:
+            client.link_lost()
+
+
+class SimulatedBLE:
+    """
+    Stand-ins for BleakScanner and BleakClient backed by SimulatedWristbands
+
+    Pass .scanner_class and .client_class to OpenMuscleBLEClient (or
+    MultiDeviceReceiver). discover() takes its whole timeout like Bleak's;
+    find_device_by_filter() returns when the first matching wristband is
+    heard. Connecting takes connect_seconds, or fails after the connect
+    timeout when nothing is advertising at that address.
+    """
+
+    def __init__(self, wristbands, connect_seconds=0.01):
+        self.wristbands = {w.address: w for w in wristbands}
+        self.connect_seconds = connect_seconds
+        self.scans = 0
+        backend = self
+
+        def advertisements():
+            return sorted((w for w in backend.wristbands.values() if w.advertising),
+                          key=lambda w: w.first_heard)
+
+        class Scanner:
+            @staticmethod
+            async def discover(timeout=10.0, **kwargs):
+                backend.scans += 1
+                await asyncio.sleep(timeout)
+                return [SimpleNamespace(name=w.name, address=w.address) for w in advertisements()]
+
+            @staticmethod
+            async def find_device_by_filter(filterfunc, timeout=10.0, **kwargs):
+                backend.scans += 1
+                for w in advertisements():
+                    device = SimpleNamespace(name=w.name, address=w.address)
+                    if w.first_heard <= timeout and filterfunc(device, SimpleNamespace(local_name=w.name)):
+                        await asyncio.sleep(w.first_heard)
+                        return device
+                await asyncio.sleep(timeout)
+                return None
+
+        class Client:
+            def __init__(self, address, disconnected_callback=None, **kwargs):
+                self.address = address
+                self.disconnected_callback = disconnected_callback
+                self.is_connected = False
+
+            async def connect(self, timeout=10.0, **kwargs):
+                wristband = backend.wristbands.get(self.address)
+                if wristband is None or not wristband.advertising:
+                    await asyncio.sleep(timeout)
+                    raise TimeoutError(f"Device with address {self.address} was not found")
+                await asyncio.sleep(backend.connect_seconds)
+                wristband.attach(self)
+                self.is_connected = True
+                return True
+
+            async def disconnect(self):
+                if self.is_connected:
+                    self.is_connected = False
+                    backend.wristbands[self.address].detach()
+                return True
+
+            def link_lost(self):
+                self.is_connected = False
+                if self.disconnected_callback is not None:
+                    self.disconnected_callback(self)
+
+            async def start_notify(self, uuid, callback, **kwargs):
+                backend.wristbands[self.address].subscribe(uuid, callback)
+
+            async def write_gatt_char(self, uuid, data, **kwargs):
+                backend.wristbands[self.address].commands.append(bytes(data))
+
+        self.scanner_class = Scanner
+        self.client_class = Client
+
+    def rotate_address(self, wristband, address):
+        """
+        Give a wristband a new address (e.g. a resolvable private address)
+        """
+        del self.wristbands[wristband.address]
+        wristband.address = address
+        self.wristbands[address] = wristband
+
+    def stop(self):
+        for wristband in self.wristbands.values():
+            wristband.stop()
+
+
+def simulated_wristbands(count, rate_hz, seed=0):
+    return [SimulatedWristband(f"OpenMuscle-FlexGrid-{i:02d}", f"SIM:00:00:00:{i // 256:02X}:{i % 256:02X}",
+                               rate_hz, seed + i)
+            for i in range(count)]
+
+
+# ===== HELPERS =====
+
+def stub_config(server, **overrides):
+    """
+    Copy of the receiver CONFIG pointed at a stub server (Home Assistant only, no debounce)
+    """
+    config = dict(CONFIG)
+    config.update({
+        "philips_hue_bridge": None,
+        "philips_hue_token": None,
+        "home_assistant_url": server.url,
+        "home_assistant_token": "load-test",
+        # Every event reaches the hub
+        "gesture_recognition": dict(CONFIG["gesture_recognition"], debounce_time_seconds=0),
+    })
+    config.update(overrides)
+    return config
+
+
+def latency_summary(latencies):
+    """
+    p50/p90/p99/max in milliseconds for a list of latencies in seconds
+    """
+    ms = np.asarray(latencies) * 1000
+    return {
+        "count": int(len(ms)),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def print_summary(name, summary):
+    print(f"  {name:<24} p50 {summary['p50_ms']:7.2f} ms   "
+          f"p99 {summary['p99_ms']:7.2f} ms   max {summary['max_ms']:7.2f} ms")
+
+
+async def time_calls(call, n):
+    """
+    Await call() n times back to back, returning each latency in seconds
+    """
+    latencies = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+# ===== HTTP SESSION BENCHMARK =====
+
+async def run_http_benchmark(args):
+    """
+    Fire the same Home Assistant action with a session per call and pooled
+    """
+    server = await StubActionServer(delay=args.server_delay_ms / 1000).start()
+    config = stub_config(server)
+    url = f"{server.url}/api/services/light/turn_on"
+    payload = {"entity_id": "light.ceiling_light"}
+    headers = {"Authorization": "Bearer load-test", "Content-Type": "application/json"}
+
+    async def per_call_session():
+        # What every action did before the controller owned a session
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=payload, headers=headers) as response:
+                await response.read()
+
+    controller = GestureActionController(config)
+    await controller.start()
+    # The request the dispatch table binds for a control_light action
+    request = controller.bind_home_assistant(resolve_backends(config)["home_assistant"], "light.turn_on",
+                                             payload["entity_id"], "control_light")
+
+    async def pooled():
+        with contextlib.redirect_stdout(io.StringIO()):
+            await request()
+
+    print(f"Stub server at {server.url} (delay {args.server_delay_ms} ms), "
+          f"{args.requests} requests per mode\n")
+
+    results = {}
+    try:
+        for name, call in (("per-call session", per_call_session), ("pooled session", pooled)):
+            await time_calls(call, args.warmup)
+            before = len(server.connections)
+            results[name] = latency_summary(await time_calls(call, args.requests))
+            results[name]["connections"] = len(server.connections) - before
+            print_summary(name, results[name])
+    finally:
+        await controller.close()
+        await server.stop()
+
+    base, pool = results["per-call session"], results["pooled session"]
+    print(f"\n  TCP connections opened: {base['connections']} → {pool['connections']}")
+    print(f"  p50 speedup: {base['p50_ms'] / pool['p50_ms']:.2f}x, "
+          f"p99 speedup: {base['p99_ms'] / pool['p99_ms']:.2f}x")
+    return results
+
+
+# ===== EVENT QUEUE BENCHMARK =====
+
+def synthetic_gesture_stream(num_events, rng, repeat_max=3):
+    """
+    Gesture names with runs of repeats, as a classifier emits while a pose is held
+    """
+    events = []
+    while len(events) < num_events:
+        gesture = str(rng.choice(HTTP_GESTURES))
+        events.extend([gesture] * int(rng.integers(1, repeat_max + 1)))
+    return events[:num_events]
+
+
+async def run_queue_scenario(mode, controller, args, seed):
+    """
+    Replay notification bursts from several devices through one dispatch mode
+    
+    "unbounded" is the old create_task-per-notification behaviour; any other
+    mode is a GestureEventQueue overflow policy.
+    """
+    rng = np.random.default_rng(seed)
+    devices = [f"wristband-{i}" for i in range(args.devices)]
+    streams = {d: synthetic_gesture_stream(args.events, rng) for d in devices}
+    completed = {d: [] for d in devices}
+    latencies = []
+    in_flight = {"now": 0, "peak": 0}
+
+    async def handler(data, device_id=None):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        try:
+            await controller.handle_gesture(data, device_id)
+        finally:
+            in_flight["now"] -= 1
+            completed[data["device"]].append(data["seq"])
+            latencies.append(time.perf_counter() - data["sent_at"])
+
+    queue = None
+    tasks = []
+    if mode == "unbounded":
+        def dispatch(device, data):
+            tasks.append(asyncio.create_task(handler(data, device)))
+    else:
+        queue = GestureEventQueue(handler, max_size=args.max_size,
+                                  workers=args.workers, overflow=mode)
+        queue.start()
+        dispatch = queue.put_nowait
+
+    t0 = time.perf_counter()
+    for seq in range(args.events):
+        for device in devices:
+            dispatch(device, {"device": device, "seq": seq, "gesture": streams[device][seq],
+                              "confidence": 0.9, "sent_at": time.perf_counter()})
+        await asyncio.sleep(args.interval_ms / 1000)
+
+    if queue is not None:
+        await queue.join()
+        stats = queue.snapshot()
+        await queue.stop()
+    else:
+        await asyncio.gather(*tasks)
+        stats = {"dropped": 0, "coalesced": 0, "max_depth": in_flight["peak"]}
+    elapsed = time.perf_counter() - t0
+
+    out_of_order = sum(int(np.sum(np.diff(seqs) < 0)) for seqs in completed.values())
+    sent = args.devices * args.events
+    return {
+        "sent": sent,
+        "handled": sum(len(seqs) for seqs in completed.values()),
+        "dropped": stats["dropped"],
+        "coalesced": stats["coalesced"],
+        "max_depth": stats["max_depth"],
+        "peak_concurrency": in_flight["peak"],
+        "out_of_order": out_of_order,
+        "elapsed_s": elapsed,
+        **latency_summary(latencies),
+    }
+
+
+async def run_queue_benchmark(args):
+    server = await StubActionServer(delay=args.server_delay_ms / 1000,
+                                    jitter=args.server_jitter_ms / 1000,
+                                    seed=args.seed).start()
+    controller = GestureActionController(stub_config(server))
+    await controller.start()
+
+    print(f"{args.devices} devices × {args.events} events every {args.interval_ms} ms, "
+          f"hub delay {args.server_delay_ms}+{args.server_jitter_ms} ms, queue {args.max_size}/shard × {args.workers} workers\n")
+    print(f"  {'mode':<12} {'handled':>8} {'dropped':>8} {'merged':>7} {'depth':>6} "
+          f"{'conc':>5} {'reorder':>8} {'p50 ms':>8} {'p99 ms':>8}")
+
+    results = {}
+    try:
+        for mode in ["unbounded"] + list(GestureEventQueue.OVERFLOW_POLICIES):
+            with contextlib.redirect_stdout(io.StringIO()):
+                r = await run_queue_scenario(mode, controller, args, args.seed)
+            results[mode] = r
+            print(f"  {mode:<12} {r['handled']:>8} {r['dropped']:>8} {r['coalesced']:>7} "
+                  f"{r['max_depth']:>6} {r['peak_concurrency']:>5} {r['out_of_order']:>8} "
+                  f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+    finally:
+        await controller.close()
+        await server.stop()
+    return results
+
+
+# ===== DECODE BENCHMARK =====
+
+def synthetic_notifications(num_frames, rng):
+    """
+    The same gestures as firmware v1.0 JSON and as binary v1 frames
+    """
+    json_frames, binary_frames = [], []
+    for i in range(num_frames):
+        gesture = GESTURE_LABELS[int(rng.integers(len(GESTURE_LABELS)))]
+        confidence = round(float(rng.uniform(0.75, 1.0)), 6)
+        pitch, roll = (round(float(v), 2) for v in rng.uniform(-90, 90, 2))
+        timestamp = 1000 + 20 * i
+        json_frames.append(bytearray(json.dumps({
+            "gesture": gesture, "confidence": confidence, "timestamp": timestamp,
+            "imu": {"pitch": pitch, "roll": roll, "yaw": 0.0},
+        }, separators=(',', ':')).encode('utf-8')))
+        binary_frames.append(bytearray(encode_gesture(gesture, confidence, timestamp, pitch, roll)))
+    return json_frames, binary_frames
+
+
+def run_decode_benchmark(args):
+    """
+    Frames per second through decode_gesture() for each wire format
+    """
+    rng = np.random.default_rng(args.seed)
+    json_frames, binary_frames = synthetic_notifications(args.frames, rng)
+
+    # Both formats must agree on what was sent (within quantization)
+    for a, b in zip(json_frames[:1000], binary_frames[:1000]):
+        ja, jb = decode_gesture(a), decode_gesture(b)
+        assert ja["gesture"] == jb["gesture"] and ja["timestamp"] == jb["timestamp"]
+        assert abs(ja["confidence"] - jb["confidence"]) <= 0.5 / 255 + 1e-9
+        assert abs(ja["imu"]["pitch"] - jb["imu"]["pitch"]) <= 0.005 + 1e-9
+
+    print(f"Decoding {args.frames} gesture notifications (best of {args.repeat})\n")
+    results = {}
+    for name, frames in (("json", json_frames), ("binary", binary_frames)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            for frame in frames:
+                decode_gesture(frame)
+            best = min(best, time.perf_counter() - t0)
+        results[name] = {
+            "bytes_per_frame": float(np.mean([len(f) for f in frames])),
+            "us_per_frame": best / len(frames) * 1e6,
+            "frames_per_second": len(frames) / best,
+        }
+        r = results[name]
+        print(f"  {name:<8} {r['bytes_per_frame']:6.1f} B/frame   {r['us_per_frame']:6.2f} µs/frame   "
+              f"{r['frames_per_second']:>12,.0f} frames/s")
+
+    print(f"\n  binary is {results['json']['us_per_frame'] / results['binary']['us_per_frame']:.1f}x faster "
+          f"and {results['json']['bytes_per_frame'] / results['binary']['bytes_per_frame']:.1f}x smaller")
+    return results
+
+
+# ===== RAW STREAM BENCHMARK =====
+
+def firmware_raw_frame(sensor_matrix, imu, sequence, timestamp):
+    """
+    One raw frame packed the way sendRawFrame() does in the firmware
+
+    sensor_matrix is the firmware's sensorMatrix[4][15]; this mirrors its
+    loops byte for byte so the host decoder can be checked against it.
+    """
+    num_cols = sensor_matrix.shape[1]
+    frame = bytearray(112)
+    frame[0:2] = b"\xA5\x5A"
+    frame[2] = 1
+    frame[4:6] = struct.pack("<H", sequence & 0xFFFF)
+    frame[6:10] = struct.pack("<I", timestamp & 0xFFFFFFFF)
+    i = 10
+    for s in range(0, sensor_matrix.size, 2):
+        a = int(sensor_matrix[s // num_cols, s % num_cols]) & 0x0FFF
+        b = int(sensor_matrix[(s + 1) // num_cols, (s + 1) % num_cols]) & 0x0FFF
+        frame[i:i + 3] = bytes([a & 0xFF, (a >> 8) | ((b & 0x0F) << 4), b >> 4])
+        i += 3
+    scales = (1000.0, 1000.0, 1000.0, 10.0, 10.0, 10.0)
+    for axis, (value, scale) in enumerate(zip(imu, scales)):
+        frame[100 + 2 * axis:102 + 2 * axis] = struct.pack("<h", int(value * scale))
+    frame[3] = sum(frame[4:]) & 0xFF
+    return bytes(frame)
+
+
+def check_firmware_raw_layout(rng, num_frames=50):
+    """
+    Firmware-packed frames must equal pack_raw_frames() and decode row-major
+    """
+    matrices = rng.integers(0, 4096, size=(num_frames, 4, 15))
+    # Exact binary fractions, so the firmware's truncation and the host's rounding agree
+    imu = np.concatenate([rng.integers(-64, 64, (num_frames, 3)) / 8,
+                          rng.integers(-4000, 4000, (num_frames, 3)) / 2], axis=1)
+    timestamps = np.arange(num_frames) * 20
+    firmware = b"".join(firmware_raw_frame(m, v, i, int(t))
+                        for i, (m, v, t) in enumerate(zip(matrices, imu, timestamps)))
+    sensors = matrices.reshape(num_frames, -1)
+    if firmware != pack_raw_frames(sensors, imu, timestamps=timestamps):
+        raise AssertionError("Firmware raw frame layout differs from pack_raw_frames()")
+    _, _, X = unpack_raw_frames(firmware, num_frames)
+    if not np.array_equal(X[:, :60], sensors):
+        raise AssertionError("Raw frames do not decode to the row-major sensor matrix")
+
+
+def run_raw_benchmark(args):
+    """
+    Replay a synthetic capture as raw-frame notifications through host inference
+    
+    Without --model_dir a Random Forest is trained on synthetic data first
+    (same generator as ml_training/benchmarks.py), so the labels line up
+    with the replayed capture and accuracy can be checked too.
+    """
+    if ML_TRAINING_DIR not in sys.path:
+        sys.path.insert(0, ML_TRAINING_DIR)
+    import benchmarks as ml_benchmarks
+
+    check_firmware_raw_layout(np.random.default_rng(args.seed))
+    print("✓ Firmware raw frame layout matches gesture_protocol")
+
+    num_frames = int(args.seconds * 50)
+    # Same seed as the synthetic model: same gesture patterns, a different
+    # segment sequence and noise because the capture length differs
+    X, y = ml_benchmarks.make_synthetic_capture(num_frames, seed=args.seed)
+    stream = pack_raw_frames(X[:, :60], X[:, 60:])
+    notifications = [stream[i:i + args.chunk_bytes] for i in range(0, len(stream), args.chunk_bytes)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = args.model_dir
+        if model_dir is None:
+            print("Training a synthetic Random Forest for the replay...")
+            model_dir = tmp
+            with contextlib.redirect_stdout(io.StringIO()):
+                ml_benchmarks.save_synthetic_artifacts(model_dir, seed=args.seed)
+        raw_config = dict(CONFIG["raw_stream"], stride=args.stride, confidence_threshold=0.0)
+        inference = RawStreamInference.from_config({"raw_stream": raw_config}, model_dir, args.model_type)
+
+    predicted = []
+    busy = 0.0
+    for data in notifications:
+        t0 = time.perf_counter()
+        before = inference.predictions
+        inference.feed(data, received_at=t0)
+        busy += time.perf_counter() - t0
+        if inference.predictions > before:
+            predicted.append((inference.assembler.frames - 1, inference.last_prediction[0]))
+
+    s = inference.snapshot()
+    frame_rate = s["frames"] / busy
+    print(f"\n{s['frames']} frames ({args.seconds:.0f} s at 50 Hz) in {len(notifications)} "
+          f"notifications of {args.chunk_bytes} B, model {inference.classifier.model_type}, "
+          f"stride {args.stride}\n")
+    print(f"  sustainable frame rate   {frame_rate:10,.0f} Hz  ({frame_rate / 50:.0f}x the 50 Hz stream)")
+    print(f"  predictions              {s['predictions']:10d}  ({s['predictions'] / args.seconds:.0f} per second of data)")
+    print(f"  frame→gesture latency    p50 {s['latency_p50_ms']:.3f} ms   p99 {s['latency_p99_ms']:.3f} ms")
+    print(f"  lost / corrupt frames    {s['lost_frames']} / {s['corrupt_frames']}")
+
+    if args.model_dir is None and predicted:
+        # Score against the label at the end of each predicted window
+        frames, labels = zip(*predicted)
+        truth = np.array([f"gesture_{label}" for label in y[list(frames)]])
+        print(f"  window accuracy          {np.mean(truth == np.array(labels)):.3f}")
+    return s
+
+
+# ===== MULTI-DEVICE FAN-IN =====
+
+async def run_fanin_scenario(num_devices, args):
+    """
+    N simulated wristbands through one MultiDeviceReceiver and event queue
+    """
+    server = await StubActionServer(delay=args.server_delay_ms / 1000, seed=args.seed).start()
+    controller = GestureActionController(stub_config(server))
+    await controller.start()
+
+    wristbands = simulated_wristbands(num_devices, args.rate_hz, args.seed)
+    by_address = {w.address: w for w in wristbands}
+    backend = SimulatedBLE(wristbands)
+    latencies = []
+
+    async def handler(data, device_id=None):
+        await controller.handle_gesture(data, device_id)
+        latencies.append(time.perf_counter() - by_address[device_id].sent_at[data["timestamp"]])
+
+    queue = GestureEventQueue(handler, max_size=args.max_size, workers=args.workers, overflow="drop_oldest")
+    queue.start()
+    # Every wristband advertises the same name prefix; claims keep them apart
+    receiver = MultiDeviceReceiver(["OpenMuscle-FlexGrid"] * num_devices, controller, queue,
+                                   device_config=CONFIG["device"],
+                                   scanner_class=backend.scanner_class,
+                                   client_class=backend.client_class)
+
+    t0 = time.perf_counter()
+    receiver.start()
+    while receiver.connected_count < num_devices:
+        await asyncio.sleep(0.005)
+    connect_time = time.perf_counter() - t0
+
+    await asyncio.sleep(args.seconds)
+    backend.stop()
+    await queue.join()
+    stats = queue.snapshot()
+    await receiver.stop()
+    await queue.stop()
+    await controller.close()
+    await server.stop()
+
+    sent = sum(w.counter for w in wristbands)
+    return {
+        "devices": num_devices,
+        "connect_all_s": connect_time,
+        "sent": sent,
+        "handled": len(latencies),
+        "dropped": stats["dropped"],
+        "events_per_second": len(latencies) / args.seconds,
+        **latency_summary(latencies),
+    }
+
+
+async def run_fanin_benchmark(args):
+    print(f"Simulated wristbands at {args.rate_hz} gestures/s each for {args.seconds} s, "
+          f"hub delay {args.server_delay_ms} ms, {args.workers} queue workers\n")
+    print(f"  {'devices':>7} {'connect s':>10} {'sent':>7} {'handled':>8} {'dropped':>8} "
+          f"{'events/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    results = []
+    for num_devices in args.device_counts:
+        with contextlib.redirect_stdout(io.StringIO()):
+            r = await run_fanin_scenario(num_devices, args)
+        results.append(r)
+        print(f"  {r['devices']:>7} {r['connect_all_s']:>10.2f} {r['sent']:>7} {r['handled']:>8} "
+              f"{r['dropped']:>8} {r['events_per_second']:>9.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+    return results
+
+
+# ===== RECONNECT BENCHMARK =====
+
+async def legacy_reconnect(backend, name, scan_timeout, rng):
+    """
+    What main() did before: notice within a 1 s poll, full scan, connect
+    """
+    await asyncio.sleep(rng.uniform(0, 1.0))
+    devices = await backend.scanner_class.discover(timeout=scan_timeout)
+    device = next(d for d in devices if d.name and name in d.name)
+    client = backend.client_class(device.address)
+    await client.connect()
+    return client
+
+
+async def run_reconnect_scenario(mode, args):
+    """
+    Drop the link args.trials times and time until the receiver is back
+    
+    "cached" keeps the wristband's address, "rotated" changes it on every
+    drop (forcing the scan fallback) and "legacy" replays the old loop.
+    """
+    rng = np.random.default_rng(args.seed)
+    wristband = SimulatedWristband("OpenMuscle-FlexGrid", "SIM:00:00:00:00:00", rate_hz=0.1,
+                                   seed=args.seed, advertising_interval=args.advertising_ms / 1000)
+    backend = SimulatedBLE([wristband], connect_seconds=args.connect_ms / 1000)
+    device_config = dict(CONFIG["device"], reconnect_attempts=0,
+                         scan_timeout_seconds=args.scan_timeout,
+                         connect_timeout_seconds=args.connect_timeout)
+
+    async def ignore(gesture_data, device_id=None):
+        pass
+
+    queue = GestureEventQueue(ignore)
+    queue.start()
+    client = OpenMuscleBLEClient(wristband.name, None, queue, device_config=device_config,
+                                 scanner_class=backend.scanner_class,
+                                 client_class=backend.client_class)
+    task = asyncio.create_task(client.run()) if mode != "legacy" else None
+    legacy_client = None
+
+    times = []
+    for trial in range(args.trials):
+        if task is not None:
+            while not client.connected:
+                await asyncio.sleep(0.001)
+        elif legacy_client is None:
+            legacy_client = await legacy_reconnect(backend, wristband.name, args.scan_timeout, rng)
+        await asyncio.sleep(0.05)
+
+        t0 = time.perf_counter()
+        wristband.drop_connection()
+        wristband.first_heard = rng.uniform(0, args.advertising_ms / 1000)
+        if mode == "rotated":
+            backend.rotate_address(wristband, f"SIM:00:00:00:01:{trial:02X}")
+
+        if task is not None:
+            while not client.connected:
+                await asyncio.sleep(0.001)
+        else:
+            legacy_client = await legacy_reconnect(backend, wristband.name, args.scan_timeout, rng)
+        times.append(time.perf_counter() - t0)
+
+    if task is not None:
+        client.stop()
+        await task
+        await client.disconnect()
+    backend.stop()
+    await queue.stop(drain=False)
+    return {"times": times, "scans": backend.scans}
+
+
+async def run_reconnect_benchmark(args):
+    print(f"{args.trials} dropped links per mode; scan timeout {args.scan_timeout} s, "
+          f"connect timeout {args.connect_timeout} s, advertising every {args.advertising_ms} ms\n")
+    print(f"  {'mode':<8} {'p50 s':>8} {'mean s':>8} {'max s':>8} {'scans':>6}")
+    results = {}
+    for mode in ("legacy", "rotated", "cached"):
+        with contextlib.redirect_stdout(io.StringIO()):
+            r = await run_reconnect_scenario(mode, args)
+        results[mode] = r
+        times = np.asarray(r["times"])
+        print(f"  {mode:<8} {np.median(times):>8.3f} {times.mean():>8.3f} {times.max():>8.3f} {r['scans']:>6}")
+    return results
+
+
+# ===== CONFIG HOT RELOAD =====
+
+async def run_reload_benchmark(args):
+    """
+    Stream gestures through the queue while the config file keeps changing
+    
+    Each rewrite flips which light point_up controls; every event must still
+    be handled, by either the old or the new table.
+    """
+    server = await StubActionServer(delay=args.server_delay_ms / 1000).start()
+    base = stub_config(server)
+    controller = GestureActionController(base)
+    await controller.start()
+    handled = []
+
+    async def handler(data, device_id=None):
+        await controller.handle_gesture(data, device_id)
+        handled.append(data["seq"])
+
+    queue = GestureEventQueue(handler, max_size=args.events, workers=2, overflow="drop_newest")
+    queue.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "config.json")
+        reloader = ConfigReloader(path, controller, interval=args.check_ms / 1000)
+
+        def write_config(version):
+            actions = dict(CONFIG["gesture_actions"],
+                           point_up={"action": "light", "target": f"light_{version}", "state": "on"})
+            with open(path, "w") as f:
+                json.dump({key: base[key] for key in ("philips_hue_bridge", "philips_hue_token",
+                                                      "home_assistant_url", "home_assistant_token",
+                                                      "gesture_recognition")}
+                          | {"gesture_actions": actions}, f)
+            # Distinct mtimes even on coarse-timestamp filesystems
+            os.utime(path, ns=(version * 10**9, version * 10**9))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            write_config(0)
+            reloader.check()
+            reloader.start()
+
+            interval = args.seconds / args.events
+            next_reload = args.events // (args.reloads + 1)
+            version = 0
+            t0 = time.perf_counter()
+            for seq in range(args.events):
+                queue.put_nowait("wristband", {"gesture": "point_up", "confidence": 0.9, "seq": seq})
+                if seq == next_reload and version < args.reloads:
+                    version += 1
+                    write_config(version)
+                    next_reload += args.events // (args.reloads + 1)
+                await asyncio.sleep(interval)
+            await queue.join()
+            elapsed = time.perf_counter() - t0
+            await asyncio.sleep(2 * args.check_ms / 1000)
+            await reloader.stop()
+
+    stats = queue.snapshot()
+    await queue.stop()
+    await controller.close()
+    await server.stop()
+
+    print(f"{args.events} gestures over {elapsed:.1f} s with {version} config rewrites "
+          f"(checked every {args.check_ms} ms)\n")
+    print(f"  tables swapped in   {reloader.reloads - 1}")
+    print(f"  handled             {len(handled)} / {args.events}")
+    print(f"  dropped             {stats['dropped']}")
+    print(f"  hub requests        {server.requests}")
+    print(f"  in order            {handled == sorted(handled)}")
+    return {"handled": len(handled), "reloads": reloader.reloads - 1, "dropped": stats["dropped"]}
+
+
+# ===== REPLAY HARNESS =====
+
+def load_recording(path):
+    """
+    Gesture events from a JSONL recording, e.g. logs/gesture_history.jsonl
+
+    Each line needs "gesture"; "confidence", "imu" and "time" (seconds) are
+    optional. Returns a list of (offset seconds or None, gesture dict).
+    """
+    events = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            events.append((record.get("time"), {
+                "gesture": record["gesture"],
+                "confidence": record.get("confidence", 1.0),
+                "imu": record.get("imu", {}),
+            }))
+    first = next((t for t, _ in events if t is not None), None)
+    return [(t - first if t is not None and first is not None else None, e) for t, e in events]
+
+
+def synthetic_recording(num_events, rng):
+    """
+    Random mapped gestures with realistic confidences, no timing
+    """
+    return [(None, {"gesture": gesture, "confidence": float(rng.uniform(0.8, 1.0)),
+                    "imu": {"pitch": float(rng.uniform(-90, 90)), "roll": float(rng.uniform(-90, 90))}})
+            for gesture in synthetic_gesture_stream(num_events, rng, repeat_max=1)]
+
+
+def encode_notification(event, seq, wire_format):
+    """
+    Notification bytes for a gesture; the timestamp field carries seq
+    """
+    imu = event.get("imu") or {}
+    if wire_format == "json":
+        return json.dumps({"gesture": event["gesture"], "confidence": event["confidence"],
+                           "timestamp": seq, "imu": imu}).encode('utf-8')
+    return encode_gesture(event["gesture"], event["confidence"], seq, imu.get("pitch"), imu.get("roll"))
+
+
+async def run_replay(events, rate, args):
+    """
+    One replay run through wristband → client → queue → controller → stub hub
+    
+    rate=None replays recorded offsets (scaled by args.speed).
+    """
+    server = await StubActionServer(delay=args.server_delay_ms / 1000, jitter=args.server_jitter_ms / 1000,
+                                    error_rate=args.error_rate, seed=args.seed).start()
+    config = stub_config(server)
+    config["gesture_recognition"] = dict(config["gesture_recognition"],
+                                         debounce_time_seconds=args.debounce)
+    controller = GestureActionController(config)
+    await controller.start()
+
+    wristbands = simulated_wristbands(args.devices, None, args.seed)
+    backend = SimulatedBLE(wristbands)
+    sent_at = {}
+    latencies = []
+
+    async def handler(data, device_id=None):
+        await controller.handle_gesture(data, device_id)
+        latencies.append(time.perf_counter() - sent_at[data["timestamp"]])
+
+    queue = GestureEventQueue(handler, max_size=args.max_size, workers=args.workers, overflow=args.overflow)
+    queue.start()
+    receiver = MultiDeviceReceiver(["OpenMuscle-FlexGrid"] * args.devices, controller, queue,
+                                   device_config=CONFIG["device"],
+                                   scanner_class=backend.scanner_class,
+                                   client_class=backend.client_class)
+    receiver.start()
+    while receiver.connected_count < args.devices:
+        await asyncio.sleep(0.005)
+
+    t0 = time.perf_counter()
+    for seq, (offset, event) in enumerate(events):
+        due = offset / args.speed if rate is None else seq / rate
+        delay = t0 + due - time.perf_counter()
+        if delay > 0.001:
+            await asyncio.sleep(delay)
+        sent_at[seq] = time.perf_counter()
+        # Straight into the client's Bleak callback, as a notification would
+        wristbands[seq % args.devices].notify(GESTURE_CHAR_UUID, encode_notification(event, seq, args.format))
+        if delay <= 0.001 and seq % 64 == 63:
+            await asyncio.sleep(0)  # let the workers run during catch-up bursts
+    send_time = time.perf_counter() - t0
+
+    await queue.join()
+    elapsed = time.perf_counter() - t0
+    queue_stats = queue.snapshot()
+    await receiver.stop()
+    await queue.stop()
+    await controller.close()
+    await server.stop()
+
+    actions = controller.stats["actions"]
+    return {
+        "offered_per_second": len(events) / send_time if send_time else float("inf"),
+        "sent": len(events),
+        "handled": len(latencies),
+        "dropped": queue_stats["dropped"],
+        "coalesced": queue_stats["coalesced"],
+        "actions": actions,
+        "failed": controller.stats["failed"],
+        "error_rate": controller.stats["failed"] / actions if actions else 0.0,
+        "throughput_per_second": len(latencies) / elapsed,
+        **latency_summary(latencies or [0.0]),
+    }
+
+
+async def run_replay_benchmark(args):
+    rng = np.random.default_rng(args.seed)
+    if args.input:
+        events = load_recording(args.input)
+        timed = all(offset is not None for offset, _ in events)
+        runs = args.rates or ([None] if timed else [50.0])
+        source = f"{len(events)} recorded gestures from {args.input}"
+    else:
+        runs = args.rates or [10, 50, 100, 200, 500, 1000]
+        source = f"synthetic gestures, {args.seconds} s per rate"
+
+    print(f"Replaying {source} ({args.format} frames, {args.devices} device(s)); hub delay "
+          f"{args.server_delay_ms}+{args.server_jitter_ms} ms, error rate {args.error_rate}, "
+          f"{args.workers} workers\n")
+    print(f"  {'offered/s':>9} {'handled':>8} {'dropped':>8} {'errors':>7} {'thruput/s':>10} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+
+    results = []
+    for rate in runs:
+        run_events = events if args.input else synthetic_recording(max(1, int(rate * args.seconds)), rng)
+        with contextlib.redirect_stdout(io.StringIO()):
+            r = await run_replay(run_events, rate, args)
+        r["rate"] = rate
+        results.append(r)
+        print(f"  {r['offered_per_second']:>9.0f} {r['handled']:>8} {r['dropped']:>8} "
+              f"{r['error_rate']:>6.1%} {r['throughput_per_second']:>10.0f} {r['p50_ms']:>8.2f} "
+              f"{r['p90_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['max_ms']:>8.2f}")
+
+    # Ceiling: best throughput among runs that lost under 1% of events
+    sustained = [r for r in results if r["dropped"] <= 0.01 * r["sent"]]
+    if sustained:
+        print(f"\n  throughput ceiling ≈ {max(r['throughput_per_second'] for r in sustained):.0f} gestures/s "
+              f"(<1% dropped)")
+
+    failures = []
+    for r in results:
+        if args.max_p99_ms is not None and r["p99_ms"] > args.max_p99_ms:
+            failures.append(f"p99 {r['p99_ms']:.1f} ms > {args.max_p99_ms} ms at {r['offered_per_second']:.0f}/s")
+        if args.max_error_rate is not None and r["error_rate"] > args.max_error_rate:
+            failures.append(f"error rate {r['error_rate']:.2%} > {args.max_error_rate:.2%} "
+                            f"at {r['offered_per_second']:.0f}/s")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"  ✓ Results saved to {args.output}")
+    if failures:
+        for failure in failures:
+            print(f"  ✗ {failure}")
+        sys.exit(1)
+    return results
+
+
+# ===== MQTT BACKEND =====
+
+def mqtt_config(broker, qos, max_offline=100):
+    """
+    Receiver config whose lights are driven over MQTT only
+    """
+    config = dict(CONFIG, philips_hue_bridge=None, philips_hue_token=None,
+                  home_assistant_url=None, home_assistant_token=None,
+                  gesture_recognition=dict(CONFIG["gesture_recognition"], debounce_time_seconds=0))
+    config["smart_home"] = {"mqtt": {
+        "enabled": True,
+        "broker": broker.host,
+        "port": broker.port,
+        "client_id": "load-test",
+        "max_offline_messages": max_offline,
+        "max_inflight_messages": 100,
+        "topics": {"light_control": {"topic": "home/livingroom/light", "qos": qos}},
+    }}
+    return config
+
+
+async def wait_for(condition, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("condition not met")
+        await asyncio.sleep(0.001)
+
+
+async def measure_backend(controller, arrivals, args):
+    """
+    Sequential gestures: time until handle_gesture returns and until the
+    hub/broker sees the message; then a back-to-back burst for throughput
+    """
+    gesture = {"gesture": "point_up", "confidence": 0.9}
+    returned, delivered = [], []
+    for _ in range(args.events):
+        seen = len(arrivals)
+        t0 = time.perf_counter()
+        await controller.handle_gesture(gesture, "wristband")
+        returned.append(time.perf_counter() - t0)
+        await wait_for(lambda: len(arrivals) > seen)
+        delivered.append(arrivals[seen] - t0)
+
+    seen = len(arrivals)
+    t0 = time.perf_counter()
+    for _ in range(args.events):
+        await controller.handle_gesture(gesture, "wristband")
+    await wait_for(lambda: len(arrivals) >= seen + args.events)
+    burst = args.events / (time.perf_counter() - t0)
+    return latency_summary(returned), latency_summary(delivered), burst
+
+
+async def run_mqtt_outage(args):
+    """
+    Publish while the broker is down; queued messages go out on reconnect
+    """
+    broker = await StubMQTTBroker().start()
+    controller = GestureActionController(mqtt_config(broker, 1, args.max_offline))
+    await controller.start()
+    await wait_for(lambda: controller.mqtt.connected)
+
+    port = broker.port
+    await broker.stop()
+    await wait_for(lambda: not controller.mqtt.connected)
+    for _ in range(args.offline_events):
+        await controller.handle_gesture({"gesture": "point_up", "confidence": 0.9}, "wristband")
+    queued = controller.mqtt.snapshot()
+
+    t0 = time.perf_counter()
+    broker = await StubMQTTBroker(port=port).start()
+    await wait_for(lambda: len(broker.received) >= queued["queued"], timeout=60)
+    recovery = time.perf_counter() - t0
+    await wait_for(lambda: controller.mqtt.acked >= queued["queued"])
+    stats = controller.mqtt.snapshot()
+    await controller.close()
+    await broker.stop()
+    return queued, stats, len(broker.received), recovery
+
+
+async def run_mqtt_benchmark(args):
+    rows = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = await StubActionServer(delay=args.server_delay_ms / 1000).start()
+        controller = GestureActionController(stub_config(server))
+        await controller.start()
+        rows.append(("http (Home Assistant)",) + await measure_backend(controller, server.arrivals, args))
+        await controller.close()
+        await server.stop()
+
+        for qos in args.qos:
+            broker = await StubMQTTBroker(ack_delay=args.server_delay_ms / 1000).start()
+            controller = GestureActionController(mqtt_config(broker, qos))
+            await controller.start()
+            await wait_for(lambda: controller.mqtt.connected)
+            rows.append((f"mqtt QoS {qos}",) + await measure_backend(controller, broker.arrivals, args))
+            if qos:
+                await wait_for(lambda: controller.mqtt.acked >= 2 * args.events)
+            await controller.close()
+            await broker.stop()
+
+        outage = await run_mqtt_outage(args)
+
+    print(f"{args.events} light gestures per backend; hub/broker ack delay {args.server_delay_ms} ms\n")
+    print(f"  {'backend':<22} {'action returns':>22} {'hub receives':>22} {'burst':>10}")
+    print(f"  {'':<22} {'p50 ms':>10} {'p99 ms':>11} {'p50 ms':>10} {'p99 ms':>11} {'msgs/s':>10}")
+    for name, returned, delivered, burst in rows:
+        print(f"  {name:<22} {returned['p50_ms']:>10.3f} {returned['p99_ms']:>11.3f} "
+              f"{delivered['p50_ms']:>10.3f} {delivered['p99_ms']:>11.3f} {burst:>10.0f}")
+
+    queued, stats, received, recovery = outage
+    print(f"\nBroker outage: {args.offline_events} gestures while offline "
+          f"(buffer {args.max_offline}, QoS 1)")
+    print(f"  queued              {queued['queued']}")
+    print(f"  dropped (oldest)    {queued['dropped']}")
+    print(f"  delivered after     {received} in {recovery:.2f} s (reconnect + flush)")
+    print(f"  acked               {stats['acked']}")
+    return rows
+
+
+# ===== LOG AND HISTORY WRITER =====
+
+class SlowStream:
+    """
+    Stand-in for a slow terminal or pipe: every write blocks for delay seconds
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.writes = 0
+        self.bytes = 0
+
+    def write(self, text):
+        time.sleep(self.delay)
+        self.writes += 1
+        self.bytes += len(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class DirectHistory:
+    """
+    The unbatched alternative: append and flush one JSONL line per gesture
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        self.file.write(jsonl_line(record))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def count_lines(path):
+    total = 0
+    for name in [path] + [f"{path}.{i}" for i in range(1, 1000)]:
+        if not os.path.exists(name):
+            break
+        with open(name, encoding='utf-8') as f:
+            total += sum(1 for _ in f)
+    return total
+
+
+async def run_history_scenario(mode, rate, args, tmp):
+    """
+    Gestures through the controller at rate/s while a probe measures loop lag
+
+    mode "direct" prints to a slow console and appends history on the event
+    loop; "batched" routes both through BatchedWriter threads.
+    """
+    console = SlowStream(args.sink_delay_ms / 1000)
+    path = os.path.join(tmp, f"history_{mode}_{int(rate)}.jsonl")
+    log_writer = None
+    if mode == "batched":
+        log_writer = BatchedWriter(stream=console, batch_size=args.batch_size,
+                                   flush_interval=args.flush_ms / 1000).start()
+        history = BatchedWriter(path, format=jsonl_line, batch_size=args.batch_size,
+                                flush_interval=args.flush_ms / 1000,
+                                max_bytes=args.max_bytes, backup_count=999).start()
+        stdout = WriterStream(log_writer)
+    else:
+        history = DirectHistory(path)
+        stdout = console
+
+    # Every action is a simulation (no hubs configured), so the work per
+    # gesture is the controller's own printing and history record
+    config = dict(CONFIG, philips_hue_bridge=None, philips_hue_token=None,
+                  home_assistant_url=None, home_assistant_token=None,
+                  gesture_recognition=dict(CONFIG["gesture_recognition"], debounce_time_seconds=0))
+    controller = GestureActionController(config)
+    controller.history = history
+    gestures = synthetic_gesture_stream(int(rate * args.seconds), np.random.default_rng(args.seed))
+
+    lags = []
+    running = True
+
+    async def probe():
+        interval = args.probe_ms / 1000
+        while running:
+            t = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - t - interval)
+
+    with contextlib.redirect_stdout(stdout):
+        probe_task = asyncio.create_task(probe())
+        await asyncio.sleep(0.05)
+        t0 = time.perf_counter()
+        for i, gesture in enumerate(gestures):
+            await controller.handle_gesture({"gesture": gesture, "confidence": 0.9,
+                                             "imu": {"pitch": 10.0, "roll": -5.0}}, "wristband")
+            # Pace to the target rate, yielding to the probe between ticks
+            ahead = t0 + (i + 1) / rate - time.perf_counter()
+            if ahead > 0.001:
+                await asyncio.sleep(ahead)
+            elif i % 32 == 31:
+                await asyncio.sleep(0)
+        elapsed = time.perf_counter() - t0
+        running = False
+        await probe_task
+
+    close_start = time.perf_counter()
+    history.close()
+    if log_writer is not None:
+        log_writer.close()
+    drain = time.perf_counter() - close_start
+
+    return {
+        "mode": mode,
+        "rate": rate,
+        "achieved_per_second": len(gestures) / elapsed,
+        "lines": count_lines(path),
+        "events": len(gestures),
+        "rotations": getattr(history, "rotations", 0),
+        "console_writes": console.writes,
+        "drain_seconds": drain,
+        **{f"lag_{k}": v for k, v in latency_summary(lags).items()},
+    }
+
+
+async def run_history_benchmark(args):
+    print(f"Gesture history + console logging, {args.seconds} s per run; console write "
+          f"blocks {args.sink_delay_ms} ms; loop probe every {args.probe_ms} ms\n")
+    print(f"  {'mode':<8} {'target/s':>8} {'actual/s':>8} {'lines':>7} {'rotated':>7} {'writes':>7} "
+          f"{'lag p50':>8} {'lag p99':>8} {'lag max':>8}")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rate in args.rates:
+            for mode in ("direct", "batched"):
+                r = await run_history_scenario(mode, rate, args, tmp)
+                results.append(r)
+                print(f"  {mode:<8} {rate:>8.0f} {r['achieved_per_second']:>8.0f} {r['lines']:>7} "
+                      f"{r['rotations']:>7} {r['console_writes']:>7} {r['lag_p50_ms']:>6.2f}ms "
+                      f"{r['lag_p99_ms']:>6.2f}ms {r['lag_max_ms']:>6.2f}ms")
+    lost = [r for r in results if r["lines"] != r["events"]]
+    if lost:
+        print(f"\n  ✗ history lines missing in {len(lost)} run(s)")
+    else:
+        print(f"\n  ✓ every gesture reached the history file")
+
+    # Only the batched path is meant to keep the loop flat; direct is the baseline
+    failures = [f"batched lag p99 {r['lag_p99_ms']:.2f} ms > {args.max_lag_p99_ms} ms at {r['rate']:.0f}/s"
+                for r in results if r["mode"] == "batched"
+                and args.max_lag_p99_ms is not None and r["lag_p99_ms"] > args.max_lag_p99_ms]
+    if lost or failures:
+        for failure in failures:
+            print(f"  ✗ {failure}")
+        sys.exit(1)
+    return results
+
+
+# ===== MAIN =====
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenMuscle integration load tests')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    http_parser = subparsers.add_parser('http', help='Per-call vs pooled HTTP session latency')
+    http_parser.add_argument('--requests', type=int, default=500,
+                             help='Requests per mode')
+    http_parser.add_argument('--warmup', type=int, default=20,
+                             help='Untimed requests before each mode')
+    http_parser.add_argument('--server_delay_ms', type=float, default=0.0,
+                             help='Simulated hub processing time per request')
+
+    queue_parser = subparsers.add_parser('queue', help='Notification bursts through the event queue')
+    queue_parser.add_argument('--devices', type=int, default=2)
+    queue_parser.add_argument('--events', type=int, default=200,
+                              help='Notifications per device')
+    queue_parser.add_argument('--interval_ms', type=float, default=2.0,
+                              help='Gap between notification rounds')
+    queue_parser.add_argument('--server_delay_ms', type=float, default=20.0)
+    queue_parser.add_argument('--server_jitter_ms', type=float, default=20.0,
+                              help='Extra uniform random hub delay (reorders unbounded tasks)')
+    queue_parser.add_argument('--max_size', type=int, default=32)
+    queue_parser.add_argument('--workers', type=int, default=2)
+    queue_parser.add_argument('--seed', type=int, default=0)
+
+    decode_parser = subparsers.add_parser('decode', help='Gesture notification decode throughput')
+    decode_parser.add_argument('--frames', type=int, default=200000)
+    decode_parser.add_argument('--repeat', type=int, default=3)
+    decode_parser.add_argument('--seed', type=int, default=0)
+
+    raw_parser = subparsers.add_parser('raw', help='Raw frame reassembly and host-side inference')
+    raw_parser.add_argument('--seconds', type=float, default=60,
+                            help='Length of the replayed 50 Hz capture')
+    raw_parser.add_argument('--chunk_bytes', type=int, default=20,
+                            help='Notification payload size (20 = default BLE MTU)')
+    raw_parser.add_argument('--model_dir', type=str, default=None,
+                            help='Trained model directory (default: train a synthetic one)')
+    raw_parser.add_argument('--model_type', type=str, default='random_forest',
+                            choices=['random_forest', 'sgd', 'cnn', 'tflite'])
+    raw_parser.add_argument('--stride', type=int, default=1,
+                            help='Frames between predictions (1 = classify at 50 Hz)')
+    raw_parser.add_argument('--seed', type=int, default=0)
+
+    fanin_parser = subparsers.add_parser('fanin', help='Several simulated wristbands into one receiver')
+    fanin_parser.add_argument('--device_counts', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    fanin_parser.add_argument('--rate_hz', type=float, default=2.0,
+                              help='Gestures per second per wristband')
+    fanin_parser.add_argument('--seconds', type=float, default=5.0)
+    fanin_parser.add_argument('--server_delay_ms', type=float, default=5.0)
+    fanin_parser.add_argument('--max_size', type=int, default=32)
+    fanin_parser.add_argument('--workers', type=int, default=4)
+    fanin_parser.add_argument('--seed', type=int, default=0)
+
+    reconnect_parser = subparsers.add_parser('reconnect', help='Time to reconnect after a dropped link')
+    reconnect_parser.add_argument('--trials', type=int, default=10)
+    reconnect_parser.add_argument('--scan_timeout', type=float, default=3.0,
+                                  help='Scan timeout (the receiver default is 10 s)')
+    reconnect_parser.add_argument('--connect_timeout', type=float, default=1.0,
+                                  help='How long a connect to a stale address waits')
+    reconnect_parser.add_argument('--advertising_ms', type=float, default=500.0,
+                                  help='Advertising interval: first advertisement lands in [0, this)')
+    reconnect_parser.add_argument('--connect_ms', type=float, default=30.0)
+    reconnect_parser.add_argument('--seed', type=int, default=0)
+
+    reload_parser = subparsers.add_parser('reload', help='Config hot reload under a steady gesture stream')
+    reload_parser.add_argument('--events', type=int, default=1000)
+    reload_parser.add_argument('--seconds', type=float, default=5.0)
+    reload_parser.add_argument('--reloads', type=int, default=20)
+    reload_parser.add_argument('--check_ms', type=float, default=50.0,
+                               help='Config file poll interval')
+    reload_parser.add_argument('--server_delay_ms', type=float, default=1.0)
+
+    replay_parser = subparsers.add_parser('replay', help='Replay gestures through the full receiver path')
+    replay_parser.add_argument('--input', type=str, default=None,
+                               help='JSONL recording to replay (default: synthetic gestures)')
+    replay_parser.add_argument('--rates', type=float, nargs='+', default=None,
+                               help='Gestures per second to offer (default: recorded timing or a sweep)')
+    replay_parser.add_argument('--speed', type=float, default=1.0,
+                               help='Time scale for recorded timing')
+    replay_parser.add_argument('--seconds', type=float, default=3.0,
+                               help='Length of each synthetic run')
+    replay_parser.add_argument('--format', type=str, default='binary', choices=['binary', 'json'])
+    replay_parser.add_argument('--devices', type=int, default=1)
+    replay_parser.add_argument('--workers', type=int, default=CONFIG["event_queue"]["workers"])
+    replay_parser.add_argument('--max_size', type=int, default=CONFIG["event_queue"]["max_size"])
+    replay_parser.add_argument('--overflow', type=str, default='drop_oldest',
+                               choices=GestureEventQueue.OVERFLOW_POLICIES)
+    replay_parser.add_argument('--debounce', type=float, default=0.0,
+                               help='Debounce seconds (0 = every gesture fires an action)')
+    replay_parser.add_argument('--server_delay_ms', type=float, default=2.0)
+    replay_parser.add_argument('--server_jitter_ms', type=float, default=1.0)
+    replay_parser.add_argument('--error_rate', type=float, default=0.0,
+                               help='Fraction of hub requests answered with HTTP 500')
+    replay_parser.add_argument('--max_p99_ms', type=float, default=None,
+                               help='Exit 1 if any run exceeds this p99 latency')
+    replay_parser.add_argument('--max_error_rate', type=float, default=None,
+                               help='Exit 1 if any run exceeds this action error rate')
+    replay_parser.add_argument('--output', type=str, default=None,
+                               help='Write per-run results as JSON')
+    replay_parser.add_argument('--seed', type=int, default=0)
+
+    mqtt_parser = subparsers.add_parser('mqtt', help='MQTT publish vs Home Assistant HTTP latency')
+    mqtt_parser.add_argument('--events', type=int, default=500)
+    mqtt_parser.add_argument('--qos', type=int, nargs='+', default=[0, 1], choices=[0, 1, 2])
+    mqtt_parser.add_argument('--server_delay_ms', type=float, default=5.0,
+                             help='Hub response / broker acknowledgement delay')
+    mqtt_parser.add_argument('--offline_events', type=int, default=150,
+                             help='Gestures published while the broker is down')
+    mqtt_parser.add_argument('--max_offline', type=int, default=100,
+                             help='Offline buffer size')
+
+    history_parser = subparsers.add_parser('history', help='Event-loop lag while logging and saving history')
+    history_parser.add_argument('--rates', type=float, nargs='+', default=[1000, 2000, 5000],
+                                help='Gestures per second to log')
+    history_parser.add_argument('--seconds', type=float, default=2.0)
+    history_parser.add_argument('--sink_delay_ms', type=float, default=0.05,
+                                help='Time each console write blocks (slow terminal or pipe)')
+    history_parser.add_argument('--probe_ms', type=float, default=1.0,
+                                help='Loop lag probe interval')
+    history_parser.add_argument('--batch_size', type=int, default=CONFIG["logging"]["batch_size"])
+    history_parser.add_argument('--flush_ms', type=float,
+                                default=CONFIG["logging"]["flush_interval_seconds"] * 1000)
+    history_parser.add_argument('--max_bytes', type=int, default=256 * 1024,
+                                help='Rotate history files at this size')
+    history_parser.add_argument('--max_lag_p99_ms', type=float, default=None,
+                                help='Exit 1 if a batched run exceeds this p99 event-loop lag')
+    history_parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+
+    if args.command == 'http':
+        asyncio.run(run_http_benchmark(args))
+    elif args.command == 'queue':
+        asyncio.run(run_queue_benchmark(args))
+    elif args.command == 'decode':
+        run_decode_benchmark(args)
+    elif args.command == 'raw':
+        run_raw_benchmark(args)
+    elif args.command == 'fanin':
+        asyncio.run(run_fanin_benchmark(args))
+    elif args.command == 'reconnect':
+        asyncio.run(run_reconnect_benchmark(args))
+    elif args.command == 'reload':
+        asyncio.run(run_reload_benchmark(args))
+    elif args.command == 'replay':
+        asyncio.run(run_replay_benchmark(args))
+    elif args.command == 'mqtt':
+        asyncio.run(run_mqtt_benchmark(args))
+    elif args.command == 'history':
+        asyncio.run(run_history_benchmark(args))
+
+
+if __name__ == '__main__':
+    main()
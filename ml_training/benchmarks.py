@@ -0,0 +1,860 @@
+"""
+OpenMuscle Gesture Recognition - Pipeline Benchmarks
+
+Offline benchmarks for the training pipeline, run on synthetic
+FlexGrid-shaped data (4x15 pressure matrix + 6 IMU channels at 50 Hz).
+
+Usage:
+    python benchmarks.py pipeline --sizes 10000,100000,500000 --output bench.json
+    python benchmarks.py pipeline --baseline bench_baseline.json
+    python benchmarks.py parallel --rows 500000 --max_workers 8
+    python benchmarks.py realtime --model_dir output
+    python benchmarks.py incremental --window_sizes 50,200,1000
+    python benchmarks.py quantize --epochs 5 --max_accuracy_drop 0.02
+    python benchmarks.py inference --batch_sizes 1,8,32,128,256 --output inference.json
+    python benchmarks.py search --rows 100000 --max_cpus 4 --folds 5
+    python benchmarks.py esp32 --epochs 10 --latency_budget_ms 50
+    python benchmarks.py channels --rows 50000 --max_accuracy_loss 0.01
+
+Author: OpenMuscle Community
+License: MIT
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+import train_gesture_model as tgm
+
+
+# ===== SYNTHETIC DATA =====
+
+def make_synthetic_capture(num_rows, num_gestures=6, seed=0):
+    """
+    Generate a labelled FlexGrid capture
+
+    Each gesture has its own pressure pattern over the 60 sensors and its
+    own IMU offset, held for 2-6 second segments with noise on top.
+    Returns (X float32 of shape (num_rows, 66), y int labels).
+    """
+    rng = np.random.default_rng(seed)
+
+    patterns = rng.uniform(200, 3500, size=(num_gestures, tgm.NUM_SENSORS))
+    imu_offsets = rng.normal(0, 1, size=(num_gestures, tgm.NUM_IMU_FEATURES))
+
+    lengths = rng.integers(2 * tgm.SAMPLE_RATE_HZ, 6 * tgm.SAMPLE_RATE_HZ,
+                           size=num_rows // (2 * tgm.SAMPLE_RATE_HZ) + 1)
+    segment_labels = rng.integers(0, num_gestures, size=len(lengths))
+    y = np.repeat(segment_labels, lengths)[:num_rows]
+
+    t = np.arange(num_rows) / tgm.SAMPLE_RATE_HZ
+    pressure = patterns[y] * (1 + 0.1 * np.sin(2 * np.pi * 1.5 * t))[:, None]
+    pressure += rng.normal(0, 60, size=pressure.shape)
+    sensors = np.clip(np.rint(pressure), 0, 4095)
+    imu = imu_offsets[y] + rng.normal(0, 0.2, size=(num_rows, tgm.NUM_IMU_FEATURES))
+
+    X = np.hstack([sensors, imu]).astype(np.float32)
+
+    return X, y
+
+
+def write_synthetic_csv(path, X, y):
+    """
+    Write a synthetic capture in the data collector's CSV format
+    """
+    df = pd.DataFrame(X[:, :tgm.NUM_SENSORS].astype(np.int64), columns=tgm.SENSOR_COLUMNS)
+    for i, column in enumerate(tgm.IMU_COLUMNS):
+        df[column] = np.round(X[:, tgm.NUM_SENSORS + i], 4)
+    df.insert(0, 'label', [f"gesture_{label}" for label in y])
+    df.insert(0, 'timestamp', np.arange(len(y)) * (1000 // tgm.SAMPLE_RATE_HZ))
+    df.to_csv(path, index=False)
+
+
+def save_synthetic_artifacts(output_dir, num_rows=50_000, seed=0, channel_mask=None):
+    """
+    Train a Random Forest on synthetic data and save it like main() does
+
+    Writes gesture_model_rf.pkl, scaler.pkl, model_meta.json and label_encoder.pkl; with a
+    channel_selection.json path, trains on its channels.
+    """
+    X, y = make_synthetic_capture(num_rows, seed=seed)
+    channels = None
+    if channel_mask is not None:
+        channels = tgm.load_channel_mask(channel_mask)
+        X = np.ascontiguousarray(X[:, channels])
+    label_encoder = LabelEncoder().fit([f"gesture_{label}" for label in np.unique(y)])
+    starts, labels = tgm.compute_window_starts(y)
+
+    scaler = StandardScaler()
+    features = scaler.fit_transform(tgm.extract_window_features(X, starts, verbose=False))
+    model = tgm.build_random_forest_model(features, labels)
+    model.set_params(verbose=0)
+
+    os.makedirs(output_dir, exist_ok=True)
+    joblib.dump(model, os.path.join(output_dir, tgm.MODEL_FILENAMES['random_forest']))
+    joblib.dump(scaler, os.path.join(output_dir, 'scaler.pkl'))
+    tgm.save_model_meta(output_dir, 'random_forest', tgm.DEFAULT_FEATURES, channels)
+    joblib.dump(label_encoder, os.path.join(output_dir, 'label_encoder.pkl'))
+
+
+def train_synthetic_cnn(output_dir, num_rows=50_000, epochs=5, seed=0):
+    """
+    Train the CNN on synthetic windows and save it like main() does
+
+    Writes best_model.h5, window_scaler.pkl, model_meta.json and label_encoder.pkl; returns
+    (model, window scaler, raw windows, train starts, test starts, train
+    labels, test labels).
+    """
+    X, y = make_synthetic_capture(num_rows, seed=seed)
+    label_encoder = LabelEncoder().fit([f"gesture_{label}" for label in np.unique(y)])
+    starts, labels = tgm.compute_window_starts(y)
+    rng = np.random.default_rng(seed)
+    is_test = rng.random(len(starts)) < 0.2
+    window_scaler = tgm.fit_window_scaler([(tgm.window_view(X)[starts[~is_test]], None)])
+    scaled = tgm.window_view(tgm.scale_windows(X, window_scaler))
+
+    tf = tgm.tf
+    tf.keras.utils.set_random_seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = tgm.build_cnn_model((tgm.WINDOW_SIZE, tgm.TOTAL_FEATURES), len(label_encoder.classes_))
+    model.fit(scaled[starts[~is_test]], labels[~is_test], epochs=epochs, batch_size=32, verbose=0)
+
+    os.makedirs(output_dir, exist_ok=True)
+    model.save(os.path.join(output_dir, 'best_model.h5'))
+    joblib.dump(window_scaler, os.path.join(output_dir, tgm.WINDOW_SCALER_FILENAME))
+    tgm.save_model_meta(output_dir, 'cnn')
+    joblib.dump(label_encoder, os.path.join(output_dir, 'label_encoder.pkl'))
+    return model, window_scaler, tgm.window_view(X), starts[~is_test], starts[is_test], labels[~is_test], labels[is_test]
+
+
+def percentile_ms(seconds, q):
+    return float(np.percentile(seconds, q) * 1000)
+
+
+# ===== MEASUREMENT =====
+
+def time_call(func, *args, repeat=1, **kwargs):
+    """
+    Best-of-repeat wall time of func(*args, **kwargs), plus its result
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+# ===== BENCHMARKS =====
+
+def measure_stage(results, size, stage, num_windows, func, *args, quiet=True, **kwargs):
+    """
+    Run one pipeline stage, record wall time, peak RSS and windows/s
+    """
+    output = io.StringIO()
+    with tgm.PeakMemorySampler() as memory, contextlib.redirect_stdout(output if quiet else sys.stdout):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+
+    record = {
+        'size': size,
+        'stage': stage,
+        'seconds': seconds,
+        'peak_rss_mb': memory.peak_bytes / 1024 ** 2,
+        'windows_per_second': num_windows / seconds if seconds > 0 else float('inf'),
+    }
+    results.append(record)
+    print(f"{size:>10} {stage:>14} {seconds:>10.3f} {record['peak_rss_mb']:>10.1f} "
+          f"{record['windows_per_second']:>14,.0f}")
+
+    return result
+
+
+def run_pipeline_suite(num_rows, results, work_dir, seed=0, skip_cnn=False):
+    """
+    Time every training pipeline stage on one synthetic dataset size
+    """
+    X, y = make_synthetic_capture(num_rows, seed=seed)
+    csv_path = os.path.join(work_dir, f"synthetic_{num_rows}.csv")
+    write_synthetic_csv(csv_path, X, y)
+
+    starts, labels = tgm.compute_window_starts(y)
+    n = len(starts)
+
+    measure_stage(results, num_rows, 'load_csv', n, tgm.load_and_preprocess_data, csv_path,
+                  use_cache=False)
+    measure_stage(results, num_rows, 'build_cache', n, tgm.build_dataset_cache, csv_path)
+    X, y_raw, _ = measure_stage(results, num_rows, 'load_cached', n,
+                                tgm.load_and_preprocess_data, csv_path)
+
+    y_encoded = LabelEncoder().fit_transform(y_raw)
+    starts, labels = measure_stage(results, num_rows, 'windows', n,
+                                   tgm.compute_window_starts, y_encoded)
+    windows = measure_stage(results, num_rows, 'gather_windows', n,
+                            lambda: tgm.window_view(X)[starts])
+    features = measure_stage(results, num_rows, 'features', n,
+                             tgm.extract_window_features, X, starts)
+    scaled = measure_stage(results, num_rows, 'scaling', n,
+                           lambda: StandardScaler().fit_transform(features))
+
+    split = int(n * 0.8)
+    model = measure_stage(results, num_rows, 'rf_fit', split,
+                          tgm.build_random_forest_model, scaled[:split], labels[:split])
+    measure_stage(results, num_rows, 'rf_predict', n - split, model.predict, scaled[split:])
+
+    if not skip_cnn:
+        model = measure_stage(results, num_rows, 'cnn_build', n, tgm.build_cnn_model,
+                              windows.shape[1:], len(np.unique(labels)))
+        # Warm-up traces the training step so the timed epoch is steady state
+        model.fit(windows[:32], labels[:32], epochs=1, batch_size=32, verbose=0)
+        measure_stage(results, num_rows, 'cnn_epoch', n, model.fit, windows, labels,
+                      epochs=1, batch_size=32, verbose=0)
+
+
+def compare_to_baseline(results, baseline, tolerance, min_seconds=0.01):
+    """
+    Print per-stage time ratios against a stored run; returns regressions
+
+    Stages faster than min_seconds in the baseline are reported but never
+    flagged, their timings are dominated by noise.
+    """
+    reference = {(record['size'], record['stage']): record for record in baseline['results']}
+    regressions = []
+
+    print(f"\n=== Comparison with baseline (tolerance {tolerance:.0%}) ===")
+    print(f"{'size':>10} {'stage':>14} {'baseline s':>11} {'current s':>10} {'ratio':>7}")
+    for record in results:
+        key = (record['size'], record['stage'])
+        if key not in reference:
+            continue
+        ratio = record['seconds'] / max(reference[key]['seconds'], 1e-9)
+        flag = ''
+        if ratio > 1 + tolerance and reference[key]['seconds'] >= min_seconds:
+            flag = '  ✗ regression'
+            regressions.append(key)
+        print(f"{key[0]:>10} {key[1]:>14} {reference[key]['seconds']:>11.3f} "
+              f"{record['seconds']:>10.3f} {ratio:>6.2f}x{flag}")
+
+    return regressions
+
+
+def bench_pipeline(args):
+    """
+    Wall time, peak RSS and throughput of each pipeline stage at several sizes
+    """
+    import tensorflow as tf
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = []
+
+    print(f"\n=== Pipeline benchmark: sizes {sizes} ===\n")
+    print(f"{'rows':>10} {'stage':>14} {'seconds':>10} {'peak MB':>10} {'windows/s':>14}")
+
+    with tempfile.TemporaryDirectory(prefix='openmuscle_bench_') as work_dir:
+        for size in sizes:
+            run_pipeline_suite(size, results, work_dir, args.seed, args.skip_cnn)
+
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'scikit-learn': sklearn.__version__,
+            'tensorflow': tf.__version__,
+            'window_size': tgm.WINDOW_SIZE,
+            'stride': tgm.STRIDE,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} stage(s) slower than baseline")
+            sys.exit(1)
+        print("\n✓ No regressions")
+
+
+def bench_parallel(args):
+    """
+    Scaling of windowing + feature extraction from 1 to max_workers processes
+    """
+    X, y = make_synthetic_capture(args.rows, seed=args.seed)
+    starts, _ = tgm.compute_window_starts(y)
+    feature_names = tuple(args.features.split(','))
+
+    print(f"\n=== Parallel feature extraction: {len(X)} rows, {len(starts)} windows ===")
+    print(f"Features: {', '.join(feature_names)} | CPUs available: {os.cpu_count()}\n")
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= args.max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != args.max_workers:
+        worker_counts.append(args.max_workers)
+
+    print(f"{'workers':>8} {'seconds':>10} {'windows/s':>12} {'speedup':>8}")
+    baseline = None
+    reference = None
+    for workers in worker_counts:
+        seconds, features = time_call(
+            tgm.extract_window_features, X, starts, feature_names, workers,
+            repeat=args.repeat, verbose=False
+        )
+        if reference is None:
+            baseline, reference = seconds, features
+        elif not np.array_equal(features, reference):
+            raise RuntimeError(f"Features differ between 1 and {workers} workers")
+
+        print(f"{workers:>8} {seconds:>10.3f} {len(starts) / seconds:>12.0f} {baseline / seconds:>7.2f}x")
+
+
+def bench_realtime(args):
+    """
+    Frame throughput, per-hop latency and steady-state allocations of
+    StreamingGestureClassifier on a single core
+    """
+    from realtime_inference import StreamingGestureClassifier
+
+    model_dir = args.model_dir
+    if model_dir is None:
+        model_dir = tempfile.mkdtemp(prefix='openmuscle_bench_')
+        print("Training synthetic Random Forest artifacts...")
+        save_synthetic_artifacts(model_dir, seed=args.seed)
+
+    classifier = StreamingGestureClassifier(model_dir, args.model_type)
+    X, _ = make_synthetic_capture(args.frames, seed=args.seed + 1)
+
+    # Warm-up fills the ring buffer and touches every code path once
+    classifier.push_many(X[:tgm.WINDOW_SIZE * 4])
+
+    hop_seconds = []
+    start = time.perf_counter()
+    for frame in X:
+        hop_start = time.perf_counter()
+        if classifier.push(frame) is not None:
+            hop_seconds.append(time.perf_counter() - hop_start)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    classifier.push_many(X[:tgm.STRIDE])
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    hops = 0
+    for frame in X[:min(len(X), 10_000)]:
+        hops += classifier.push(frame) is not None
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frames_per_second = len(X) / elapsed
+    print(f"\n=== Streaming inference ({args.model_type}) ===")
+    print(f"Frames: {len(X)} | Hops: {len(hop_seconds)}")
+    print(f"Throughput: {frames_per_second:,.0f} frames/s "
+          f"({frames_per_second / tgm.SAMPLE_RATE_HZ:,.0f}x real time at {tgm.SAMPLE_RATE_HZ} Hz)")
+    print(f"Hop latency: p50 {percentile_ms(hop_seconds, 50):.3f} ms, "
+          f"p99 {percentile_ms(hop_seconds, 99):.3f} ms")
+    print(f"Steady-state memory growth: {after - before} bytes over {hops} hops "
+          f"(peak {peak - before} bytes)")
+
+
+def bench_incremental(args):
+    """
+    SlidingWindowStats (O(1) per frame) vs recomputing every window per hop
+
+    Runs each window size with 50% overlap and with a prediction per frame.
+    """
+    from realtime_inference import SlidingWindowStats, WindowFeatures
+
+    X, _ = make_synthetic_capture(args.frames, seed=args.seed)
+
+    print(f"\n=== Incremental window statistics: {len(X)} frames ===\n")
+    print(f"{'window':>7} {'stride':>7} {'recompute us/frame':>19} {'incremental us/frame':>21} "
+          f"{'speedup':>8} {'max abs diff':>13} {'vs float64':>11}")
+
+    window_sizes = [int(size) for size in args.window_sizes.split(',')]
+    for window_size, stride in ((size, stride) for size in window_sizes
+                                for stride in (max(size // 2, 1), 1)):
+        hop_starts = np.arange(0, len(X) - window_size + 1, stride)
+
+        def recompute():
+            features = WindowFeatures(window_size, X.shape[1])
+            ring = np.zeros((2 * window_size, X.shape[1]), dtype=np.float32)
+            results = []
+            for i, frame in enumerate(X):
+                pos = i % window_size
+                ring[pos] = frame
+                ring[pos + window_size] = frame
+                seen = i + 1 - window_size
+                if seen >= 0 and seen % stride == 0:
+                    start = (pos + 1) % window_size
+                    results.append(features.update(ring[start:start + window_size]).copy())
+            return np.array(results)
+
+        def incremental():
+            stats = SlidingWindowStats(window_size, X.shape[1])
+            results = []
+            for i, frame in enumerate(X):
+                stats.push(frame)
+                seen = i + 1 - window_size
+                if seen >= 0 and seen % stride == 0:
+                    results.append(stats.update_features().copy())
+            return np.array(results)
+
+        recompute_seconds, expected = time_call(recompute, repeat=args.repeat)
+        incremental_seconds, actual = time_call(incremental, repeat=args.repeat)
+
+        reference = tgm.extract_features(tgm.window_view(X, window_size)[hop_starts], verbose=False)
+        # Exact statistics: both float32 paths should sit within rounding of these
+        exact = tgm.extract_features(tgm.window_view(X.astype(np.float64), window_size)[hop_starts],
+                                     verbose=False)
+        if not np.allclose(expected, reference) or not np.allclose(actual, reference, rtol=1e-5, atol=1e-3):
+            raise RuntimeError(f"Window statistics differ from extract_features (window {window_size})")
+
+        print(f"{window_size:>7} {stride:>7} {recompute_seconds / len(X) * 1e6:>19.2f} "
+              f"{incremental_seconds / len(X) * 1e6:>21.2f} "
+              f"{recompute_seconds / incremental_seconds:>7.2f}x "
+              f"{np.abs(actual - reference).max():>13.2e} {np.abs(actual - exact).max():>11.2e}")
+
+
+def bench_quantize(args):
+    """
+    Full-integer TFLite conversion of a synthetic CNN: float vs int8
+    accuracy, size and latency, checked against the conversion budgets
+    """
+    from realtime_inference import StreamingGestureClassifier
+
+    model_dir = args.model_dir or tempfile.mkdtemp(prefix='openmuscle_bench_')
+    print(f"Training synthetic CNN ({args.epochs} epochs)...")
+    model, window_scaler, windows, train_starts, test_starts, _, test_labels = train_synthetic_cnn(
+        model_dir, args.rows, args.epochs, args.seed
+    )
+
+    rng = np.random.default_rng(args.seed)
+    calibration = windows[np.sort(rng.choice(train_starts, min(args.calibration_windows, len(train_starts)),
+                                             replace=False))]
+    test_windows = tgm.scale_windows(windows[test_starts], window_scaler)
+    tflite_path = os.path.join(model_dir, 'gesture_model.tflite')
+    try:
+        tflite_model = tgm.convert_to_tflite(
+            model, tflite_path, calibration_windows=tgm.scale_windows(calibration, window_scaler),
+            test_chunks=[(test_windows, test_labels)],
+            max_accuracy_drop=args.max_accuracy_drop, max_latency_ms=args.max_latency_ms
+        )
+    except RuntimeError as e:
+        print(f"\n✗ {e}")
+        sys.exit(1)
+
+    # The streaming classifier must quantize its windows the same way
+    interpreter = tgm.tf.lite.Interpreter(model_content=tflite_model)
+    interpreter.allocate_tensors()
+    expected = np.argmax(tgm.tflite_predict(interpreter, test_windows), axis=1)
+    classifier = StreamingGestureClassifier(model_dir, 'tflite')
+    streamed = np.array([np.flatnonzero(classifier.class_names == classifier.classify(window)[0])[0]
+                         for window in windows[test_starts]])
+    agreement = float((streamed == expected).mean())
+    print(f"\n{'✓' if agreement == 1.0 else '✗'} StreamingGestureClassifier (tflite) matches the "
+          f"int8 interpreter on {agreement:.1%} of test windows")
+
+
+def save_synthetic_inference_artifacts(model_dir, args):
+    """
+    Every artifact benchmarks.py inference compares, from synthetic data
+
+    ONNX exports are skipped (with a warning) when skl2onnx/tf2onnx are missing.
+    """
+    print("Training synthetic Random Forest and CNN artifacts...")
+    save_synthetic_artifacts(model_dir, seed=args.seed)
+    model, window_scaler, windows, train_starts, _, _, _ = train_synthetic_cnn(
+        model_dir, epochs=args.epochs, seed=args.seed
+    )
+    calibration = tgm.scale_windows(windows[train_starts[:tgm.CALIBRATION_WINDOWS]], window_scaler)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tgm.convert_to_tflite(model, os.path.join(model_dir, 'gesture_model.tflite'),
+                              calibration_windows=calibration)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            tgm.export_onnx(model, 'cnn', model_dir)
+        except ImportError as e:
+            print(f"⚠ {e}", file=sys.stderr)
+        try:
+            tgm.export_onnx(joblib.load(os.path.join(model_dir, tgm.MODEL_FILENAMES['random_forest'])),
+                            'random_forest', model_dir, joblib.load(os.path.join(model_dir, 'scaler.pkl')))
+        except ImportError as e:
+            print(f"⚠ {e}", file=sys.stderr)
+
+
+def bench_inference(args):
+    """
+    Keras vs TFLite vs ONNX Runtime vs sklearn on the saved artifacts
+
+    Each backend runs in its own process (inference_backends.py), so load
+    time includes importing its runtime and memory is its own footprint.
+    Predictions on the same inputs are checked against the reference
+    backend of each model family.
+    """
+    import inference_backends
+
+    model_dir = args.model_dir
+    if model_dir is None:
+        model_dir = tempfile.mkdtemp(prefix='openmuscle_bench_')
+        save_synthetic_inference_artifacts(model_dir, args)
+
+    # Inputs from a capture the models have not seen
+    X, _ = make_synthetic_capture(20_000, seed=args.seed + 1)
+    starts, _ = tgm.compute_window_starts(np.zeros(len(X), dtype=np.int64))
+    inputs = {'features': tgm.extract_window_features(X, starts, verbose=False).astype(np.float32)}
+    scaler_path = os.path.join(model_dir, tgm.WINDOW_SCALER_FILENAME)
+    if os.path.exists(scaler_path):
+        inputs['windows'] = tgm.scale_windows(tgm.window_view(X)[starts], joblib.load(scaler_path))
+    inputs_path = os.path.join(model_dir, 'benchmark_inputs.npz')
+    np.savez(inputs_path, **inputs)
+
+    worker = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'inference_backends.py')
+    results = []
+    for name in inference_backends.available_backends(model_dir):
+        if inference_backends.BACKENDS[name][0] not in inputs:
+            continue
+        print(f"Measuring {name}...")
+        completed = subprocess.run(
+            [sys.executable, worker, '--backend', name, '--model_dir', model_dir, '--inputs', inputs_path,
+             '--batch_sizes', args.batch_sizes, '--latency_calls', str(args.latency_calls)],
+            capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            print(f"  ⚠ {name} failed: {completed.stderr.strip().splitlines()[-1:]}")
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    batch_sizes = args.batch_sizes.split(',')
+    print(f"\n=== Inference backends ({platform.processor() or platform.machine()}, "
+          f"{os.cpu_count()} CPU) ===\n")
+    print(f"{'backend':<12} {'load s':>7} {'1st call ms':>12} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'RSS MB':>7} {'peak MB':>8} {'agree':>6}")
+    reference = {}
+    for result in results:
+        family = inference_backends.BACKENDS[result['backend']][0]
+        expected = reference.setdefault(family, np.array(result['predictions']))
+        result['agreement'] = float((np.array(result['predictions']) == expected).mean())
+        print(f"{result['backend']:<12} {result['load_seconds']:>7.2f} {result['first_call_ms']:>12.2f} "
+              f"{result['latency_p50_ms']:>8.3f} {result['latency_p99_ms']:>8.3f} "
+              f"{result['rss_loaded_mb']:>7.0f} {result['rss_peak_mb']:>8.0f} {result['agreement']:>6.1%}")
+
+    print(f"\nThroughput (windows/s) by batch size:")
+    print(f"{'backend':<12} " + " ".join(f"{size:>9}" for size in batch_sizes))
+    for result in results:
+        print(f"{result['backend']:<12} " + " ".join(
+            f"{result['throughput_per_second'][size]:>9,.0f}" for size in batch_sizes))
+
+    for family, label in (('features', 'Random Forest'), ('windows', 'CNN')):
+        candidates = [r for r in results if inference_backends.BACKENDS[r['backend']][0] == family]
+        if candidates:
+            fastest = min(candidates, key=lambda r: r['latency_p50_ms'])
+            widest = max(candidates, key=lambda r: r['throughput_per_second'][batch_sizes[-1]])
+            print(f"\n{label}: lowest single-window latency {fastest['backend']}, "
+                  f"highest batch-{batch_sizes[-1]} throughput {widest['backend']}")
+
+    for result in results:
+        del result['predictions']
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'model_dir': model_dir, 'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+
+def overlapping_test_windows(train_starts, test_starts, window_size=tgm.WINDOW_SIZE):
+    """
+    Fraction of test windows sharing at least one row with a training window
+    """
+    train_starts = np.sort(train_starts)
+    nearest = np.searchsorted(train_starts, test_starts)
+    after = np.abs(train_starts[np.minimum(nearest, len(train_starts) - 1)] - test_starts)
+    before = np.abs(test_starts - train_starts[np.maximum(nearest - 1, 0)])
+    return float(np.mean(np.minimum(after, before) < window_size))
+
+
+def bench_search(args):
+    """
+    Grouped CV vs a random window split, search scaling over CPUs, resume cost
+
+    Leakage is measured directly as the share of test windows that overlap
+    a training window, next to the accuracy each split reports.
+    """
+    X, y = make_synthetic_capture(args.rows, seed=args.seed)
+    space = {'n_estimators': [50, 100], 'min_samples_leaf': [1, 2, 4]}
+    report = {'rows': args.rows, 'folds': args.folds, 'space': space, 'cpu_count': os.cpu_count()}
+
+    with tempfile.TemporaryDirectory(prefix='openmuscle_bench_') as work_dir:
+        csv_path = os.path.join(work_dir, 'capture.csv')
+        write_synthetic_csv(csv_path, X, y)
+        feature_cache = tgm.FeatureCache(os.path.join(work_dir, 'feature_cache'))
+
+        def search(results_path, cpus, search_space):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = tgm.run_search([csv_path], 'random_forest', work_dir, search_space, args.folds,
+                                         cpus=cpus, feature_cache=feature_cache, seed=args.seed,
+                                         results_path=os.path.join(work_dir, results_path))
+            return time.perf_counter() - start, summary
+
+        # Same (default) parameters scored both ways
+        with contextlib.redirect_stdout(io.StringIO()):
+            features, labels, _ = tgm.load_window_features(csv_path, feature_cache=feature_cache)
+        starts, _ = tgm.compute_window_starts(y)
+        train_idx, test_idx = tgm.train_test_split(np.arange(len(labels)), test_size=0.2,
+                                                   random_state=42, stratify=labels)
+        scaler = StandardScaler().fit(features[train_idx])
+        model = tgm.build_random_forest_model(scaler.transform(features[train_idx]), labels[train_idx], verbose=0)
+        random_accuracy = float(np.mean(model.predict(scaler.transform(features[test_idx])) == labels[test_idx]))
+        random_overlap = overlapping_test_windows(starts[train_idx], starts[test_idx])
+
+        segment_starts, _ = tgm.find_label_segments(y)
+        fold_of = tgm.grouped_folds(labels, np.searchsorted(segment_starts, starts, side='right') - 1,
+                                    args.folds, args.seed)
+        grouped_overlap = float(np.mean([overlapping_test_windows(starts[fold_of != fold], starts[fold_of == fold])
+                                         for fold in range(args.folds)]))
+        _, summary = search('defaults.jsonl', 1, {'n_estimators': [tgm.RF_PARAMS['n_estimators']]})
+        report['split'] = {
+            'random': {'accuracy': random_accuracy, 'overlapping_test_windows': random_overlap},
+            'grouped_cv': {'accuracy': summary[0]['accuracy_mean'], 'overlapping_test_windows': grouped_overlap},
+        }
+
+        print(f"\n=== Grouped CV: {len(labels)} windows, {len(segment_starts)} label segments ===\n")
+        print(f"{'split':<22} {'accuracy':>9} {'test windows overlapping train':>32}")
+        print(f"{'random 80/20':<22} {random_accuracy:>9.4f} {random_overlap:>32.1%}")
+        print(f"{f'grouped {args.folds}-fold':<22} {summary[0]['accuracy_mean']:>9.4f} {grouped_overlap:>32.1%}")
+
+        num_tasks = len(tgm.search_trials(space)) * args.folds
+        print(f"\n=== Search: {num_tasks} (trial, fold) fits, CPUs available: {os.cpu_count()} ===\n")
+        print(f"{'cpus':>5} {'seconds':>9} {'fits/s':>8} {'speedup':>8}")
+        report['scaling'] = []
+        baseline = None
+        cpus = 1
+        while cpus <= args.max_cpus:
+            seconds, summary = search(f"scaling_{cpus}.jsonl", cpus, space)
+            baseline = baseline or seconds
+            report['scaling'].append({'cpus': cpus, 'seconds': seconds, 'best': summary[0]})
+            print(f"{cpus:>5} {seconds:>9.2f} {num_tasks / seconds:>8.1f} {baseline / seconds:>7.2f}x")
+            cpus *= 2
+
+        # Drop half the stored folds, as if the search had been killed midway
+        results_path = os.path.join(work_dir, 'scaling_1.jsonl')
+        with open(results_path, 'r') as f:
+            lines = f.readlines()
+        with open(results_path, 'w') as f:
+            f.writelines(lines[:len(lines) // 2])
+        resumed, _ = search('scaling_1.jsonl', 1, space)
+        complete, _ = search('scaling_1.jsonl', 1, space)
+        report['resume'] = {'half_done_seconds': resumed, 'all_done_seconds': complete}
+        print(f"\nResume with half the folds stored: {resumed:.2f} s (full search {baseline:.2f} s)")
+        print(f"Rerun of a finished search: {complete:.2f} s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+
+def bench_esp32(args):
+    """
+    ESP32 candidate architectures on synthetic data: accuracy vs size, arena and MACs
+    """
+    X, y = make_synthetic_capture(args.rows, seed=args.seed)
+
+    with tempfile.TemporaryDirectory(prefix='openmuscle_bench_') as work_dir:
+        csv_path = os.path.join(work_dir, 'capture.csv')
+        write_synthetic_csv(csv_path, X, y)
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            report = tgm.select_esp32_model([csv_path], os.path.join(work_dir, 'output'),
+                                            flash_budget_kb=args.flash_budget_kb,
+                                            ram_budget_kb=args.ram_budget_kb,
+                                            latency_budget_ms=args.latency_budget_ms,
+                                            macs_per_second=args.macs_per_second, epochs=args.epochs,
+                                            seed=args.seed)
+        print(log.getvalue()[log.getvalue().index('=== ESP32'):])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+    if report['selected'] is None:
+        sys.exit(1)
+
+
+def stream_seconds_per_frame(classifier, X):
+    classifier.push_many(X[:tgm.WINDOW_SIZE * 4])
+    start = time.perf_counter()
+    classifier.push_many(X)
+    return (time.perf_counter() - start) / len(X)
+
+
+def bench_channels(args):
+    """
+    Channel pruning on synthetic data: accuracy per channel count, then the
+    sensor scan, feature vector and streaming inference cost of the mask
+    """
+    from realtime_inference import StreamingGestureClassifier
+
+    X, y = make_synthetic_capture(args.rows, seed=args.seed)
+
+    with tempfile.TemporaryDirectory(prefix='openmuscle_bench_') as work_dir:
+        csv_path = os.path.join(work_dir, 'capture.csv')
+        write_synthetic_csv(csv_path, X, y)
+        output_dir = os.path.join(work_dir, 'output')
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            mask = tgm.select_channels([csv_path], output_dir, args.max_accuracy_loss, folds=args.folds,
+                                       seed=args.seed)
+        text = log.getvalue()
+        print(text[text.index('=== Channel'):text.index('Channel selection saved')].rstrip())
+
+        mask_path = os.path.join(output_dir, tgm.CHANNEL_SELECTION_FILENAME)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            save_synthetic_artifacts(os.path.join(work_dir, 'all'), args.rows, args.seed)
+            save_synthetic_artifacts(os.path.join(work_dir, 'masked'), args.rows, args.seed, mask_path)
+
+        frames, _ = make_synthetic_capture(args.frames, seed=args.seed + 1)
+        streaming = {}
+        for name in ('all', 'masked'):
+            classifier = StreamingGestureClassifier(os.path.join(work_dir, name))
+            streaming[name] = {'us_per_frame': stream_seconds_per_frame(classifier, frames) * 1e6,
+                               'forest_depth': int(classifier._forest.max_depth)}
+
+    # Fewer, noisier inputs can need deeper trees, which offsets the smaller window
+    print(f"\nStreaming inference (random_forest, {len(frames)} frames): "
+          f"{streaming['all']['us_per_frame']:.1f} -> {streaming['masked']['us_per_frame']:.1f} us/frame, "
+          f"forest depth {streaming['all']['forest_depth']} -> {streaming['masked']['forest_depth']}")
+
+    report = dict(mask, streaming=streaming)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the gesture training pipeline')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    pipeline = subparsers.add_parser('pipeline', help='Time every training pipeline stage')
+    pipeline.add_argument('--sizes', type=str, default='10000,100000,500000',
+                          help='Comma-separated synthetic capture lengths (rows)')
+    pipeline.add_argument('--output', type=str, default='benchmark_results.json',
+                          help='JSON file for the results')
+    pipeline.add_argument('--baseline', type=str, default=None,
+                          help='Stored results to compare against')
+    pipeline.add_argument('--tolerance', type=float, default=0.2,
+                          help='Allowed slowdown vs baseline before failing (0.2 = 20%%)')
+    pipeline.add_argument('--skip_cnn', action='store_true', help='Skip CNN stages')
+    pipeline.add_argument('--seed', type=int, default=0)
+    pipeline.set_defaults(func=bench_pipeline)
+
+    parallel = subparsers.add_parser('parallel', help='Process-pool feature extraction scaling')
+    parallel.add_argument('--rows', type=int, default=500_000, help='Synthetic capture length')
+    parallel.add_argument('--max_workers', type=int, default=os.cpu_count() or 1,
+                          help='Largest worker count to try')
+    parallel.add_argument('--features', type=str, default=','.join(tgm.DEFAULT_FEATURES),
+                          help='Comma-separated feature names')
+    parallel.add_argument('--repeat', type=int, default=3, help='Repetitions (best is reported)')
+    parallel.add_argument('--seed', type=int, default=0)
+    parallel.set_defaults(func=bench_parallel)
+
+    realtime = subparsers.add_parser('realtime', help='Streaming classifier throughput and latency')
+    realtime.add_argument('--model_dir', type=str, default=None,
+                          help='Saved artifacts (default: train on synthetic data)')
+    realtime.add_argument('--model_type', type=str, default='random_forest',
+                          choices=['random_forest', 'sgd', 'cnn', 'tflite'])
+    realtime.add_argument('--frames', type=int, default=50_000, help='Frames to stream')
+    realtime.add_argument('--seed', type=int, default=0)
+    realtime.set_defaults(func=bench_realtime)
+
+    incremental = subparsers.add_parser('incremental', help='Running vs recomputed window statistics')
+    incremental.add_argument('--frames', type=int, default=20_000, help='Frames to stream')
+    incremental.add_argument('--window_sizes', type=str, default='50,200,1000',
+                             help='Comma-separated window sizes (strides: half window and 1)')
+    incremental.add_argument('--repeat', type=int, default=3, help='Repetitions (best is reported)')
+    incremental.add_argument('--seed', type=int, default=0)
+    incremental.set_defaults(func=bench_incremental)
+
+    quantize = subparsers.add_parser('quantize', help='Float vs full-integer TFLite accuracy and latency')
+    quantize.add_argument('--rows', type=int, default=50_000, help='Synthetic capture length')
+    quantize.add_argument('--epochs', type=int, default=5, help='CNN training epochs')
+    quantize.add_argument('--model_dir', type=str, default=None,
+                          help='Where to write the artifacts (default: a temporary directory)')
+    quantize.add_argument('--calibration_windows', type=int, default=tgm.CALIBRATION_WINDOWS)
+    quantize.add_argument('--max_accuracy_drop', type=float, default=tgm.MAX_ACCURACY_DROP)
+    quantize.add_argument('--max_latency_ms', type=float, default=tgm.MAX_LATENCY_MS)
+    quantize.add_argument('--seed', type=int, default=0)
+    quantize.set_defaults(func=bench_quantize)
+
+    inference = subparsers.add_parser('inference', help='Keras vs TFLite vs ONNX Runtime vs sklearn inference')
+    inference.add_argument('--model_dir', type=str, default=None,
+                           help='Saved artifacts (default: train RF and CNN on synthetic data)')
+    inference.add_argument('--batch_sizes', type=str, default='1,8,32,128,256',
+                           help='Comma-separated batch sizes for throughput')
+    inference.add_argument('--latency_calls', type=int, default=500,
+                           help='Single-window calls timed per backend')
+    inference.add_argument('--epochs', type=int, default=5, help='CNN epochs for synthetic artifacts')
+    inference.add_argument('--output', type=str, default=None, help='JSON file for the results')
+    inference.add_argument('--seed', type=int, default=0)
+    inference.set_defaults(func=bench_inference)
+
+    search = subparsers.add_parser('search', help='Grouped CV leakage, search scaling and resume')
+    search.add_argument('--rows', type=int, default=100_000, help='Synthetic capture length')
+    search.add_argument('--folds', type=int, default=tgm.SEARCH_FOLDS)
+    search.add_argument('--max_cpus', type=int, default=os.cpu_count() or 1,
+                        help='Largest CPU budget to try (doubling from 1)')
+    search.add_argument('--output', type=str, default=None, help='JSON file for the results')
+    search.add_argument('--seed', type=int, default=0)
+    search.set_defaults(func=bench_search)
+
+    esp32 = subparsers.add_parser('esp32', help='ESP32 candidate CNNs within flash/RAM/latency budgets')
+    esp32.add_argument('--rows', type=int, default=50_000, help='Synthetic capture length')
+    esp32.add_argument('--epochs', type=int, default=10, help='Training epochs per candidate')
+    esp32.add_argument('--flash_budget_kb', type=float, default=tgm.ESP32_FLASH_BUDGET_KB)
+    esp32.add_argument('--ram_budget_kb', type=float, default=tgm.ESP32_RAM_BUDGET_KB)
+    esp32.add_argument('--latency_budget_ms', type=float, default=tgm.ESP32_LATENCY_BUDGET_MS)
+    esp32.add_argument('--macs_per_second', type=float, default=tgm.ESP32_MACS_PER_SECOND)
+    esp32.add_argument('--output', type=str, default=None, help='JSON file for the results')
+    esp32.add_argument('--seed', type=int, default=0)
+    esp32.set_defaults(func=bench_esp32)
+
+    channels = subparsers.add_parser('channels', help='Importance-driven sensor channel pruning')
+    channels.add_argument('--rows', type=int, default=50_000, help='Synthetic capture length')
+    channels.add_argument('--folds', type=int, default=tgm.SEARCH_FOLDS)
+    channels.add_argument('--max_accuracy_loss', type=float, default=tgm.MAX_CHANNEL_ACCURACY_LOSS)
+    channels.add_argument('--frames', type=int, default=20_000, help='Frames to stream per model')
+    channels.add_argument('--output', type=str, default=None, help='JSON file for the results')
+    channels.add_argument('--seed', type=int, default=0)
+    channels.set_defaults(func=bench_channels)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+OpenMuscle Gesture Recognition - Inference Backends
+
+Every saved model artifact behind one call, predict(batch) -> class
+probabilities, so runtimes can be compared on equal terms. Each loader
+imports only its own runtime, which makes load_backend() in a fresh
+process the backend's real cold start (benchmarks.py inference runs every
+backend this way).
+
+    backend       artifact (in model_dir)                    input
+    sklearn_rf    gesture_model_rf.pkl + scaler.pkl          window features
+    onnx_rf       gesture_model_rf.onnx                      window features
+    keras_cnn     best_model.h5                              standardized windows
+    tflite_int8   gesture_model.tflite                       standardized windows
+    onnx_cnn      gesture_model_cnn.onnx                     standardized windows
+
+Window features are the raw extract_features() output (scaling is part of
+the model); windows are standardized with window_scaler.pkl.
+
+Usage (one measurement per process, JSON on stdout):
+    python inference_backends.py --backend onnx_rf --model_dir output --inputs inputs.npz
+
+Author: OpenMuscle Community
+License: MIT
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+
+def _load_sklearn_rf(model_dir):
+    import joblib
+
+    model = joblib.load(os.path.join(model_dir, 'gesture_model_rf.pkl'))
+    scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+    model.set_params(n_jobs=1, verbose=0)
+    return lambda batch: model.predict_proba(scaler.transform(batch))
+
+
+def _load_onnx(filename):
+    def load(model_dir):
+        import onnxruntime as ort
+
+        session = ort.InferenceSession(os.path.join(model_dir, filename), providers=['CPUExecutionProvider'])
+        input_name = session.get_inputs()[0].name
+        outputs = [output.name for output in session.get_outputs()]
+        # Classifier graphs also return labels; keep only the probabilities
+        output = 'probabilities' if 'probabilities' in outputs else outputs[-1]
+        return lambda batch: session.run([output], {input_name: batch})[0]
+    return load
+
+
+def _load_keras_cnn(model_dir):
+    from tensorflow import keras
+
+    model = keras.models.load_model(os.path.join(model_dir, 'best_model.h5'), compile=False)
+    return lambda batch: model(batch, training=False).numpy()
+
+
+def _load_tflite(model_dir):
+    # The standalone runtimes are what an edge host would install
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+    interpreter = Interpreter(model_path=os.path.join(model_dir, 'gesture_model.tflite'))
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    output_index = interpreter.get_output_details()[0]['index']
+    state = {'batch': 1}
+
+    def predict(batch):
+        if len(batch) != state['batch']:
+            interpreter.resize_tensor_input(input_details['index'], batch.shape)
+            interpreter.allocate_tensors()
+            state['batch'] = len(batch)
+        # Tensor details change with allocate_tensors(), so read them per call
+        details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+        if details['dtype'] != np.float32:
+            scale, zero_point = details['quantization']
+            info = np.iinfo(details['dtype'])
+            batch = np.clip(np.rint(batch / scale + zero_point), info.min, info.max).astype(details['dtype'])
+        interpreter.set_tensor(details['index'], batch)
+        interpreter.invoke()
+        scores = interpreter.get_tensor(output_index)
+        if output_details['dtype'] != np.float32:
+            scale, zero_point = output_details['quantization']
+            scores = (scores.astype(np.float32) - zero_point) * scale
+        return scores
+    return predict
+
+
+# name -> (input kind, artifact files, loader)
+BACKENDS = {
+    'sklearn_rf': ('features', ('gesture_model_rf.pkl', 'scaler.pkl'), _load_sklearn_rf),
+    'onnx_rf': ('features', ('gesture_model_rf.onnx',), _load_onnx('gesture_model_rf.onnx')),
+    'keras_cnn': ('windows', ('best_model.h5',), _load_keras_cnn),
+    'tflite_int8': ('windows', ('gesture_model.tflite',), _load_tflite),
+    'onnx_cnn': ('windows', ('gesture_model_cnn.onnx',), _load_onnx('gesture_model_cnn.onnx')),
+}
+
+
+def available_backends(model_dir):
+    """
+    Backends whose artifacts are all present in model_dir
+    """
+    return [name for name, (_, files, _) in BACKENDS.items()
+            if all(os.path.exists(os.path.join(model_dir, f)) for f in files)]
+
+
+def load_backend(name, model_dir):
+    """
+    predict(batch float32) -> probabilities (N, num_classes) for a backend
+    """
+    return BACKENDS[name][2](model_dir)
+
+
+# ===== MEASUREMENT =====
+
+def resident_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return peak_resident_bytes()
+
+
+def peak_resident_bytes():
+    # VmHWM starts fresh at exec; ru_maxrss can carry the parent's peak over
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(name, model_dir, inputs, batch_sizes=(1, 8, 32, 128, 256), latency_calls=500, min_seconds=0.3):
+    """
+    Cold start, single-window latency, batched throughput and memory of one backend
+
+    inputs is a float32 array of the backend's input kind. Call in a fresh
+    process for a meaningful load time and memory footprint.
+    """
+    rss_before = resident_bytes()
+    start = time.perf_counter()
+    predict = load_backend(name, model_dir)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predict(inputs[:1])
+    first_call_seconds = time.perf_counter() - start
+    rss_loaded = resident_bytes()
+
+    latencies = []
+    for i in range(latency_calls):
+        x = inputs[i % len(inputs)][None]
+        start = time.perf_counter()
+        predict(x)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        batch = np.ascontiguousarray(np.resize(inputs, (batch_size,) + inputs.shape[1:]))
+        predict(batch)  # warm-up, and re-allocation for runtimes with fixed shapes
+        calls, start = 0, time.perf_counter()
+        while calls < 3 or time.perf_counter() - start < min_seconds:
+            predict(batch)
+            calls += 1
+        throughput[str(batch_size)] = calls * batch_size / (time.perf_counter() - start)
+
+    sample = inputs[:256]
+    predictions = np.concatenate([np.argmax(predict(sample[i:i + 1]), axis=1) for i in range(len(sample))])
+
+    return {
+        'backend': name,
+        'load_seconds': load_seconds,
+        'first_call_ms': first_call_seconds * 1000,
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p99_ms': float(np.percentile(latencies, 99)),
+        'throughput_per_second': throughput,
+        'rss_loaded_mb': (rss_loaded - rss_before) / 1024 ** 2,
+        'rss_peak_mb': peak_resident_bytes() / 1024 ** 2,
+        'predictions': predictions.tolist(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure one inference backend (used by benchmarks.py inference)')
+    parser.add_argument('--backend', type=str, required=True, choices=list(BACKENDS))
+    parser.add_argument('--model_dir', type=str, default='output')
+    parser.add_argument('--inputs', type=str, required=True,
+                        help="npz with 'features' and/or 'windows' float32 arrays")
+    parser.add_argument('--batch_sizes', type=str, default='1,8,32,128,256')
+    parser.add_argument('--latency_calls', type=int, default=500)
+    args = parser.parse_args()
+
+    inputs = np.load(args.inputs)[BACKENDS[args.backend][0]].astype(np.float32)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    result = measure(args.backend, args.model_dir, inputs, batch_sizes, args.latency_calls)
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,459 @@
+"""
+OpenMuscle Gesture Recognition - Host-Side Streaming Inference
+
+Classifies a live stream of 50 Hz FlexGrid frames (60 sensors + 6 IMU
+values) with the artifacts saved by train_gesture_model.py. Frames go
+into a ring buffer of the last WINDOW_SIZE frames and a prediction is
+made every STRIDE frames, exactly like the training windows.
+
+Usage:
+    from realtime_inference import StreamingGestureClassifier
+
+    classifier = StreamingGestureClassifier('output', model_type='random_forest')
+    for frame in frames:
+        result = classifier.push(frame)
+        if result is not None:
+            label, confidence = result
+
+Author: OpenMuscle Community
+License: MIT
+"""
+
+import os
+
+import joblib
+import numpy as np
+
+from train_gesture_model import (
+    WINDOW_SIZE, STRIDE, TOTAL_FEATURES, DEFAULT_FEATURES, MODEL_FILENAMES, WINDOW_SCALER_FILENAME,
+    extract_features, quantize_tensor, dequantize_tensor, load_model_meta, channel_indices_of
+)
+
+# Per-hop feature extraction bypasses the training run's stage timers
+_extract_features = extract_features.__wrapped__
+
+
+class CompiledForest:
+    """
+    Random forest flattened into node arrays for single-sample inference
+
+    All trees are walked together, one level per step, using preallocated
+    buffers, so predict_proba allocates nothing. Probabilities match
+    RandomForestClassifier.predict_proba.
+    """
+
+    def __init__(self, forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+
+        self.n_trees = len(trees)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.roots = offsets.astype(np.intp)
+
+        left, right, feature, threshold, value = [], [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            is_leaf = tree.children_left < 0
+            node_ids = np.arange(tree.node_count)
+            # Leaves point at themselves so extra levels are no-ops
+            left.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            right.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            counts = tree.value[:, 0, :]
+            value.append(counts / counts.sum(axis=1, keepdims=True))
+
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold)
+        self.value = np.concatenate(value)
+        self.classes_ = forest.classes_
+
+        # Per-call scratch buffers
+        self._nodes = np.empty(self.n_trees, dtype=np.intp)
+        self._next = np.empty(self.n_trees, dtype=np.intp)
+        self._feature = np.empty(self.n_trees, dtype=np.intp)
+        self._x = np.empty(self.n_trees, dtype=np.float32)
+        self._threshold = np.empty(self.n_trees, dtype=np.float64)
+        self._go_left = np.empty(self.n_trees, dtype=bool)
+        self._leaf_values = np.empty((self.n_trees, self.value.shape[1]))
+        self._proba = np.empty(self.value.shape[1])
+
+    def predict_proba(self, x):
+        """
+        Class probabilities for one float32 feature vector (returns an internal buffer)
+        """
+        nodes = self._nodes
+        nodes[:] = self.roots
+        for _ in range(self.max_depth):
+            np.take(self.feature, nodes, out=self._feature)
+            np.take(x, self._feature, out=self._x)
+            np.take(self.threshold, nodes, out=self._threshold)
+            np.less_equal(self._x, self._threshold, out=self._go_left)
+            np.take(self.left, nodes, out=self._next)
+            np.take(self.right, nodes, out=nodes)
+            np.copyto(nodes, self._next, where=self._go_left)
+
+        np.take(self.value, nodes, axis=0, out=self._leaf_values)
+        np.sum(self._leaf_values, axis=0, out=self._proba)
+        self._proba /= self.n_trees
+
+        return self._proba
+
+
+class WindowFeatures:
+    """
+    Mean / std / range features of one window using preallocated buffers
+
+    Produces the same values as extract_features with the default feature
+    selection, without allocating per call.
+    """
+
+    def __init__(self, window_size=WINDOW_SIZE, channels=TOTAL_FEATURES, dtype=np.float32):
+        self._centered = np.empty((window_size, channels), dtype=dtype)
+        self._max = np.empty(channels, dtype=dtype)
+        self.features = np.empty(3 * channels, dtype=dtype)
+        self.mean, self.std, self.range = np.split(self.features, 3)
+
+    def update(self, window):
+        np.mean(window, axis=0, out=self.mean)
+        np.subtract(window, self.mean, out=self._centered)
+        np.multiply(self._centered, self._centered, out=self._centered)
+        np.mean(self._centered, axis=0, out=self.std)
+        np.sqrt(self.std, out=self.std)
+        np.max(window, axis=0, out=self._max)
+        np.min(window, axis=0, out=self.range)
+        np.subtract(self._max, self.range, out=self.range)
+
+        return self.features
+
+
+class SlidingWindowStats:
+    """
+    Running mean / std / min / max of the last window_size frames
+
+    Each frame costs O(1) per channel instead of O(window_size):
+    - mean and variance use Welford's update for a sliding window: the
+      running mean and sum of squared deviations are corrected by the
+      difference between the new and the evicted frame, which avoids the
+      cancellation of a sum-of-squares variance (frames are also shifted
+      by a reference frame);
+    - min and max use the van Herk / Gil-Werman block scheme. Frames are
+      grouped in blocks of window_size; a running prefix extreme covers
+      the current block and a suffix extreme, computed once per completed
+      block, covers the part of the previous block still in the window.
+      This is the vectorized equivalent of a monotonic deque per channel.
+
+    features holds [mean, std, range], the layout of extract_features with
+    the default feature selection; push and update_features allocate
+    nothing. Mean and deviations are recomputed from the window every
+    resync_every frames to stop floating-point drift on long streams.
+    Until window_size frames are pushed the window is padded with the
+    first frame.
+    """
+
+    def __init__(self, window_size=WINDOW_SIZE, channels=TOTAL_FEATURES, dtype=np.float32,
+                 resync_every=10_000):
+        self.window_size = window_size
+        self.resync_every = resync_every
+        self.count = 0
+
+        self._shift = np.zeros(channels)
+        self._frames = np.zeros((window_size, channels))  # shifted, ring indexed by count % window_size
+        self._mean = np.zeros(channels)  # of the shifted window
+        self._m2 = np.zeros(channels)  # sum of squared deviations from _mean
+        self._x = np.empty(channels)
+        self._delta = np.empty(channels)
+        self._tmp = np.empty(channels)
+        self._tmp2 = np.empty(channels)
+
+        self._prefix_max = np.empty(channels)
+        self._prefix_min = np.empty(channels)
+        self._suffix_max = np.empty((window_size, channels))
+        self._suffix_min = np.empty((window_size, channels))
+
+        self.features = np.empty(3 * channels, dtype=dtype)
+        self.mean, self.std, self.range = np.split(self.features, 3)
+
+    @property
+    def ready(self):
+        return self.count >= self.window_size
+
+    def push(self, frame):
+        pos = self.count % self.window_size
+        if self.count == 0:
+            self._shift[:] = frame
+
+        x = self._x
+        np.subtract(frame, self._shift, out=x)
+
+        # Sliding Welford update, replacing old by x:
+        # mean' = mean + (x - old) / n
+        # m2' = m2 + (x - old) * ((x - mean') + (old - mean))
+        old = self._frames[pos]
+        delta, tmp, tmp2 = self._delta, self._tmp, self._tmp2
+        np.subtract(x, old, out=delta)
+        np.subtract(old, self._mean, out=tmp)
+        np.divide(delta, self.window_size, out=tmp2)
+        self._mean += tmp2
+        np.subtract(x, self._mean, out=tmp2)
+        tmp += tmp2
+        tmp *= delta
+        self._m2 += tmp
+        old[:] = x
+
+        # Block prefix extremes
+        if pos == 0:
+            self._prefix_max[:] = x
+            self._prefix_min[:] = x
+        else:
+            np.maximum(self._prefix_max, x, out=self._prefix_max)
+            np.minimum(self._prefix_min, x, out=self._prefix_min)
+
+        # Block complete: its suffix extremes serve the next window_size frames
+        if pos == self.window_size - 1:
+            np.maximum.accumulate(self._frames[::-1], axis=0, out=self._suffix_max[::-1])
+            np.minimum.accumulate(self._frames[::-1], axis=0, out=self._suffix_min[::-1])
+
+        self.count += 1
+
+        if self.count % self.resync_every == 0 and self.ready:
+            self._resync()
+
+    def _resync(self):
+        # Re-center on the current window mean and recompute the moments exactly
+        mean = self._frames.mean(axis=0)
+        self._frames -= mean
+        self._shift += mean
+        self._mean[:] = self._frames.mean(axis=0)
+        self._m2[:] = np.square(self._frames - self._mean).sum(axis=0)
+        self._prefix_max -= mean
+        self._prefix_min -= mean
+        self._suffix_max -= mean
+        self._suffix_min -= mean
+
+    def update_features(self):
+        """
+        Refresh and return features for the current window
+        """
+        n = self.window_size
+        tmp, tmp2 = self._tmp, self._tmp2
+
+        # mean = shift + mean of the shifted window, variance = m2 / n
+        np.add(self._mean, self._shift, out=self.mean, casting='unsafe')
+        np.divide(self._m2, n, out=tmp)
+        np.maximum(tmp, 0, out=tmp)
+        np.sqrt(tmp, out=self.std, casting='unsafe')
+
+        # Window = tail of the previous block + head of the current one
+        next_pos = self.count % n
+        if next_pos == 0:
+            np.subtract(self._prefix_max, self._prefix_min, out=self.range, casting='unsafe')
+        else:
+            np.maximum(self._suffix_max[next_pos], self._prefix_max, out=tmp)
+            np.minimum(self._suffix_min[next_pos], self._prefix_min, out=tmp2)
+            np.subtract(tmp, tmp2, out=self.range, casting='unsafe')
+
+        return self.features
+
+
+class StreamingGestureClassifier:
+    """
+    Real-time gesture classifier over a stream of sensor frames
+
+    model_type selects the saved artifact: 'random_forest' or 'sgd'
+    (feature models with scaler.pkl), 'cnn' (best_model.h5) or 'tflite'
+    (gesture_model.tflite, float or full-integer int8). The random forest path with default features
+    does no array allocation per hop once running.
+
+    feature_names defaults to the selection recorded in model_meta.json
+    at training time (DEFAULT_FEATURES for older models); an explicit
+    selection that differs from it is rejected.
+
+    With incremental=True (feature models, default features only) window
+    statistics are maintained per frame by SlidingWindowStats instead of
+    being recomputed over the whole window at every hop.
+
+    Models trained with --channel_mask record their channels in
+    model_meta.json; frames are still pushed with all channels and reduced
+    to those on arrival.
+    """
+
+    def __init__(self, model_dir='output', model_type='random_forest',
+                 feature_names=None, window_size=WINDOW_SIZE, stride=STRIDE,
+                 channels=TOTAL_FEATURES, incremental=False):
+        # Feature selection and channel mask as recorded at training time
+        meta = load_model_meta(model_dir, model_type)
+        saved_features = meta.get('feature_names')
+        if saved_features is not None:
+            if feature_names is not None and tuple(feature_names) != tuple(saved_features):
+                raise ValueError(f"Model in {model_dir} was trained on features {tuple(saved_features)}, "
+                                 f"not {tuple(feature_names)}")
+            feature_names = saved_features
+        elif feature_names is None:
+            feature_names = DEFAULT_FEATURES
+
+        self.model_type = model_type
+        self.feature_names = tuple(feature_names)
+        self.window_size = window_size
+        self.stride = stride
+
+        label_encoder = joblib.load(os.path.join(model_dir, 'label_encoder.pkl'))
+        self.class_names = np.asarray(label_encoder.classes_)
+
+        self._channel_index = None
+        if 'channels' in meta:
+            self._channel_index = channel_indices_of(meta['channels'])
+            channels = len(self._channel_index)
+
+        # Ring buffer holding every frame twice, so the latest window is
+        # always the contiguous slice buffer[pos:pos + window_size]
+        self._buffer = np.zeros((2 * window_size, channels), dtype=np.float32)
+        self._pos = 0
+        self.frames_seen = 0
+
+        self._window_features = None
+        self._stats = None
+        self._scaled = None
+        self._input = None
+        self._window_mean = None
+        self._window_scale = None
+
+        # CNNs trained with a window scaler expect standardized windows
+        scaler_path = os.path.join(model_dir, WINDOW_SCALER_FILENAME)
+        if model_type in ('cnn', 'tflite') and os.path.exists(scaler_path):
+            window_scaler = joblib.load(scaler_path)
+            self._window_mean = window_scaler.mean_.astype(np.float32)
+            self._window_scale = window_scaler.scale_.astype(np.float32)
+
+        if model_type in MODEL_FILENAMES:
+            model = joblib.load(os.path.join(model_dir, MODEL_FILENAMES[model_type]))
+            scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+            self._scale_mean = scaler.mean_
+            self._scale = scaler.scale_
+
+            if incremental:
+                if self.feature_names != tuple(DEFAULT_FEATURES):
+                    raise ValueError("Incremental statistics only support the default features")
+                self._stats = SlidingWindowStats(window_size, channels)
+            elif self.feature_names == tuple(DEFAULT_FEATURES):
+                self._window_features = WindowFeatures(window_size, channels)
+            num_features = len(self._scale_mean)
+            self._scaled = np.empty(num_features, dtype=np.float32)
+
+            if hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+                self._forest = CompiledForest(model)
+                self._predict_proba = self._forest.predict_proba
+                self._classes = self._forest.classes_
+            else:
+                self._predict_proba = lambda x: model.predict_proba(x[None, :])[0]
+                self._classes = model.classes_
+
+        elif model_type == 'cnn':
+            from tensorflow import keras
+
+            model = keras.models.load_model(os.path.join(model_dir, 'best_model.h5'))
+            self._input = np.empty((1, window_size, channels), dtype=np.float32)
+            self._predict_proba = lambda window: model(self._input, training=False).numpy()[0]
+            self._classes = np.arange(len(self.class_names))
+
+        elif model_type == 'tflite':
+            import tensorflow as tf
+
+            interpreter = tf.lite.Interpreter(model_path=os.path.join(model_dir, 'gesture_model.tflite'))
+            interpreter.allocate_tensors()
+            input_details = interpreter.get_input_details()[0]
+            output_details = interpreter.get_output_details()[0]
+            self._input = np.empty((1, window_size, channels), dtype=np.float32)
+            # Full-integer models take int8 windows and return int8 scores
+            tensor = np.empty_like(self._input, dtype=input_details['dtype'])
+
+            def predict_tflite(window):
+                interpreter.set_tensor(input_details['index'], quantize_tensor(self._input, input_details, tensor))
+                interpreter.invoke()
+                return dequantize_tensor(interpreter.get_tensor(output_details['index'])[0], output_details)
+
+            self._predict_proba = predict_tflite
+            self._classes = np.arange(len(self.class_names))
+
+        else:
+            raise ValueError(f"Unknown model type: {model_type}")
+
+    @property
+    def window(self):
+        """
+        The last window_size frames, oldest first (a view, no copy)
+        """
+        return self._buffer[self._pos:self._pos + self.window_size]
+
+    def reset(self):
+        self._buffer[:] = 0
+        self._pos = 0
+        self.frames_seen = 0
+        if self._stats is not None:
+            self._stats = SlidingWindowStats(self.window_size, self._buffer.shape[1])
+
+    def push(self, frame):
+        """
+        Add one frame; returns (label, confidence) on every hop, else None
+
+        A hop happens once the first full window is buffered and then
+        every stride frames, matching the windows used in training.
+        """
+        if self._channel_index is not None:
+            frame = frame[self._channel_index]
+        pos = self._pos
+        self._buffer[pos] = frame
+        self._buffer[pos + self.window_size] = frame
+        self._pos = (pos + 1) % self.window_size
+        self.frames_seen += 1
+        if self._stats is not None:
+            self._stats.push(frame)
+
+        seen = self.frames_seen - self.window_size
+        if seen < 0 or seen % self.stride:
+            return None
+
+        if self._stats is not None:
+            return self._classify_features(self._stats.update_features())
+        return self.classify(self.window)
+
+    def push_many(self, frames):
+        """
+        Push a block of frames; returns the list of hop results
+        """
+        results = []
+        for frame in frames:
+            result = self.push(frame)
+            if result is not None:
+                results.append(result)
+        return results
+
+    def classify(self, window):
+        """
+        (label, confidence) for one (window_size, channels) window
+        """
+        if self._channel_index is not None and window.shape[1] != len(self._channel_index):
+            window = window[:, self._channel_index]
+        if self._scaled is None:
+            if self._window_mean is not None:
+                np.subtract(window, self._window_mean, out=self._input[0])
+                np.divide(self._input[0], self._window_scale, out=self._input[0])
+            else:
+                self._input[0] = window
+            return self._result(self._predict_proba(window))
+
+        if self._window_features is not None:
+            features = self._window_features.update(window)
+        else:
+            features = _extract_features(window[None], self.feature_names, verbose=False)[0]
+        return self._classify_features(features)
+
+    def _classify_features(self, features):
+        np.subtract(features, self._scale_mean, out=self._scaled)
+        np.divide(self._scaled, self._scale, out=self._scaled)
+        return self._result(self._predict_proba(self._scaled))
+
+    def _result(self, proba):
+        best = int(np.argmax(proba))
+        return self.class_names[self._classes[best]], float(proba[best])
@@ -10,6 +10,52 @@ Data Format (CSV):
 Usage:
     python train_gesture_model.py --data collected_data.csv --output model.tflite
 
+The first run converts the CSV into a binary cache (collected_data.csv.cache/)
+that later runs memory-map instead of re-parsing. Pass --no_cache to skip it.
+
+--data also accepts a directory or glob of captures; these are streamed in
+chunks of --chunk_windows windows so memory does not grow with the corpus:
+    python train_gesture_model.py --data "sessions/*.csv" --model_type sgd
+
+--workers N shards windowing and feature extraction over N processes
+(see benchmarks.py parallel for scaling numbers). Windows and features of
+feature models are kept in a content-addressed cache (--feature_cache_dir),
+so reruns that only change model settings skip straight to training. The
+CNN computes no features: its windows are views into the memory-mapped
+binary cache, so a rerun that only changes --epochs starts training as
+soon as the cache is mapped.
+
+Every run writes run_report.json (per-stage time, peak RSS and counters)
+to --output_dir; --profile and --trace_memory add cProfile/tracemalloc data.
+
+--tflite (CNN only) writes a full-integer int8 model, calibrated on a sample
+of training windows, and tflite_report.json comparing float and int8 test
+accuracy and host latency. The run fails if --max_accuracy_drop or
+--max_latency_ms is exceeded. --onnx exports the model for ONNX Runtime
+(see benchmarks.py inference for a Keras/TFLite/ONNX/sklearn comparison).
+
+--search runs grouped K-fold cross-validation over a hyperparameter grid
+instead of a single fit. Windows of one label segment (or, with several
+captures, one session) stay in one fold, trials run in parallel within a
+--cpus budget, and finished folds are stored in search_results.jsonl so
+an interrupted search resumes where it stopped:
+    python train_gesture_model.py --data collected_data.csv --search --cpus 8 --folds 5
+
+--esp32_select trains a family of small CNNs (fewer filters, depthwise-
+separable convolutions, downsampled inputs), reports int8 accuracy, flash
+size, estimated tensor arena, MACs and estimated device latency for each,
+and keeps the most accurate one within --flash_budget_kb, --ram_budget_kb
+and --latency_budget_ms (esp32_report.json).
+
+--select_channels ranks the 60 sensors and 6 IMU axes by Random Forest
+importance summed per channel, retrains on progressively fewer channels
+and writes the smallest mask within --max_channel_accuracy_loss of the
+all-channel accuracy (channel_selection.json, plus channel_mask.h for the
+firmware's SENSOR_ROW_MASK). --channel_mask trains on that subset and
+records the channels in model_meta.json, where inference picks them up:
+    python train_gesture_model.py --data collected_data.csv --select_channels
+    python train_gesture_model.py --data collected_data.csv --channel_mask output/channel_selection.json
+
 Author: OpenMuscle Community
 License: MIT
 """
@@ -18,42 +64,363 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedGroupKFold, train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, f1_score
+from threadpoolctl import threadpool_limits
 import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras import layers
 import argparse
+import cProfile
+import contextlib
+import functools
+import glob
+import hashlib
+import inspect
+import io
+import itertools
 import joblib
+import json
+import multiprocessing
 import os
+import pstats
+import resource
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+from multiprocessing import shared_memory
 
 # ===== CONFIGURATION =====
 WINDOW_SIZE = 50  # Number of samples per gesture (1 second at 50Hz)
 STRIDE = 25  # Overlap between windows
+SAMPLE_RATE_HZ = 50
+CHUNK_WINDOWS = 2048  # Windows per chunk in the streaming pipeline
+CNN_EPOCHS = 100  # Upper bound; early stopping usually ends training sooner
+FEATURE_CACHE_DIR = '.feature_cache'
+FEATURE_CACHE_MB = 2048
 NUM_SENSORS = 60
 NUM_IMU_FEATURES = 6
 TOTAL_FEATURES = NUM_SENSORS + NUM_IMU_FEATURES
+SENSOR_COLUMNS = [f"S{row}_{col}" for row in range(4) for col in range(15)]
+IMU_COLUMNS = ['accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z']
+CHANNEL_NAMES = SENSOR_COLUMNS + IMU_COLUMNS
+CACHE_FORMAT_VERSION = 2
+
+# ===== INSTRUMENTATION =====
+
+def read_rss_bytes():
+    """
+    Current resident set size (Linux /proc), falling back to the peak RSS
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakMemorySampler:
+    """
+    Context manager sampling RSS from a background thread to find the
+    peak resident memory of the enclosed block
+    """
+    
+    def __init__(self, interval=0.005, on_sample=None):
+        self.interval = interval
+        self.on_sample = on_sample
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _sample(self):
+        rss = read_rss_bytes()
+        self.peak_bytes = max(self.peak_bytes, rss)
+        if self.on_sample is not None:
+            self.on_sample(rss)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+    
+    def __enter__(self):
+        self._stop.clear()
+        self.peak_bytes = read_rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+
+class RunInstrumentation:
+    """
+    Stage timers, peak-memory tracking and counters for one training run
+
+    Pipeline functions are wrapped with @instrumented(stage); nested stages
+    report inclusive time. Peak RSS per stage comes from synchronous reads
+    at stage entry/exit plus a background sampler. Nothing is recorded
+    outside start()...finish(), so library callers pay one attribute check.
+    """
+    
+    def __init__(self):
+        self.active = False
+        self.stages = {}
+        self.counters = {}
+        self._active = []
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._profiler = None
+        self.started = None
+    
+    def start(self, sample_interval=0.01, profile=False, trace_memory=False):
+        self.active = True
+        self.started = time.time()
+        self._sampler = PeakMemorySampler(sample_interval, on_sample=self._on_sample)
+        self._sampler.__enter__()
+        if trace_memory:
+            tracemalloc.start(25)
+        if profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+    
+    def _on_sample(self, rss):
+        with self._lock:
+            for record in self._active:
+                record['peak_rss_bytes'] = max(record['peak_rss_bytes'], rss)
+    
+    def count(self, name, value):
+        if not self.active:
+            return
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+    
+    def stage(self, name):
+        return _StageTimer(self, name)
+    
+    def report(self, extra=None):
+        """
+        Machine-readable summary of the run so far
+        """
+        report = {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started or time.time())),
+            'total_seconds': time.time() - self.started if self.started else None,
+            'peak_rss_mb': (self._sampler.peak_bytes if self._sampler else read_rss_bytes()) / 1024 ** 2,
+            'stages': {
+                name: {
+                    'calls': stats['calls'],
+                    'seconds': stats['seconds'],
+                    'peak_rss_mb': stats['peak_rss_bytes'] / 1024 ** 2,
+                }
+                for name, stats in self.stages.items()
+            },
+            'counters': dict(self.counters),
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report['tracemalloc'] = {
+                'current_mb': current / 1024 ** 2,
+                'peak_mb': peak / 1024 ** 2,
+                'top_allocations': [
+                    {'location': str(stat.traceback[0]), 'size_mb': stat.size / 1024 ** 2, 'count': stat.count}
+                    for stat in tracemalloc.take_snapshot().statistics('lineno')[:20]
+                ],
+            }
+        report.update(extra or {})
+        return report
+    
+    def finish(self, output_dir, extra=None):
+        """
+        Stop sampling/profiling and write run_report.json (+ profile files)
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        extra = dict(extra or {})
+        
+        if self._profiler is not None:
+            self._profiler.disable()
+            profile_path = os.path.join(output_dir, 'profile.pstats')
+            self._profiler.dump_stats(profile_path)
+            with open(os.path.join(output_dir, 'profile.txt'), 'w') as f:
+                pstats.Stats(self._profiler, stream=f).sort_stats('cumulative').print_stats(40)
+            extra['profile'] = profile_path
+        
+        if self._sampler is not None:
+            self._sampler.__exit__(None, None, None)
+        
+        report = self.report(extra)
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        
+        report_path = os.path.join(output_dir, 'run_report.json')
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        
+        print(f"\n=== Run Report ===")
+        for name, stats in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds']):
+            print(f"  {name:<24} {stats['seconds']:>9.3f} s  {stats['calls']:>6} call(s)  "
+                  f"peak {stats['peak_rss_mb']:>8.1f} MB")
+        for name, value in report['counters'].items():
+            print(f"  {name}: {value}")
+        print(f"Run report saved to: {report_path}")
+        
+        self.active = False
+        return report
+
+
+class _StageTimer:
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+    
+    def __enter__(self):
+        self.record = {'peak_rss_bytes': read_rss_bytes()}
+        with self.instrumentation._lock:
+            self.instrumentation._active.append(self.record)
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        instrumentation = self.instrumentation
+        peak = max(self.record['peak_rss_bytes'], read_rss_bytes())
+        with instrumentation._lock:
+            instrumentation._active = [record for record in instrumentation._active
+                                       if record is not self.record]
+            stats = instrumentation.stages.setdefault(
+                self.name, {'calls': 0, 'seconds': 0.0, 'peak_rss_bytes': 0}
+            )
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['peak_rss_bytes'] = max(stats['peak_rss_bytes'], peak)
+        return False
+
+
+INSTRUMENTATION = RunInstrumentation()
+
+
+def instrumented(stage, counters=None):
+    """
+    Decorator timing a pipeline function as a stage of INSTRUMENTATION
+
+    counters(result) may return {name: value} increments to record. Calls
+    outside an active run go straight to func; func.__wrapped__ skips even
+    that check.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not INSTRUMENTATION.active:
+                return func(*args, **kwargs)
+            with INSTRUMENTATION.stage(stage):
+                result = func(*args, **kwargs)
+            if counters is not None and result is not None:
+                for name, value in counters(result).items():
+                    INSTRUMENTATION.count(name, value)
+            return result
+        return wrapper
+    return decorator
+
 
 # ===== DATA LOADING & PREPROCESSING =====
 
-def load_and_preprocess_data(csv_path):
+class CaptureRows:
+    """
+    The (N, 66) float32 sample matrix of a capture, read lazily
+
+    Wraps the memory-mapped sensor and IMU columns of the binary cache.
+    Row slices return only the rows asked for; np.asarray() materializes
+    the whole matrix for callers that need it all (e.g. CNN windows).
+    """
+
+    def __init__(self, sensors, imu):
+        self.sensors = sensors
+        self.imu = imu
+        self.shape = (len(sensors), sensors.shape[1] + imu.shape[1])
+        self.dtype = np.dtype(np.float32)
+        self.nbytes = self.shape[0] * self.shape[1] * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        if not isinstance(rows, slice):
+            raise TypeError("CaptureRows only supports row slices")
+        return self.copy_to(np.empty((len(range(*rows.indices(len(self)))), self.shape[1]), self.dtype), rows)
+
+    def copy_to(self, out, rows=slice(None)):
+        """
+        Write rows of the matrix into out (e.g. a shared-memory block)
+        """
+        split = self.sensors.shape[1]
+        out[:, :split] = self.sensors[rows]
+        out[:, split:] = self.imu[rows]
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        X = self.copy_to(np.empty(self.shape, self.dtype))
+        return X if dtype is None else X.astype(dtype, copy=False)
+
+
+def encode_labels(labels, csv_path):
+    """
+    Factorize per-row labels into (codes, label_names), rejecting empty labels
+    """
+    codes, label_names = pd.factorize(labels)
+    missing = np.flatnonzero(codes < 0)
+    if len(missing):
+        raise ValueError(f"{csv_path}: {len(missing)} rows have no label "
+                         f"(first at data row {missing[0]}); fill or drop them before training")
+    return codes, np.asarray(label_names, dtype=object)
+
+
+@instrumented('load_data', lambda result: {'rows': len(result[1])})
+def load_and_preprocess_data(csv_path, use_cache=True):
     """
     Load CSV data and preprocess for ML training
+
+    With use_cache, the capture is read from (or converted once into) the
+    binary cache next to the CSV, and X is a CaptureRows over its
+    memory-mapped columns: rows are only read when sliced.
     """
     print(f"Loading data from {csv_path}...")
+
+    if use_cache:
+        cached = load_dataset_cache(csv_path)
+        if cached is None:
+            cached = build_dataset_cache(csv_path)
+        if cached is not None:
+            sensors, imu, label_codes, label_names = cached
+            X = CaptureRows(sensors, imu)
+            y = label_names[label_codes]
+            counts = np.bincount(label_codes, minlength=len(label_names))
+
+            print(f"Total samples: {len(y)}")
+            print(f"Gesture labels: {label_names}")
+            print("Samples per gesture:")
+            for name, count in sorted(zip(label_names, counts), key=lambda item: -item[1]):
+                print(f"  {name}: {count}")
+            print(f"Feature matrix shape: {X.shape}")
+
+            return X, y, label_names
+
     df = pd.read_csv(csv_path)
+    encode_labels(df['label'], csv_path)
     
     print(f"Total samples: {len(df)}")
     print(f"Gesture labels: {df['label'].unique()}")
     print(f"Samples per gesture:\n{df['label'].value_counts()}\n")
     
     # Extract features and labels
-    sensor_cols = [f"S{row}_{col}" for row in range(4) for col in range(15)]
-    imu_cols = ['accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z']
-    
-    X = df[sensor_cols + imu_cols].values
+    X = df[SENSOR_COLUMNS + IMU_COLUMNS].values
     y = df['label'].values
     
     print(f"Feature matrix shape: {X.shape}")
@@ -61,35 +428,211 @@ def load_and_preprocess_data(csv_path):
     return X, y, df['label'].unique()
 
 
-def create_sliding_windows(X, y, window_size=WINDOW_SIZE, stride=STRIDE):
+# ===== BINARY DATASET CACHE =====
+
+def get_cache_dir(csv_path):
     """
-    Create sliding windows from continuous data
+    Cache directory for a capture CSV (stored alongside the CSV)
     """
-    windows = []
-    labels = []
-    
-    # Group by consecutive labels to avoid mixing gestures
-    current_label = y[0]
-    segment_start = 0
-    
-    for i in range(1, len(y)):
-        if y[i] != current_label or i == len(y) - 1:
-            # Extract windows from this segment
-            segment_end = i
-            segment_X = X[segment_start:segment_end]
-            
-            # Create sliding windows
-            for start in range(0, len(segment_X) - window_size + 1, stride):
-                window = segment_X[start:start + window_size]
-                windows.append(window)
-                labels.append(current_label)
-            
-            # Move to next segment
-            segment_start = i
-            current_label = y[i]
+    return f"{csv_path}.cache"
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def hash_file(path, block_size=1 << 20):
+    """
+    SHA-256 of a file's contents
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_fingerprint(csv_path):
+    """
+    Content hash of a capture, read from its binary cache when up to date
+    """
+    meta_path = os.path.join(get_cache_dir(csv_path), 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get('source') == _source_signature(csv_path) and 'sha256' in meta:
+            return meta['sha256']
     
-    windows = np.array(windows)
-    labels = np.array(labels)
+    return hash_file(csv_path)
+
+
+@instrumented('build_cache')
+def build_dataset_cache(csv_path, cache_dir=None):
+    """
+    Convert a capture CSV into the columnar binary cache
+
+    Layout: sensors.npy (uint16, N x 60), imu.npy (float32, N x 6),
+    label_codes.npy (per-row codes) and meta.json (label dictionary,
+    source signature and content hash). meta.json is written last so a partial conversion
+    is never mistaken for a valid cache.
+
+    Returns the same tuple as load_dataset_cache, or None if the sensor
+    columns cannot be stored losslessly as uint16.
+    """
+    cache_dir = cache_dir or get_cache_dir(csv_path)
+    print(f"Building binary cache in {cache_dir}...")
+
+    signature = _source_signature(csv_path)
+    content_hash = hash_file(csv_path)
+    df = pd.read_csv(csv_path)
+
+    sensors = df[SENSOR_COLUMNS].to_numpy()
+    if (np.issubdtype(sensors.dtype, np.floating) and not np.all(np.mod(sensors, 1) == 0)) \
+            or sensors.min() < 0 or sensors.max() > np.iinfo(np.uint16).max:
+        print("⚠ Sensor values do not fit uint16, skipping binary cache")
+        return None
+    sensors = sensors.astype(np.uint16)
+    imu = df[IMU_COLUMNS].to_numpy(dtype=np.float32)
+
+    codes, label_names = encode_labels(df['label'], csv_path)
+    label_codes = codes.astype(np.min_scalar_type(max(len(label_names) - 1, 0)))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    for name, array in (('sensors', sensors), ('imu', imu), ('label_codes', label_codes)):
+        tmp_path = os.path.join(cache_dir, f"{name}.tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, os.path.join(cache_dir, f"{name}.npy"))
+
+    meta = {
+        'version': CACHE_FORMAT_VERSION,
+        'source': signature,
+        'sha256': content_hash,
+        'num_rows': len(df),
+        'labels': [str(name) for name in label_names],
+    }
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + '.tmp', meta_path)
+
+    print(f"✓ Cached {len(df)} rows")
+
+    return sensors, imu, label_codes, label_names
+
+
+@instrumented('load_cache')
+def load_dataset_cache(csv_path, cache_dir=None):
+    """
+    Memory-map the binary cache for a capture CSV
+
+    Returns (sensors, imu, label_codes, label_names), or None if there is
+    no cache or the source CSV changed since it was built.
+    """
+    cache_dir = cache_dir or get_cache_dir(csv_path)
+    meta_path = os.path.join(cache_dir, 'meta.json')
+
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+
+    if meta.get('version') != CACHE_FORMAT_VERSION or meta.get('source') != _source_signature(csv_path):
+        print("Binary cache is stale, rebuilding...")
+        return None
+
+    try:
+        sensors = np.load(os.path.join(cache_dir, 'sensors.npy'), mmap_mode='r')
+        imu = np.load(os.path.join(cache_dir, 'imu.npy'), mmap_mode='r')
+        label_codes = np.load(os.path.join(cache_dir, 'label_codes.npy'), mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    if not (len(sensors) == len(imu) == len(label_codes) == meta['num_rows']):
+        return None
+
+    print(f"✓ Using binary cache: {cache_dir}")
+
+    return sensors, imu, label_codes, np.asarray(meta['labels'], dtype=object)
+
+
+# ===== SLIDING WINDOWS =====
+
+def find_label_segments(y):
+    """
+    Find runs of consecutive identical labels
+
+    Returns (segment_starts, segment_ends) with exclusive ends.
+    """
+    y = np.asarray(y)
+    if len(y) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    changes = np.flatnonzero(y[1:] != y[:-1]) + 1
+    segment_starts = np.concatenate([[0], changes])
+    segment_ends = np.concatenate([changes, [len(y)]])
+
+    return segment_starts, segment_ends
+
+
+@instrumented('windows')
+def compute_window_starts(y, window_size=WINDOW_SIZE, stride=STRIDE, include_final_row=True):
+    """
+    Compute the start row and label of every sliding window
+
+    Windows never cross a label change. With include_final_row=False the
+    last row of the capture is excluded, which reproduces the windows of
+    the original row-by-row implementation exactly.
+    """
+    y = np.asarray(y)
+    segment_starts, segment_ends = find_label_segments(y)
+
+    if not include_final_row and len(segment_ends):
+        segment_ends[-1] -= 1
+
+    lengths = segment_ends - segment_starts
+    counts = np.maximum((lengths - window_size) // stride + 1, 0)
+    total = int(counts.sum())
+
+    segment_index = np.repeat(np.arange(len(counts)), counts)
+    first_window = np.cumsum(counts) - counts
+    offsets = np.arange(total) - np.repeat(first_window, counts)
+
+    starts = segment_starts[segment_index] + offsets * stride
+    labels = y[segment_starts[segment_index]]
+
+    return starts, labels
+
+
+def window_view(X, window_size=WINDOW_SIZE):
+    """
+    Zero-copy (n_rows - window_size + 1, window_size, channels) view of X
+
+    Index it with the output of compute_window_starts to gather windows.
+    """
+    X = np.asarray(X)
+    if len(X) < window_size:
+        return np.empty((0, window_size, X.shape[1]), dtype=X.dtype)
+
+    view = np.lib.stride_tricks.sliding_window_view(X, window_size, axis=0)
+    return view.transpose(0, 2, 1)
+
+
+@instrumented('materialize_windows')
+def create_sliding_windows(X, y, window_size=WINDOW_SIZE, stride=STRIDE, include_final_row=True):
+    """
+    Create sliding windows from continuous data
+
+    Materializes every window; use compute_window_starts and window_view
+    to work on large captures without copying.
+    """
+    starts, labels = compute_window_starts(y, window_size, stride, include_final_row)
+    windows = window_view(X, window_size)[starts]
     
     print(f"Created {len(windows)} windows of size {window_size}")
     print(f"Window shape: {windows.shape}")
@@ -97,171 +640,665 @@ def create_sliding_windows(X, y, window_size=WINDOW_SIZE, stride=STRIDE):
     return windows, labels
 
 
-def extract_features(windows):
+# ===== FEATURE EXTRACTION =====
+
+# Feature name -> function mapping a (n_windows, window, channels) batch to a
+# (n_windows, k * channels) block. The order of DEFAULT_FEATURES defines the
+# feature vector layout that saved scalers and models depend on.
+FEATURE_REGISTRY = {}
+DEFAULT_FEATURES = ('mean', 'std', 'range')
+BAND_EDGES_HZ = ((0.0, 2.0), (2.0, 5.0), (5.0, 10.0), (10.0, 25.0))
+
+
+def register_feature(name):
+    """
+    Decorator adding a batched feature function to FEATURE_REGISTRY
+    """
+    def decorator(func):
+        FEATURE_REGISTRY[name] = func
+        return func
+    return decorator
+
+
+@register_feature('mean')
+def _feature_mean(windows):
+    return np.mean(windows, axis=1)
+
+
+@register_feature('std')
+def _feature_std(windows):
+    return np.std(windows, axis=1)
+
+
+@register_feature('range')
+def _feature_range(windows):
+    return np.max(windows, axis=1) - np.min(windows, axis=1)
+
+
+@register_feature('rms')
+def _feature_rms(windows):
+    return np.sqrt(np.mean(np.square(windows), axis=1))
+
+
+@register_feature('mav')
+def _feature_mean_absolute_value(windows):
+    return np.mean(np.abs(windows), axis=1)
+
+
+@register_feature('zero_crossings')
+def _feature_zero_crossings(windows):
+    # Crossings of the window mean (pressure readings are never negative)
+    centered = windows - np.mean(windows, axis=1, keepdims=True)
+    signs = np.signbit(centered)
+    return np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1).astype(windows.dtype)
+
+
+@register_feature('waveform_length')
+def _feature_waveform_length(windows):
+    return np.sum(np.abs(np.diff(windows, axis=1)), axis=1)
+
+
+@register_feature('slope_sign_changes')
+def _feature_slope_sign_changes(windows):
+    slopes = np.diff(windows, axis=1)
+    changes = slopes[:, 1:] * slopes[:, :-1] < 0
+    return np.count_nonzero(changes, axis=1).astype(windows.dtype)
+
+
+@register_feature('band_power')
+def _feature_band_power(windows):
+    # Mean spectral power per channel in each BAND_EDGES_HZ band
+    centered = windows - np.mean(windows, axis=1, keepdims=True)
+    power = np.abs(np.fft.rfft(centered, axis=1)) ** 2
+    freqs = np.fft.rfftfreq(windows.shape[1], d=1.0 / SAMPLE_RATE_HZ)
+
+    bands = []
+    for low, high in BAND_EDGES_HZ:
+        in_band = (freqs >= low) & (freqs < high)
+        if not np.any(in_band):
+            bands.append(np.zeros(power.shape[::2], dtype=windows.dtype))
+        else:
+            bands.append(np.mean(power[:, in_band], axis=1).astype(windows.dtype))
+    return np.concatenate(bands, axis=1)
+
+
+@instrumented('extract_features')
+def extract_features(windows, feature_names=DEFAULT_FEATURES, batch_size=8192, verbose=True):
     """
     Extract statistical features from raw windows
     Useful for Random Forest model
+
+    Features are computed batch-wise over the whole window tensor and
+    concatenated in the order of feature_names. The default selection
+    (mean, std, range per channel) matches the original feature vector.
     """
-    features = []
+    unknown = [name for name in feature_names if name not in FEATURE_REGISTRY]
+    if unknown:
+        raise ValueError(f"Unknown features: {unknown}. Available: {sorted(FEATURE_REGISTRY)}")
+
+    blocks = []
+    for start in range(0, len(windows), batch_size):
+        batch = np.asarray(windows[start:start + batch_size])
+        blocks.append(np.concatenate(
+            [FEATURE_REGISTRY[name](batch) for name in feature_names], axis=1
+        ))
+
+    if blocks:
+        features = np.concatenate(blocks, axis=0)
+    else:
+        features = np.empty((0, 0))
+    if verbose:
+        print(f"Extracted features shape: {features.shape}")
     
-    for window in windows:
-        # Statistical features for each sensor channel
-        mean = np.mean(window, axis=0)
-        std = np.std(window, axis=0)
-        min_val = np.min(window, axis=0)
-        max_val = np.max(window, axis=0)
-        range_val = max_val - min_val
+    return features
+
+
+# ===== PARALLEL FEATURE EXTRACTION =====
+
+def _fill_window_features(load_rows, window_starts, out, feature_names, window_size):
+    """
+    Write features of the windows at window_starts into out, chunk by chunk
+
+    load_rows(first, last) returns rows [first, last) of the source matrix;
+    only the rows a chunk covers are loaded and windows are never gathered
+    for more than one chunk at a time. window_starts need not be sorted.
+    """
+    for begin in range(0, len(window_starts), CHUNK_WINDOWS):
+        chunk = window_starts[begin:begin + CHUNK_WINDOWS]
+        first = chunk.min()
+        rows = load_rows(first, chunk.max() + window_size)
+        out[begin:begin + len(chunk)] = extract_features(
+            window_view(rows, window_size)[chunk - first], feature_names, verbose=False
+        )
+
+
+def _capture_rows(capture):
+    rows = CaptureRows(capture[0], capture[1])
+    return lambda first, last: rows[first:last]
+
+
+def _window_features_task(task):
+    """
+    Pool worker: compute one shard of features straight into shared memory
+
+    The source is either a shared-memory row matrix or a capture path that
+    the worker memory-maps itself, so no arrays are pickled either way.
+    """
+    source, window_starts, offset, out_spec, feature_names, window_size = task
+    out_shm = shared_memory.SharedMemory(name=out_spec[0])
+    source_shm = None
+    try:
+        out = np.ndarray(out_spec[1], dtype=out_spec[2], buffer=out_shm.buf)
+        if source[0] == 'shm':
+            source_shm = shared_memory.SharedMemory(name=source[1])
+            X = np.ndarray(source[2], dtype=source[3], buffer=source_shm.buf)
+            load_rows = lambda first, last: X[first:last]
+        else:
+            load_rows = _capture_rows(open_capture(source[1]))
         
-        # Combine all features
-        feature_vector = np.concatenate([mean, std, range_val])
-        features.append(feature_vector)
+        _fill_window_features(load_rows, window_starts, out[offset:offset + len(window_starts)],
+                              feature_names, window_size)
+    finally:
+        # Views into the buffers must be released before closing
+        out = X = load_rows = None
+        out_shm.close()
+        if source_shm is not None:
+            source_shm.close()
+
+
+def _feature_width(feature_names, window_size, channels):
+    probe = np.zeros((1, window_size, channels), dtype=np.float32)
+    return extract_features(probe, feature_names, verbose=False).shape[1]
+
+
+def _run_feature_tasks(sources, num_windows, dtype, feature_names, window_size, workers):
+    """
+    Shard (source, window_starts) pairs over a process pool
+
+    Results are written into one shared output block and copied out once.
+    """
+    width = _feature_width(feature_names, window_size, TOTAL_FEATURES)
+    nbytes = max(num_windows * width * np.dtype(dtype).itemsize, 1)
+    out_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        out_spec = (out_shm.name, (num_windows, width), np.dtype(dtype).str)
+        
+        tasks = []
+        offset = 0
+        for source, window_starts in sources:
+            # A few shards per worker keeps the pool balanced
+            for shard in np.array_split(window_starts, workers * 4):
+                if len(shard):
+                    tasks.append((source, shard, offset, out_spec, feature_names, window_size))
+                    offset += len(shard)
+        
+        with multiprocessing.get_context().Pool(workers) as pool:
+            pool.map(_window_features_task, tasks)
+        
+        features = np.ndarray((num_windows, width), dtype=dtype, buffer=out_shm.buf).copy()
+    finally:
+        out_shm.close()
+        out_shm.unlink()
+    
+    return features
+
+
+@instrumented('window_features', lambda result: {'feature_vectors': len(result)})
+def extract_window_features(X, window_starts, feature_names=DEFAULT_FEATURES, workers=1,
+                            window_size=WINDOW_SIZE, verbose=True):
+    """
+    Extract features for the windows of X starting at window_starts
+
+    Equivalent to extract_features(window_view(X)[window_starts]) without
+    materializing the windows. With workers > 1, X is placed in shared
+    memory once and windowing plus feature extraction are sharded across a
+    process pool that writes its results back into shared memory.
+    """
+    if not isinstance(X, CaptureRows):
+        X = np.asarray(X)
+    window_starts = np.asarray(window_starts)
+    
+    if workers <= 1 or len(window_starts) < workers:
+        width = _feature_width(feature_names, window_size, X.shape[1])
+        features = np.empty((len(window_starts), width), dtype=X.dtype)
+        _fill_window_features(lambda first, last: X[first:last], window_starts, features,
+                              feature_names, window_size)
+    else:
+        X_shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        try:
+            shared = np.ndarray(X.shape, dtype=X.dtype, buffer=X_shm.buf)
+            if isinstance(X, CaptureRows):
+                X.copy_to(shared)
+            else:
+                shared[:] = X
+            del shared
+            source = ('shm', X_shm.name, X.shape, X.dtype.str)
+            features = _run_feature_tasks([(source, window_starts)], len(window_starts), X.dtype,
+                                          feature_names, window_size, workers)
+        finally:
+            X_shm.close()
+            X_shm.unlink()
+    
+    if verbose:
+        print(f"Extracted features shape: {features.shape}")
+    
+    return features
+
+
+@instrumented('capture_features', lambda result: {'feature_vectors': len(result)})
+def extract_capture_features(capture_windows, feature_names=DEFAULT_FEATURES, workers=1,
+                             window_size=WINDOW_SIZE, verbose=True):
+    """
+    Extract features for (csv_path, window_starts) pairs across captures
+
+    Workers memory-map each capture from its binary cache themselves.
+    Rows follow the order of capture_windows.
+    """
+    num_windows = sum(len(window_starts) for _, window_starts in capture_windows)
+    sources = [(('capture', path), window_starts) for path, window_starts in capture_windows]
     
-    features = np.array(features)
-    print(f"Extracted features shape: {features.shape}")
+    if workers <= 1:
+        width = _feature_width(feature_names, window_size, TOTAL_FEATURES)
+        features = np.empty((num_windows, width), dtype=np.float32)
+        offset = 0
+        for (_, path), window_starts in sources:
+            _fill_window_features(_capture_rows(open_capture(path)), window_starts,
+                                  features[offset:offset + len(window_starts)],
+                                  feature_names, window_size)
+            offset += len(window_starts)
+    else:
+        features = _run_feature_tasks(sources, num_windows, np.float32, feature_names,
+                                      window_size, workers)
+    
+    if verbose:
+        print(f"Extracted features shape: {features.shape}")
     
     return features
 
 
+# ===== FEATURE CACHE =====
+
+def feature_cache_key(data_hash, feature_names, dtype, window_size=WINDOW_SIZE, stride=STRIDE):
+    """
+    Content address for the windows and features of one capture
+
+    Combines the data hash, the dtype the capture is loaded as (features
+    of float32 and float64 samples differ in the last bits), window
+    parameters, feature selection and a code version derived from the
+    source of the windowing and feature functions, so editing any of them
+    invalidates old entries.
+    """
+    code = hashlib.sha256()
+    functions = [find_label_segments, compute_window_starts, extract_features]
+    functions += [FEATURE_REGISTRY[name] for name in feature_names]
+    for func in functions:
+        code.update(inspect.getsource(func).encode('utf-8'))
+    
+    key = {
+        'data': data_hash,
+        'dtype': np.dtype(dtype).name,
+        'window_size': window_size,
+        'stride': stride,
+        'features': list(feature_names),
+        'sample_rate_hz': SAMPLE_RATE_HZ,
+        'band_edges_hz': [list(band) for band in BAND_EDGES_HZ],
+        'code': code.hexdigest(),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+
+class FeatureCache:
+    """
+    Persistent, content-addressed store of window and feature arrays
+
+    Each entry is a directory of .npy files named by its key. Entries are
+    evicted least-recently-used first once the cache exceeds max_bytes.
+    """
+    
+    def __init__(self, cache_dir=FEATURE_CACHE_DIR, max_bytes=FEATURE_CACHE_MB * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def get(self, key):
+        """
+        Return the arrays (memory-mapped) and metadata stored under key, or None
+        
+        An entry that can't be read back (a half-finished eviction, or
+        another run replacing it) is removed and counted as a miss.
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        meta_path = os.path.join(entry_dir, 'meta.json')
+        
+        if not os.path.exists(meta_path):
+            self.misses += 1
+            return None
+        
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode='r')
+                for name in meta['arrays']
+            }
+            # Directory mtime records the last use for LRU eviction
+            os.utime(entry_dir)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Feature cache entry {key} is broken ({e}), rebuilding")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            self.misses += 1
+            return None
+        self.hits += 1
+        
+        return arrays, meta
+    
+    def put(self, key, arrays, meta=None):
+        """
+        Store arrays under key, then evict old entries over the disk budget
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        tmp_dir = f"{entry_dir}.tmp{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(dict(meta or {}, arrays=sorted(arrays), created=time.time()), f, indent=2)
+        
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another run stored the same key first; its entry is equivalent
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        
+        self.evict(keep=key)
+    
+    def entries(self):
+        """
+        (key, size_bytes, last_used) for every complete entry, oldest first
+        
+        Skips put()'s <key>.tmp<pid> staging directories and entries that
+        disappear while being listed.
+        """
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            if '.tmp' in key:
+                continue
+            entry_dir = os.path.join(self.cache_dir, key)
+            if not os.path.exists(os.path.join(entry_dir, 'meta.json')):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+                entries.append((key, size, os.stat(entry_dir).st_mtime))
+            except OSError:
+                continue
+        
+        return sorted(entries, key=lambda entry: entry[2])
+    
+    def evict(self, keep=None):
+        """
+        Remove least-recently-used entries until the cache fits max_bytes
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            total -= size
+            self.evictions += 1
+    
+    def report(self):
+        used = sum(size for _, size, _ in self.entries())
+        return (f"Feature cache: {self.hits} hit(s), {self.misses} miss(es), "
+                f"{self.evictions} eviction(s), {used / 1024 ** 2:.1f} / "
+                f"{self.max_bytes / 1024 ** 2:.1f} MB used")
+
+
+@instrumented('load_window_features')
+def load_window_features(csv_path, feature_names=DEFAULT_FEATURES, workers=1, use_cache=True,
+                         feature_cache=None):
+    """
+    Window labels and features for every window of a capture
+
+    Returns (features, window_labels, label_encoder). On a feature cache
+    hit the capture itself is not loaded at all.
+    """
+    key = None
+    if feature_cache is not None:
+        # The binary cache loads float32 and the CSV float64; a capture the
+        # binary cache cannot hold always falls back to the CSV, so each key
+        # still maps to one load path
+        load_dtype = np.float32 if use_cache else np.float64
+        key = feature_cache_key(dataset_fingerprint(csv_path), feature_names, load_dtype)
+        cached = feature_cache.get(key)
+        if cached is not None:
+            arrays, meta = cached
+            label_encoder = LabelEncoder()
+            label_encoder.classes_ = np.asarray(arrays['classes'], dtype=meta['classes_dtype'])
+            print(f"✓ Feature cache hit ({key}): {arrays['features'].shape[0]} windows")
+            INSTRUMENTATION.count('windows', len(arrays['window_labels']))
+            return arrays['features'], arrays['window_labels'], label_encoder
+    
+    # Load data
+    X, y, gesture_names = load_and_preprocess_data(csv_path, use_cache=use_cache)
+    
+    # Encode labels
+    label_encoder = LabelEncoder()
+    y_encoded = label_encoder.fit_transform(y)
+    
+    # Create windows
+    window_starts, window_labels = compute_window_starts(y_encoded)
+    print(f"Created {len(window_starts)} windows of size {WINDOW_SIZE}")
+    INSTRUMENTATION.count('windows', len(window_starts))
+    
+    # Features are computed straight from X, windows are never materialized
+    features = extract_window_features(X, window_starts, feature_names, workers)
+    
+    if feature_cache is not None:
+        feature_cache.put(
+            key,
+            # Classes keep their type (numeric labels stay numeric); object
+            # arrays of strings are stored as fixed-width text
+            {'window_starts': window_starts, 'window_labels': window_labels, 'features': features,
+             'classes': np.asarray(label_encoder.classes_.tolist())},
+            {'source': os.path.abspath(csv_path), 'features': list(feature_names),
+             'classes_dtype': label_encoder.classes_.dtype.str},
+        )
+    
+    return features, window_labels, label_encoder
+
+
 # ===== MODEL ARCHITECTURES =====
 
-def build_random_forest_model(X_train, y_train):
+# Defaults of the hyperparameters --search tunes
+RF_PARAMS = {
+    'n_estimators': 200,
+    'max_depth': 20,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+}
+SGD_PARAMS = {
+    'alpha': 1e-4,
+}
+CNN_PARAMS = {
+    'filters': (64, 128, 256),  # one conv block per entry
+    'kernel_size': 3,
+    'separable': False,  # depthwise-separable instead of full convolutions
+    'downsample': 1,  # average-pool the input over time by this factor first
+    'conv_dropout': 0.3,
+    'dense_units': (128, 64),
+    'dense_dropout': (0.5, 0.3),  # after each dense layer
+    'learning_rate': 0.001,
+}
+
+
+@instrumented('fit_random_forest')
+def build_random_forest_model(X_train, y_train, params=None, n_jobs=-1, verbose=1, channel_names=CHANNEL_NAMES):
     """
     Build and train Random Forest classifier
     Fast training, good baseline performance
+
+    params overrides entries of RF_PARAMS. channel_names are the channels
+    the window features were computed from, for the importance report.
     """
-    print("\n=== Training Random Forest Model ===")
+    if verbose:
+        print("\n=== Training Random Forest Model ===")
     
     model = RandomForestClassifier(
-        n_estimators=200,
-        max_depth=20,
-        min_samples_split=5,
-        min_samples_leaf=2,
+        **dict(RF_PARAMS, **(params or {})),
         random_state=42,
-        n_jobs=-1,
-        verbose=1
+        n_jobs=n_jobs,
+        verbose=verbose
     )
     
     model.fit(X_train, y_train)
     
-    # Feature importance
-    feature_importance = model.feature_importances_
-    print(f"\nTop 10 most important features:")
-    top_indices = np.argsort(feature_importance)[-10:][::-1]
-    for idx in top_indices:
-        print(f"  Feature {idx}: {feature_importance[idx]:.4f}")
+    if verbose:
+        # Importance summed over every feature of a physical channel
+        importance = channel_importances(model, len(channel_names))
+        print(f"\nTop 10 most important channels:")
+        for idx in np.argsort(importance)[-10:][::-1]:
+            print(f"  {channel_names[idx]}: {importance[idx]:.4f}")
     
     return model
 
 
-def build_cnn_model(input_shape, num_classes):
+def build_sgd_model(params=None):
+    """
+    Build linear classifier trained incrementally with partial_fit
+    Used by the streaming pipeline, memory does not grow with the dataset
+    """
+    return SGDClassifier(loss='log_loss', **dict(SGD_PARAMS, **(params or {})), random_state=42)
+
+
+@instrumented('build_cnn')
+def build_cnn_model(input_shape, num_classes, params=None, verbose=True):
     """
     Build CNN model for time-series classification
     Better accuracy, requires more training time
+
+    params overrides entries of CNN_PARAMS; the defaults give three conv
+    blocks of 64/128/256 filters and two dense layers.
     """
-    print("\n=== Building CNN Model ===")
+    params = dict(CNN_PARAMS, **(params or {}))
+    if verbose:
+        print("\n=== Building CNN Model ===")
     
-    model = keras.Sequential([
-        # First conv block
-        layers.Conv1D(64, 3, activation='relu', input_shape=input_shape),
-        layers.BatchNormalization(),
-        layers.MaxPooling1D(2),
-        layers.Dropout(0.3),
-        
-        # Second conv block
-        layers.Conv1D(128, 3, activation='relu'),
-        layers.BatchNormalization(),
-        layers.MaxPooling1D(2),
-        layers.Dropout(0.3),
-        
-        # Third conv block
-        layers.Conv1D(256, 3, activation='relu'),
-        layers.BatchNormalization(),
-        layers.GlobalAveragePooling1D(),
-        
-        # Dense layers
-        layers.Dense(128, activation='relu'),
-        layers.Dropout(0.5),
-        layers.Dense(64, activation='relu'),
-        layers.Dropout(0.3),
-        
-        # Output layer
-        layers.Dense(num_classes, activation='softmax')
-    ])
+    model = keras.Sequential([layers.Input(shape=input_shape)])
+    if params['downsample'] > 1:
+        model.add(layers.AveragePooling1D(params['downsample']))
+    
+    # Conv blocks; the last one is pooled over time
+    conv = layers.SeparableConv1D if params['separable'] else layers.Conv1D
+    filters = list(params['filters'])
+    for i, count in enumerate(filters):
+        model.add(conv(count, params['kernel_size'], activation='relu'))
+        model.add(layers.BatchNormalization())
+        if i < len(filters) - 1:
+            model.add(layers.MaxPooling1D(2))
+            model.add(layers.Dropout(params['conv_dropout']))
+    model.add(layers.GlobalAveragePooling1D())
+    
+    # Dense layers; the last dense_dropout entry repeats for extra layers
+    dropouts = list(params['dense_dropout'])
+    for i, units in enumerate(params['dense_units']):
+        model.add(layers.Dense(units, activation='relu'))
+        model.add(layers.Dropout(dropouts[min(i, len(dropouts) - 1)]))
+    
+    # Output layer
+    model.add(layers.Dense(num_classes, activation='softmax'))
     
     model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        optimizer=keras.optimizers.Adam(learning_rate=params['learning_rate']),
         loss='sparse_categorical_crossentropy',
         metrics=['accuracy']
     )
     
-    print(model.summary())
+    if verbose:
+        print(model.summary())
     
     return model
 
 
 # ===== TRAINING & EVALUATION =====
 
+WINDOW_SCALER_FILENAME = 'window_scaler.pkl'
+
+
+def fit_window_scaler(chunks):
+    """
+    Per-channel StandardScaler over every frame of (windows, labels) chunks
+
+    The CNN is trained on standardized windows so ADC counts and IMU units
+    share one range - full-integer TFLite needs that, as its input tensor
+    has a single int8 scale.
+    """
+    scaler = StandardScaler()
+    for windows, _ in chunks:
+        scaler.partial_fit(np.asarray(windows).reshape(-1, windows.shape[-1]))
+    return scaler
+
+
+def scale_windows(windows, scaler, out=None):
+    """
+    Standardize (N, window_size, channels) windows as float32
+    """
+    out = np.subtract(windows, scaler.mean_.astype(np.float32), out=out, dtype=np.float32)
+    out /= scaler.scale_.astype(np.float32)
+    return out
+
+
+@instrumented('train_and_evaluate')
 def train_and_evaluate(X_train, X_test, y_train, y_test, label_encoder, 
-                       model_type='random_forest', output_dir='output'):
+                       model_type='random_forest', output_dir='output',
+                       feature_names=DEFAULT_FEATURES, channels=None, epochs=CNN_EPOCHS):
     """
     Train model and evaluate performance
+
+    channels are the indices of the capture channels the windows hold
+    (None: all of them), recorded in model_meta.json.
     """
     os.makedirs(output_dir, exist_ok=True)
     
-    if model_type == 'random_forest':
+    if model_type in ('random_forest', 'sgd'):
         # Extract features for Random Forest
-        X_train_features = extract_features(X_train)
-        X_test_features = extract_features(X_test)
-        
-        # Scale features
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train_features)
-        X_test_scaled = scaler.transform(X_test_features)
-        
-        # Train model
-        model = build_random_forest_model(X_train_scaled, y_train)
-        
-        # Predictions
-        y_pred = model.predict(X_test_scaled)
-        
-        # Save model
-        joblib.dump(model, os.path.join(output_dir, 'gesture_model_rf.pkl'))
-        joblib.dump(scaler, os.path.join(output_dir, 'scaler.pkl'))
+        X_train_features = extract_features(X_train, feature_names)
+        X_test_features = extract_features(X_test, feature_names)
         
+        return train_and_evaluate_features(
+            X_train_features, X_test_features, y_train, y_test,
+            label_encoder, model_type, output_dir, feature_names=feature_names, channels=channels
+        )
+    
     elif model_type == 'cnn':
         # Build CNN model
         num_classes = len(np.unique(y_train))
         input_shape = (X_train.shape[1], X_train.shape[2])
         
-        model = build_cnn_model(input_shape, num_classes)
+        # Standardize every channel; inference and TFLite conversion reuse the scaler
+        window_scaler = fit_window_scaler([(X_train, y_train)])
+        joblib.dump(window_scaler, os.path.join(output_dir, WINDOW_SCALER_FILENAME))
+        save_model_meta(output_dir, model_type, channels=channels)
+        X_train = scale_windows(X_train, window_scaler)
+        X_test = scale_windows(X_test, window_scaler)
         
-        # Callbacks
-        callbacks = [
-            keras.callbacks.EarlyStopping(
-                monitor='val_loss',
-                patience=10,
-                restore_best_weights=True
-            ),
-            keras.callbacks.ReduceLROnPlateau(
-                monitor='val_loss',
-                factor=0.5,
-                patience=5,
-                min_lr=1e-6
-            ),
-            keras.callbacks.ModelCheckpoint(
-                os.path.join(output_dir, 'best_model.h5'),
-                monitor='val_accuracy',
-                save_best_only=True
-            )
-        ]
+        model = build_cnn_model(input_shape, num_classes)
         
         # Train
         history = model.fit(
             X_train, y_train,
             validation_data=(X_test, y_test),
-            epochs=100,
+            epochs=epochs,
             batch_size=32,
-            callbacks=callbacks,
+            callbacks=build_cnn_callbacks(output_dir),
             verbose=1
         )
         
@@ -272,7 +1309,127 @@ def train_and_evaluate(X_train, X_test, y_train, y_test, label_encoder,
         y_pred_probs = model.predict(X_test)
         y_pred = np.argmax(y_pred_probs, axis=1)
     
-    # Evaluate
+    evaluate_predictions(y_test, y_pred, label_encoder, output_dir)
+    
+    return model
+
+
+@instrumented('train_feature_model')
+def train_and_evaluate_features(X_train_features, X_test_features, y_train, y_test,
+                                label_encoder, model_type='random_forest', output_dir='output',
+                                feature_names=DEFAULT_FEATURES, channels=None):
+    """
+    Scale precomputed window features, train a feature model and evaluate
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Scale features
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train_features)
+    X_test_scaled = scaler.transform(X_test_features)
+    
+    # Train model
+    if model_type == 'random_forest':
+        channel_names = CHANNEL_NAMES if channels is None else [CHANNEL_NAMES[i] for i in channels]
+        model = build_random_forest_model(X_train_scaled, y_train, channel_names=channel_names)
+    else:
+        print("\n=== Training SGD Model ===")
+        model = build_sgd_model().fit(X_train_scaled, y_train)
+    
+    # Predictions
+    y_pred = model.predict(X_test_scaled)
+    
+    # Save model
+    joblib.dump(model, os.path.join(output_dir, MODEL_FILENAMES[model_type]))
+    joblib.dump(scaler, os.path.join(output_dir, 'scaler.pkl'))
+    save_model_meta(output_dir, model_type, feature_names, channels)
+    
+    evaluate_predictions(y_test, y_pred, label_encoder, output_dir)
+    
+    return model
+
+
+MODEL_FILENAMES = {
+    'random_forest': 'gesture_model_rf.pkl',
+    'sgd': 'gesture_model_sgd.pkl',
+}
+MODEL_META_FILENAME = 'model_meta.json'
+
+
+def save_model_meta(output_dir, model_type, feature_names=None, channels=None):
+    """
+    Record how the saved model's inputs are built (model_meta.json)
+
+    Entries are keyed by model type, as one directory can hold several
+    models, and replaced on every save. Inference reads them back so a
+    model is never fed window features of a different selection (any
+    three features give the same width) or channels it was not trained
+    on. channels are capture channel indices, None for all of them.
+    """
+    entry = {}
+    if feature_names is not None:
+        entry['feature_names'] = list(feature_names)
+    if channels is not None:
+        entry['channels'] = [CHANNEL_NAMES[i] for i in channels]
+    meta = read_model_meta(output_dir)
+    meta[model_type] = entry
+    with open(os.path.join(output_dir, MODEL_META_FILENAME), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_model_meta(model_dir):
+    path = os.path.join(model_dir, MODEL_META_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def load_model_meta(model_dir, model_type):
+    """
+    model_meta.json entry of one model, or {} for models saved without one
+
+    TFLite models are converted from the CNN and share its entry.
+    """
+    return read_model_meta(model_dir).get('cnn' if model_type == 'tflite' else model_type, {})
+
+
+def channel_indices_of(names):
+    """
+    Sorted capture channel indices of channel names
+    """
+    return np.array(sorted(CHANNEL_NAMES.index(name) for name in names))
+
+
+def build_cnn_callbacks(output_dir):
+    """
+    Early stopping, LR schedule and best-model checkpoint for CNN training
+    """
+    return [
+        keras.callbacks.EarlyStopping(
+            monitor='val_loss',
+            patience=10,
+            restore_best_weights=True
+        ),
+        keras.callbacks.ReduceLROnPlateau(
+            monitor='val_loss',
+            factor=0.5,
+            patience=5,
+            min_lr=1e-6
+        ),
+        keras.callbacks.ModelCheckpoint(
+            os.path.join(output_dir, 'best_model.h5'),
+            monitor='val_accuracy',
+            save_best_only=True
+        )
+    ]
+
+
+@instrumented('evaluate')
+def evaluate_predictions(y_test, y_pred, label_encoder, output_dir):
+    """
+    Print accuracy and classification report, save confusion matrix
+    """
     accuracy = accuracy_score(y_test, y_pred)
     print(f"\n=== Model Performance ===")
     print(f"Test Accuracy: {accuracy:.4f} ({accuracy*100:.2f}%)")
@@ -280,15 +1437,228 @@ def train_and_evaluate(X_train, X_test, y_train, y_test, label_encoder,
     # Classification report
     print("\nClassification Report:")
     gesture_names = label_encoder.classes_
-    print(classification_report(y_test, y_pred, target_names=gesture_names))
+    class_ids = np.arange(len(gesture_names))
+    print(classification_report(y_test, y_pred, labels=class_ids, target_names=gesture_names,
+                                zero_division=0))
+    
+    # Confusion matrix
+    cm = confusion_matrix(y_test, y_pred, labels=class_ids)
+    plot_confusion_matrix(cm, gesture_names, output_dir)
+    
+    return accuracy
+
+
+# ===== STREAMING (OUT-OF-CORE) PIPELINE =====
+
+def resolve_data_paths(data):
+    """
+    Expand --data (a CSV file, a directory of CSVs or a glob) to capture paths
+    """
+    if os.path.isdir(data):
+        paths = sorted(glob.glob(os.path.join(data, '*.csv')))
+    elif glob.has_magic(data):
+        paths = sorted(path for path in glob.glob(data) if os.path.isfile(path))
+    else:
+        paths = [data]
+    
+    if not paths:
+        raise FileNotFoundError(f"No capture CSVs found for: {data}")
+    
+    return paths
+
+
+def open_capture(csv_path):
+    """
+    Open one capture as (sensors, imu, label_codes, label_names)
+
+    Arrays are memory-mapped from the binary cache, so opening a capture
+    does not read it into memory.
+    """
+    capture = load_dataset_cache(csv_path)
+    if capture is None:
+        capture = build_dataset_cache(csv_path)
+    if capture is None:
+        df = pd.read_csv(csv_path)
+        codes, label_names = encode_labels(df['label'], csv_path)
+        capture = (
+            df[SENSOR_COLUMNS].to_numpy(dtype=np.float32),
+            df[IMU_COLUMNS].to_numpy(dtype=np.float32),
+            codes,
+            label_names,
+        )
+    
+    return capture
+
+
+def collect_label_names(paths):
+    """
+    Union of gesture labels across captures
+    """
+    names = set()
+    for path in paths:
+        names.update(open_capture(path)[3])
+    
+    return sorted(names)
+
+
+def iter_window_chunks(paths, label_encoder, subset=None, test_size=0.2, seed=42,
+                       chunk_windows=CHUNK_WINDOWS, window_size=WINDOW_SIZE, stride=STRIDE):
+    """
+    Yield (windows, labels) chunks of at most chunk_windows windows
+
+    Captures are processed one at a time and only the rows covered by the
+    current chunk are loaded, so memory is bounded by chunk_windows.
+    Windows never cross a file or label-segment boundary. subset selects
+    'train' or 'test' windows with a per-file seeded split.
+    """
+    for file_index, path in enumerate(paths):
+        capture, starts, labels = capture_window_index(
+            path, file_index, label_encoder, subset, test_size, seed, window_size, stride
+        )
+        load_rows = _capture_rows(capture)
+        
+        for begin in range(0, len(starts), chunk_windows):
+            chunk_starts = starts[begin:begin + chunk_windows]
+            first = chunk_starts[0]
+            rows = load_rows(first, chunk_starts[-1] + window_size)
+            yield window_view(rows, window_size)[chunk_starts - first], labels[begin:begin + chunk_windows]
+
+
+def capture_window_index(path, file_index, label_encoder, subset=None, test_size=0.2, seed=42,
+                         window_size=WINDOW_SIZE, stride=STRIDE):
+    """
+    Open a capture and compute its window starts and encoded labels
+
+    subset selects 'train' or 'test' windows with a split seeded by
+    (seed, file_index), so every pass sees the same split.
+    """
+    capture = open_capture(path)
+    label_codes, label_names = capture[2], capture[3]
+    
+    starts, local_labels = compute_window_starts(label_codes, window_size, stride)
+    labels = label_encoder.transform(label_names)[local_labels]
+    
+    if subset is not None:
+        is_test = np.random.default_rng([seed, file_index]).random(len(starts)) < test_size
+        keep = is_test if subset == 'test' else ~is_test
+        starts, labels = starts[keep], labels[keep]
+    
+    # Counted on every pass over the capture
+    INSTRUMENTATION.count('windows_streamed', len(starts))
+    
+    return capture, starts, labels
+
+
+@instrumented('train_streaming')
+def train_streaming(paths, label_encoder, model_type='random_forest', output_dir='output',
+                    feature_names=DEFAULT_FEATURES, chunk_windows=CHUNK_WINDOWS, sgd_epochs=5,
+                    workers=1, epochs=CNN_EPOCHS):
+    """
+    Train and evaluate on captures streamed chunk by chunk
+
+    - cnn: tf.data pipeline over the chunk generator
+    - sgd: StandardScaler and SGDClassifier updated with partial_fit
+    - random_forest: features are streamed, only the (much smaller)
+      feature matrix is held in memory for the forest fit. With
+      workers > 1 the captures are sharded across a process pool.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    num_classes = len(label_encoder.classes_)
+    
+    def chunks(subset):
+        return iter_window_chunks(paths, label_encoder, subset, chunk_windows=chunk_windows)
+    
+    def feature_chunks(subset):
+        for windows, labels in chunks(subset):
+            yield extract_features(windows, feature_names, verbose=False), labels
+    
+    print(f"\nStreaming {len(paths)} captures in chunks of {chunk_windows} windows")
+    
+    if model_type == 'cnn':
+        window_scaler = fit_window_scaler(chunks('train'))
+        joblib.dump(window_scaler, os.path.join(output_dir, WINDOW_SCALER_FILENAME))
+        save_model_meta(output_dir, model_type)
+        
+        def scaled_chunks(subset):
+            for windows, labels in chunks(subset):
+                yield scale_windows(windows, window_scaler), labels
+        
+        signature = (
+            tf.TensorSpec(shape=(None, WINDOW_SIZE, TOTAL_FEATURES), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.int64),
+        )
+        
+        def make_dataset(subset, shuffle):
+            dataset = tf.data.Dataset.from_generator(lambda: scaled_chunks(subset), output_signature=signature)
+            dataset = dataset.unbatch()
+            if shuffle:
+                dataset = dataset.shuffle(chunk_windows)
+            return dataset.batch(32).prefetch(tf.data.AUTOTUNE)
+        
+        model = build_cnn_model((WINDOW_SIZE, TOTAL_FEATURES), num_classes)
+        history = model.fit(
+            make_dataset('train', shuffle=True),
+            validation_data=make_dataset('test', shuffle=False),
+            epochs=epochs,
+            callbacks=build_cnn_callbacks(output_dir),
+            verbose=1
+        )
+        plot_training_history(history, output_dir)
+        
+        y_test, y_pred = [], []
+        for windows, labels in scaled_chunks('test'):
+            y_test.append(labels)
+            y_pred.append(np.argmax(model.predict(windows, verbose=0), axis=1))
+    
+    else:
+        scaler = StandardScaler()
+        if model_type == 'sgd':
+            for features, _ in feature_chunks('train'):
+                scaler.partial_fit(features)
+            
+            print("\n=== Training SGD Model ===")
+            model = build_sgd_model()
+            classes = np.arange(num_classes)
+            for epoch in range(sgd_epochs):
+                for features, labels in feature_chunks('train'):
+                    model.partial_fit(scaler.transform(features), labels, classes=classes)
+                print(f"  Epoch {epoch + 1}/{sgd_epochs} done")
+        elif workers > 1:
+            splits = {}
+            for subset in ('train', 'test'):
+                index = [capture_window_index(path, file_index, label_encoder, subset)[1:]
+                         for file_index, path in enumerate(paths)]
+                features = extract_capture_features(
+                    [(path, starts) for path, (starts, _) in zip(paths, index)],
+                    feature_names, workers
+                )
+                splits[subset] = (features, np.concatenate([labels for _, labels in index]))
+            
+            return train_and_evaluate_features(
+                splits['train'][0], splits['test'][0], splits['train'][1], splits['test'][1],
+                label_encoder, model_type, output_dir, feature_names=feature_names
+            )
+        else:
+            train_features, train_labels = zip(*feature_chunks('train'))
+            X_train_scaled = scaler.fit_transform(np.concatenate(train_features))
+            model = build_random_forest_model(X_train_scaled, np.concatenate(train_labels))
+            del X_train_scaled
+        
+        y_test, y_pred = [], []
+        for features, labels in feature_chunks('test'):
+            y_test.append(labels)
+            y_pred.append(model.predict(scaler.transform(features)))
+        
+        joblib.dump(model, os.path.join(output_dir, MODEL_FILENAMES[model_type]))
+        joblib.dump(scaler, os.path.join(output_dir, 'scaler.pkl'))
+        save_model_meta(output_dir, model_type, feature_names)
     
-    # Confusion matrix
-    cm = confusion_matrix(y_test, y_pred)
-    plot_confusion_matrix(cm, gesture_names, output_dir)
+    evaluate_predictions(np.concatenate(y_test), np.concatenate(y_pred), label_encoder, output_dir)
     
     return model
 
 
+@instrumented('plots')
 def plot_training_history(history, output_dir):
     """
     Plot training and validation accuracy/loss
@@ -318,6 +1688,7 @@ def plot_training_history(history, output_dir):
     plt.close()
 
 
+@instrumented('plots')
 def plot_confusion_matrix(cm, class_names, output_dir):
     """
     Plot confusion matrix heatmap
@@ -333,22 +1704,717 @@ def plot_confusion_matrix(cm, class_names, output_dir):
     plt.close()
 
 
+# ===== GROUPED CROSS-VALIDATION & HYPERPARAMETER SEARCH =====
+
+SEARCH_FOLDS = 5
+SEARCH_RESULTS_FILENAME = 'search_results.jsonl'
+SEARCH_SUMMARY_FILENAME = 'search_summary.json'
+CNN_SEARCH_EPOCHS = 20
+
+# {parameter: [values]} grids; any RF_PARAMS/SGD_PARAMS/CNN_PARAMS entry
+# can be searched, plus epochs and batch_size for the CNN
+DEFAULT_SEARCH_SPACES = {
+    'random_forest': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [10, 20, None],
+        'min_samples_leaf': [1, 2, 4],
+    },
+    'sgd': {
+        'alpha': [1e-5, 1e-4, 1e-3, 1e-2],
+    },
+    'cnn': {
+        'filters': [[32, 64, 128], [64, 128, 256]],
+        'dense_units': [[64, 32], [128, 64]],
+        'learning_rate': [1e-3, 3e-4],
+        'epochs': [CNN_SEARCH_EPOCHS],
+    },
+}
+
+
+def search_trials(space, max_trials=None, seed=42):
+    """
+    Every parameter combination of a search space ({name: [values]})
+
+    With max_trials, a seeded random subset of the grid is returned
+    instead, in grid order.
+    """
+    names = sorted(space)
+    trials = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    if max_trials is not None and max_trials < len(trials):
+        picked = np.random.default_rng(seed).choice(len(trials), max_trials, replace=False)
+        trials = [trials[i] for i in np.sort(picked)]
+    return trials
+
+
+def search_trial_id(model_type, params, context):
+    """
+    Stable id of a trial: the model, its parameters and the data/CV setup
+    """
+    key = {'model_type': model_type, 'params': params, 'context': context}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+@instrumented('load_search_data')
+def load_search_data(paths, model_type, feature_names=DEFAULT_FEATURES, workers=1, feature_cache=None):
+    """
+    Everything a search shares across trials, computed once
+
+    Returns (data, labels, window_starts, sessions, segments, label_encoder).
+    data is the feature matrix for feature models (through the feature
+    cache, so a resumed search skips extraction too), or all capture rows
+    stacked as float32 for the CNN, with window_starts pointing into them.
+    sessions and segments give each window's capture and label segment.
+    """
+    label_encoder = LabelEncoder()
+    label_encoder.fit(collect_label_names(paths))
+    
+    data, labels, window_starts, sessions, segments = [], [], [], [], []
+    row_offset = segment_offset = 0
+    for file_index, path in enumerate(paths):
+        capture, starts, capture_labels = capture_window_index(path, file_index, label_encoder)
+        num_rows = len(capture[2])
+        segment_starts, _ = find_label_segments(capture[2])
+        
+        if model_type == 'cnn':
+            data.append(_capture_rows(capture)(0, num_rows))
+        else:
+            features, _, _ = load_window_features(path, feature_names, workers, feature_cache=feature_cache)
+            data.append(np.asarray(features, dtype=np.float32))
+        
+        labels.append(capture_labels)
+        window_starts.append(starts + row_offset)
+        sessions.append(np.full(len(starts), file_index))
+        segments.append(np.searchsorted(segment_starts, starts, side='right') - 1 + segment_offset)
+        row_offset += num_rows
+        segment_offset += len(segment_starts)
+    
+    return (np.concatenate(data), np.concatenate(labels), np.concatenate(window_starts),
+            np.concatenate(sessions), np.concatenate(segments), label_encoder)
+
+
+def grouped_folds(labels, groups, folds=SEARCH_FOLDS, seed=42):
+    """
+    Fold number of every window for stratified, grouped K-fold CV
+
+    All windows of a group (label segment or capture session) land in the
+    same fold, so overlapping windows never sit on both sides of a split.
+    """
+    num_groups = len(np.unique(groups))
+    if num_groups < folds:
+        raise ValueError(f"{folds}-fold CV needs at least {folds} groups, found {num_groups}")
+    
+    fold_of = np.empty(len(labels), dtype=np.int8)
+    splitter = StratifiedGroupKFold(n_splits=folds, shuffle=True, random_state=seed)
+    for fold, (_, test_idx) in enumerate(splitter.split(np.zeros(len(labels)), labels, groups)):
+        fold_of[test_idx] = fold
+    return fold_of
+
+
+class SearchResults:
+    """
+    Append-only JSONL store of per-fold search results
+
+    Every (trial, fold) is written and flushed as soon as it finishes, so
+    an interrupted search resumes with only the missing folds. A line cut
+    short by a crash is ignored.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self.file = None
+        
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.records[(record['trial'], record['fold'])] = record
+    
+    def done(self, trial_id, fold):
+        return (trial_id, fold) in self.records
+    
+    def add(self, record):
+        if self.file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file = open(self.path, 'a+', encoding='utf-8')
+            # Terminate a partial last line so the next record starts clean
+            if self.file.tell() > 0:
+                self.file.seek(self.file.tell() - 1)
+                if self.file.read(1) != '\n':
+                    self.file.write('\n')
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        self.records[(record['trial'], record['fold'])] = record
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+_SEARCH_STATE = {}
+
+
+def _set_search_state(data, labels, window_starts, fold_of, num_classes, threads):
+    _SEARCH_STATE.update(data=data, labels=labels, window_starts=window_starts, fold_of=fold_of,
+                         num_classes=num_classes, threads=threads)
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:
+        pass  # TensorFlow already initialized in this process
+
+
+def _init_search_worker(data_spec, labels, window_starts, fold_of, num_classes, threads):
+    """
+    Pool initializer: attach the shared data read-only and apply the thread budget
+    """
+    shm = shared_memory.SharedMemory(name=data_spec[0])
+    data = np.ndarray(data_spec[1], dtype=data_spec[2], buffer=shm.buf)
+    data.flags.writeable = False
+    _SEARCH_STATE['shm'] = shm  # keeps the mapping alive for the worker's lifetime
+    threadpool_limits(threads)
+    _set_search_state(data, labels, window_starts, fold_of, num_classes, threads)
+
+
+def _search_fold_task(task):
+    """
+    Train one trial on all folds but one and score it on the held-out fold
+    """
+    trial_id, model_type, params, fold = task
+    state = _SEARCH_STATE
+    labels = state['labels']
+    train_idx = np.flatnonzero(state['fold_of'] != fold)
+    test_idx = np.flatnonzero(state['fold_of'] == fold)
+    start = time.perf_counter()
+    
+    if model_type == 'cnn':
+        params = dict(params)
+        epochs = params.pop('epochs', CNN_SEARCH_EPOCHS)
+        batch_size = params.pop('batch_size', 32)
+        windows = window_view(state['data'])
+        starts = state['window_starts']
+        
+        window_scaler = fit_window_scaler([(windows[starts[train_idx]], None)])
+        X_train = scale_windows(windows[starts[train_idx]], window_scaler)
+        X_test = scale_windows(windows[starts[test_idx]], window_scaler)
+        
+        keras.utils.set_random_seed(42)
+        model = build_cnn_model(X_train.shape[1:], state['num_classes'], params, verbose=False)
+        model.fit(X_train, labels[train_idx], epochs=epochs, batch_size=batch_size, verbose=0)
+        y_pred = np.argmax(model.predict(X_test, batch_size=256, verbose=0), axis=1)
+        keras.backend.clear_session()
+    else:
+        features = state['data']
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(features[train_idx])
+        X_test = scaler.transform(features[test_idx])
+        
+        if model_type == 'random_forest':
+            model = build_random_forest_model(X_train, labels[train_idx], params,
+                                              n_jobs=state['threads'], verbose=0)
+        else:
+            model = build_sgd_model(params).fit(X_train, labels[train_idx])
+        y_pred = model.predict(X_test)
+    
+    return {
+        'trial': trial_id,
+        'fold': fold,
+        'accuracy': float(accuracy_score(labels[test_idx], y_pred)),
+        'macro_f1': float(f1_score(labels[test_idx], y_pred, average='macro', zero_division=0)),
+        'train_windows': len(train_idx),
+        'test_windows': len(test_idx),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def summarize_search(results, trials, folds):
+    """
+    Mean/std fold scores of every fully evaluated trial, best first
+    """
+    summary = []
+    for trial_id, params in trials:
+        records = [results.records.get((trial_id, fold)) for fold in range(folds)]
+        if None in records:
+            continue
+        accuracy = np.array([record['accuracy'] for record in records])
+        summary.append({
+            'trial': trial_id,
+            'params': params,
+            'accuracy_mean': float(accuracy.mean()),
+            'accuracy_std': float(accuracy.std()),
+            'macro_f1_mean': float(np.mean([record['macro_f1'] for record in records])),
+            'seconds': float(sum(record['seconds'] for record in records)),
+        })
+    # Ties go to the cheaper trial
+    return sorted(summary, key=lambda trial: (-trial['accuracy_mean'], trial['seconds']))
+
+
+@instrumented('search')
+def run_search(paths, model_type, output_dir='output', space=None, folds=SEARCH_FOLDS, group_by='auto',
+               cpus=None, trial_threads=1, max_trials=None, seed=42, feature_names=DEFAULT_FEATURES,
+               feature_cache=None, results_path=None):
+    """
+    Grouped K-fold hyperparameter search; returns the trials ranked by CV accuracy
+
+    Windows are grouped by label segment or by capture session (group_by
+    'auto' picks session for several captures) so no group is split
+    across train and test. Features (or the CNN's rows) are computed once
+    and shared read-only with the worker processes through shared memory.
+    The CPU budget runs cpus // trial_threads (trial, fold) tasks at a
+    time, each limited to trial_threads BLAS/OpenMP/TensorFlow threads.
+    Finished folds go to search_results.jsonl, which a rerun resumes from.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cpus = cpus or os.cpu_count() or 1
+    trial_threads = max(1, min(trial_threads, cpus))
+    parallel = max(1, cpus // trial_threads)
+    if group_by == 'auto':
+        group_by = 'session' if len(paths) > 1 else 'segment'
+    
+    data, labels, window_starts, sessions, segments, label_encoder = load_search_data(
+        paths, model_type, feature_names, cpus, feature_cache
+    )
+    groups = sessions if group_by == 'session' else segments
+    fold_of = grouped_folds(labels, groups, folds, seed)
+    
+    context = {
+        'data': [dataset_fingerprint(path) for path in paths],
+        'group_by': group_by,
+        'folds': folds,
+        'seed': seed,
+        'window_size': WINDOW_SIZE,
+        'stride': STRIDE,
+        'features': list(feature_names) if model_type != 'cnn' else None,
+    }
+    trials = [(search_trial_id(model_type, params, context), params)
+              for params in search_trials(space or DEFAULT_SEARCH_SPACES[model_type], max_trials, seed)]
+    
+    results = SearchResults(results_path or os.path.join(output_dir, SEARCH_RESULTS_FILENAME))
+    tasks = [(trial_id, model_type, params, fold) for trial_id, params in trials for fold in range(folds)
+             if not results.done(trial_id, fold)]
+    
+    print(f"\n=== Hyperparameter Search ({model_type}) ===")
+    print(f"{len(labels)} windows in {len(np.unique(groups))} {group_by} groups, {folds}-fold grouped CV")
+    print(f"{len(trials)} trials x {folds} folds: {len(trials) * folds - len(tasks)} already done, "
+          f"{len(tasks)} to run ({parallel} at a time, {trial_threads} thread(s) each)")
+    
+    params_of = dict(trials)
+    completed = 0
+    
+    def record(result):
+        nonlocal completed
+        completed += 1
+        results.add(dict(result, model_type=model_type, params=params_of[result['trial']]))
+        INSTRUMENTATION.count('search_folds', 1)
+        print(f"  [{completed}/{len(tasks)}] trial {result['trial']} fold {result['fold']}: "
+              f"accuracy {result['accuracy']:.4f} ({result['seconds']:.1f} s)")
+    
+    num_classes = len(label_encoder.classes_)
+    try:
+        if parallel == 1 or len(tasks) <= 1:
+            with threadpool_limits(trial_threads):
+                _set_search_state(data, labels, window_starts, fold_of, num_classes, trial_threads)
+                for task in tasks:
+                    record(_search_fold_task(task))
+        else:
+            shm = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+            try:
+                np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data
+                initargs = ((shm.name, data.shape, data.dtype.str), labels, window_starts, fold_of,
+                            num_classes, trial_threads)
+                with multiprocessing.get_context().Pool(min(parallel, len(tasks)), _init_search_worker,
+                                                        initargs) as pool:
+                    for result in pool.imap_unordered(_search_fold_task, tasks):
+                        record(result)
+            finally:
+                shm.close()
+                shm.unlink()
+    finally:
+        results.close()
+    
+    summary = summarize_search(results, trials, folds)
+    print(f"\n{'rank':>4} {'accuracy':>15} {'macro F1':>9} {'seconds':>8}  params")
+    for rank, trial in enumerate(summary[:10], 1):
+        print(f"{rank:>4} {trial['accuracy_mean']:>8.4f} ± {trial['accuracy_std']:.3f} "
+              f"{trial['macro_f1_mean']:>9.4f} {trial['seconds']:>8.1f}  {json.dumps(trial['params'])}")
+    
+    summary_path = os.path.join(output_dir, SEARCH_SUMMARY_FILENAME)
+    with open(summary_path, 'w') as f:
+        json.dump({'model_type': model_type, 'context': context, 'windows': int(len(labels)),
+                   'groups': int(len(np.unique(groups))), 'trials': summary}, f, indent=2)
+    
+    if summary:
+        print(f"\n✓ Best {model_type} parameters: {json.dumps(summary[0]['params'])}")
+    print(f"Search summary saved to: {summary_path}")
+    
+    return summary
+
+
+# ===== CHANNEL SELECTION =====
+#
+# Every window feature is computed per channel and blocks are laid out
+# channel-innermost, so feature column j belongs to channel j % channels.
+
+CHANNEL_SELECTION_FILENAME = 'channel_selection.json'
+CHANNEL_MASK_HEADER = 'channel_mask.h'
+MAX_CHANNEL_ACCURACY_LOSS = 0.01  # Allowed grouped-CV accuracy loss vs all channels (absolute)
+CHANNEL_ELIMINATION_STEP = 0.25  # Fraction of the remaining channels dropped per round
+
+
+def channel_importances(model, num_channels=TOTAL_FEATURES):
+    """
+    Random Forest feature importances summed per channel
+    """
+    importances = model.feature_importances_
+    return np.bincount(np.arange(len(importances)) % num_channels, weights=importances, minlength=num_channels)
+
+
+def channel_feature_columns(num_columns, channel_indices, num_channels=TOTAL_FEATURES):
+    """
+    Feature columns computed from channel_indices (sorted), in layout order
+
+    Selecting them from a full feature matrix gives the features of the
+    channel-masked capture.
+    """
+    return np.flatnonzero(np.isin(np.arange(num_columns) % num_channels, channel_indices))
+
+
+def load_channel_mask(path):
+    """
+    Sorted channel indices of a channel_selection.json written by --select_channels
+    """
+    with open(path, 'r') as f:
+        mask = json.load(f)
+    return channel_indices_of(mask['channels'])
+
+
+def sensor_row_masks(channel_indices):
+    """
+    Per mux column, a bitmask of the sensor rows to read (bit r = row r)
+    """
+    masks = [0] * (NUM_SENSORS // 4)
+    for index in channel_indices:
+        if index < NUM_SENSORS:
+            row, col = divmod(int(index), NUM_SENSORS // 4)
+            masks[col] |= 1 << row
+    return masks
+
+
+def write_channel_mask(output_dir, channel_indices, report):
+    """
+    channel_selection.json for --channel_mask and channel_mask.h for the firmware
+
+    Only a training run records the channels a model uses (model_meta.json),
+    so writing a selection never changes how saved models are served.
+    """
+    names = [CHANNEL_NAMES[i] for i in channel_indices]
+    row_masks = sensor_row_masks(channel_indices)
+    mask = dict(report, channels=names, sensor_row_mask=row_masks,
+                imu_axes=[name for name in names if name in IMU_COLUMNS])
+    with open(os.path.join(output_dir, CHANNEL_SELECTION_FILENAME), 'w') as f:
+        json.dump(mask, f, indent=2)
+    
+    sensors = sum(1 for i in channel_indices if i < NUM_SENSORS)
+    with open(os.path.join(output_dir, CHANNEL_MASK_HEADER), 'w') as f:
+        f.write("// Generated by train_gesture_model.py --select_channels\n")
+        f.write(f"// {sensors} of {NUM_SENSORS} sensors, IMU axes: {', '.join(mask['imu_axes']) or 'none'}\n")
+        f.write(f"// Grouped CV accuracy {report['accuracy']:.4f} (all channels {report['baseline_accuracy']:.4f})\n")
+        f.write("// Bit r of entry c: read row r while the mux selects column c\n")
+        f.write("const uint8_t SENSOR_ROW_MASK[NUM_COLS] = {"
+                + ", ".join(f"0x{m:X}" for m in row_masks) + "};\n")
+    return mask
+
+
+def _channel_cv(features, labels, fold_of, folds, channel_indices, params):
+    """
+    Grouped-CV accuracy of a Random Forest on a channel subset, plus its
+    channel importances (averaged over folds, indexed like channel_indices)
+    """
+    columns = channel_feature_columns(features.shape[1], channel_indices)
+    accuracies = []
+    importances = np.zeros(len(channel_indices))
+    for fold in range(folds):
+        train_idx, test_idx = np.flatnonzero(fold_of != fold), np.flatnonzero(fold_of == fold)
+        X = features[:, columns]
+        model = build_random_forest_model(X[train_idx], labels[train_idx], params, verbose=0)
+        accuracies.append(accuracy_score(labels[test_idx], model.predict(X[test_idx])))
+        importances += channel_importances(model, len(channel_indices)) / folds
+    return float(np.mean(accuracies)), float(np.std(accuracies)), importances
+
+
+@instrumented('select_channels')
+def select_channels(paths, output_dir='output', max_accuracy_loss=MAX_CHANNEL_ACCURACY_LOSS,
+                    step=CHANNEL_ELIMINATION_STEP, min_channels=1, folds=SEARCH_FOLDS, group_by='auto',
+                    feature_names=DEFAULT_FEATURES, workers=1, feature_cache=None, params=None, seed=42):
+    """
+    Smallest channel mask whose grouped-CV accuracy stays within max_accuracy_loss
+
+    Recursive elimination over physical channels (S{row}_{col} sensors and
+    IMU axes): a Random Forest is cross-validated on the current channels,
+    its importances are summed per channel and the least important step
+    fraction is dropped, until accuracy falls more than max_accuracy_loss
+    below the all-channel baseline. Features are extracted once and
+    channels are masked by selecting their feature columns. Writes
+    channel_selection.json and channel_mask.h; returns the mask.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if group_by == 'auto':
+        group_by = 'session' if len(paths) > 1 else 'segment'
+    
+    features, labels, _, sessions, segments, _ = load_search_data(
+        paths, 'random_forest', feature_names, workers, feature_cache
+    )
+    fold_of = grouped_folds(labels, sessions if group_by == 'session' else segments, folds, seed)
+    
+    print(f"\n=== Channel Selection ===")
+    print(f"{len(labels)} windows, {folds}-fold {group_by}-grouped CV, "
+          f"allowed accuracy loss {max_accuracy_loss:.3f}")
+    print(f"{'channels':>8} {'sensors':>8} {'IMU':>4} {'accuracy':>15}")
+    
+    current = np.arange(TOTAL_FEATURES)
+    accuracy, accuracy_std, importances = _channel_cv(features, labels, fold_of, folds, current, params)
+    baseline = accuracy
+    steps = []
+    selected = None
+    all_importances = dict(zip(CHANNEL_NAMES, importances.tolist()))
+    
+    while True:
+        steps.append({'channels': len(current), 'accuracy': accuracy, 'accuracy_std': accuracy_std,
+                      'kept': [CHANNEL_NAMES[i] for i in current]})
+        within = accuracy >= baseline - max_accuracy_loss
+        print(f"{len(current):>8} {int(np.sum(current < NUM_SENSORS)):>8} {int(np.sum(current >= NUM_SENSORS)):>4} "
+              f"{accuracy:>8.4f} ± {accuracy_std:.3f}{'' if within else '  ✗ over budget'}")
+        if not within:
+            break
+        selected = (current, accuracy)
+        if len(current) <= min_channels:
+            break
+        
+        keep = max(min_channels, min(len(current) - 1, int(len(current) * (1 - step))))
+        current = np.sort(current[np.argsort(importances)[::-1][:keep]])
+        accuracy, accuracy_std, importances = _channel_cv(features, labels, fold_of, folds, current, params)
+    
+    channel_indices, accuracy = selected
+    report = {
+        'baseline_accuracy': baseline,
+        'accuracy': accuracy,
+        'max_accuracy_loss': max_accuracy_loss,
+        'group_by': group_by,
+        'folds': folds,
+        'features': list(feature_names),
+        'importances': all_importances,
+        'steps': steps,
+    }
+    mask = write_channel_mask(output_dir, channel_indices, report)
+    
+    sensors = int(np.sum(channel_indices < NUM_SENSORS))
+    mux_columns = sum(1 for m in mask['sensor_row_mask'] if m)
+    print(f"\n✓ Kept {len(channel_indices)} of {TOTAL_FEATURES} channels: accuracy {accuracy:.4f} "
+          f"(all channels {baseline:.4f})")
+    print(f"  ADC reads per frame: {NUM_SENSORS} -> {sensors}, mux columns: {NUM_SENSORS // 4} -> {mux_columns}")
+    print(f"  Feature vector: {features.shape[1]} -> "
+          f"{len(channel_feature_columns(features.shape[1], channel_indices))} values")
+    print(f"Channel selection saved to: {os.path.join(output_dir, CHANNEL_SELECTION_FILENAME)} "
+          f"(firmware: {CHANNEL_MASK_HEADER})")
+    
+    return mask
+
+
 # ===== TFLITE CONVERSION =====
 
-def convert_to_tflite(model, output_path, quantize=True):
+CALIBRATION_WINDOWS = 500  # Training windows used to calibrate int8 ranges
+MAX_ACCURACY_DROP = 0.02  # Allowed float -> int8 test accuracy loss (absolute)
+MAX_LATENCY_MS = 5.0  # Allowed median interpreter latency per window on the host
+
+
+def sample_windows(chunks, num_windows=CALIBRATION_WINDOWS, seed=42):
+    """
+    Uniform random sample of num_windows windows from (windows, labels) chunks
+
+    Every window gets a random key and the smallest keys are kept, so only
+    num_windows windows plus one chunk are ever held in memory.
+    """
+    rng = np.random.default_rng(seed)
+    sample, keys = None, None
+    for windows, _ in chunks:
+        chunk_keys = rng.random(len(windows))
+        if sample is None:
+            sample, keys = np.asarray(windows, dtype=np.float32), chunk_keys
+        else:
+            sample = np.concatenate([sample, windows]).astype(np.float32, copy=False)
+            keys = np.concatenate([keys, chunk_keys])
+        if len(keys) > num_windows:
+            keep = np.sort(np.argpartition(keys, num_windows)[:num_windows])
+            sample, keys = sample[keep], keys[keep]
+    return sample
+
+
+def quantize_tensor(values, details, out=None):
+    """
+    Float values -> the integer type of a quantized TFLite tensor
+
+    Uses the tensor's (scale, zero_point); float tensors are passed through.
+    """
+    dtype = details['dtype']
+    if dtype == np.float32:
+        return values
+    scale, zero_point = details['quantization']
+    info = np.iinfo(dtype)
+    scaled = np.clip(np.rint(np.asarray(values, dtype=np.float32) / scale + zero_point), info.min, info.max)
+    if out is None:
+        return scaled.astype(dtype)
+    out[...] = scaled
+    return out
+
+
+def dequantize_tensor(values, details):
+    """
+    Quantized TFLite output -> float32 (float tensors are passed through)
+    """
+    if details['dtype'] == np.float32:
+        return values
+    scale, zero_point = details['quantization']
+    return (values.astype(np.float32) - zero_point) * scale
+
+
+def tflite_predict(interpreter, windows):
+    """
+    Class probabilities for each window, one invoke per window
+    """
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+    probabilities = []
+    for window in windows:
+        interpreter.set_tensor(input_details['index'], quantize_tensor(window[None], input_details))
+        interpreter.invoke()
+        probabilities.append(dequantize_tensor(interpreter.get_tensor(output_details['index'])[0],
+                                               output_details))
+    return np.array(probabilities)
+
+
+def tflite_latency(interpreter, windows, warmup=10):
+    """
+    Seconds per invoke for each window (input already quantized)
+    """
+    input_details = interpreter.get_input_details()[0]
+    inputs = [quantize_tensor(window[None], input_details) for window in windows]
+    for x in inputs[:warmup]:
+        interpreter.set_tensor(input_details['index'], x)
+        interpreter.invoke()
+    latencies = []
+    for x in inputs:
+        start = time.perf_counter()
+        interpreter.set_tensor(input_details['index'], x)
+        interpreter.invoke()
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def tflite_report(model, float_model, int8_model, test_chunks, latency_windows=200):
+    """
+    Float vs int8 test accuracy, model size and host latency per window
+
+    test_chunks yields (windows, labels); it is consumed once. The float
+    column is the Keras model; latency is measured on both TFLite models.
+    """
+    interpreters = {}
+    for name, content in (('float', float_model), ('int8', int8_model)):
+        interpreters[name] = tf.lite.Interpreter(model_content=content)
+        interpreters[name].allocate_tensors()
+
+    correct = {'float': 0, 'int8': 0}
+    total = 0
+    latency_sample = []
+    for windows, labels in test_chunks:
+        windows = np.asarray(windows, dtype=np.float32)
+        correct['float'] += int((np.argmax(model.predict(windows, verbose=0), axis=1) == labels).sum())
+        correct['int8'] += int((np.argmax(tflite_predict(interpreters['int8'], windows), axis=1) == labels).sum())
+        total += len(labels)
+        if len(latency_sample) < latency_windows:
+            latency_sample.extend(windows[:latency_windows - len(latency_sample)])
+
+    report = {'test_windows': total}
+    for name, content in (('float', float_model), ('int8', int8_model)):
+        latencies = tflite_latency(interpreters[name], latency_sample) * 1000
+        report[name] = {
+            'accuracy': correct[name] / total if total else 0.0,
+            'size_kb': len(content) / 1024,
+            'latency_p50_ms': float(np.percentile(latencies, 50)),
+            'latency_p99_ms': float(np.percentile(latencies, 99)),
+        }
+    report['accuracy_drop'] = report['float']['accuracy'] - report['int8']['accuracy']
+    return report
+
+
+def quantize_int8(model, calibration_windows):
+    """
+    Full-integer (int8 weights, activations, input and output) TFLite flatbuffer
+
+    Activation ranges are calibrated on calibration_windows, a sample of
+    standardized training windows.
+    """
+    if calibration_windows is None or len(calibration_windows) == 0:
+        raise ValueError("Full int8 conversion needs calibration windows (a sample of training data)")
+    
+    def representative_dataset():
+        for window in calibration_windows:
+            yield [np.asarray(window[None], dtype=np.float32)]
+    
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    return converter.convert()
+
+
+@instrumented('convert_tflite')
+def convert_to_tflite(model, output_path, quantize=True, calibration_windows=None, test_chunks=None,
+                      max_accuracy_drop=MAX_ACCURACY_DROP, max_latency_ms=MAX_LATENCY_MS):
     """
     Convert Keras model to TensorFlow Lite format for ESP32 deployment
+
+    With quantize, the model is converted to full integer: weights,
+    activations, input and output are int8, with activation ranges
+    calibrated on calibration_windows (a sample of standardized training
+    windows, see scale_windows).
+    Given test_chunks, the float and int8 models are compared on the test
+    split (tflite_report.json next to output_path) and the conversion
+    raises RuntimeError, without writing the model, if the int8 accuracy
+    drop or median host latency exceeds its budget.
     """
     print("\n=== Converting to TensorFlow Lite ===")
     
-    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    float_model = tf.lite.TFLiteConverter.from_keras_model(model).convert()
+    tflite_model = float_model
     
     if quantize:
-        print("Applying post-training quantization (int8)...")
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
-        converter.target_spec.supported_types = [tf.int8]
+        print(f"Applying full integer quantization (int8, {len(calibration_windows)} calibration windows)...")
+        tflite_model = quantize_int8(model, calibration_windows)
     
-    tflite_model = converter.convert()
+    if quantize and test_chunks is not None:
+        report = tflite_report(model, float_model, tflite_model, test_chunks)
+        report['budgets'] = {'max_accuracy_drop': max_accuracy_drop, 'max_latency_ms': max_latency_ms}
+        print_tflite_report(report)
+        
+        report_path = os.path.join(os.path.dirname(output_path) or '.', 'tflite_report.json')
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        failures = []
+        if report['accuracy_drop'] > max_accuracy_drop:
+            failures.append(f"int8 accuracy drop {report['accuracy_drop']:.3f} > {max_accuracy_drop:.3f}")
+        if max_latency_ms is not None and report['int8']['latency_p50_ms'] > max_latency_ms:
+            failures.append(f"int8 latency {report['int8']['latency_p50_ms']:.3f} ms > {max_latency_ms:.3f} ms")
+        if failures:
+            raise RuntimeError("TFLite budget exceeded: " + "; ".join(failures))
     
     # Save model
     with open(output_path, 'wb') as f:
@@ -359,6 +2425,17 @@ def convert_to_tflite(model, output_path, quantize=True):
     
     # Test inference
     test_tflite_model(tflite_model)
+    return tflite_model
+
+
+def print_tflite_report(report):
+    print(f"\nFloat vs int8 on {report['test_windows']} test windows:")
+    print(f"  {'':<6} {'accuracy':>9} {'size KB':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for name in ('float', 'int8'):
+        row = report[name]
+        print(f"  {name:<6} {row['accuracy']:>9.4f} {row['size_kb']:>9.1f} "
+              f"{row['latency_p50_ms']:>8.3f} {row['latency_p99_ms']:>8.3f}")
+    print(f"  accuracy drop: {report['accuracy_drop']:+.4f}")
 
 
 def test_tflite_model(tflite_model):
@@ -374,56 +2451,522 @@ def test_tflite_model(tflite_model):
     print("\nTFLite Model Details:")
     print(f"Input shape: {input_details[0]['shape']}")
     print(f"Input dtype: {input_details[0]['dtype']}")
+    print(f"Input quantization (scale, zero point): {input_details[0]['quantization']}")
     print(f"Output shape: {output_details[0]['shape']}")
     print(f"Output dtype: {output_details[0]['dtype']}")
+    print(f"Output quantization (scale, zero point): {output_details[0]['quantization']}")
+
+
+# ===== ESP32 MODEL SELECTION =====
+#
+# The firmware classifies a WINDOW_SIZE-frame window every STRIDE samples
+# (500 ms at 50 Hz). A deployable model has to fit in flash and RAM next
+# to the BLE stack and finish well inside that interval.
+
+ESP32_FLASH_BUDGET_KB = 256
+ESP32_RAM_BUDGET_KB = 48  # tensor arena
+ESP32_LATENCY_BUDGET_MS = 100.0
+ESP32_MACS_PER_SECOND = 20e6  # int8 TFLite Micro with ESP-NN, one 240 MHz core; calibrate on a device
+ESP32_CANDIDATE_EPOCHS = 30
+ESP32_REPORT_FILENAME = 'esp32_report.json'
+ARENA_ALIGNMENT = 16
+ARENA_TENSOR_OVERHEAD_BYTES = 64  # TFLite Micro runtime structs per tensor
+ARENA_CHANNEL_OVERHEAD_BYTES = 8  # per-channel requantization multiplier + shift of conv ops
+
+# Name -> CNN_PARAMS overrides; 'baseline' is the default architecture
+ESP32_CANDIDATES = {
+    'baseline': {},
+    'small': {'filters': (16, 32, 64), 'dense_units': (32,), 'dense_dropout': (0.3,)},
+    'tiny': {'filters': (8, 16), 'dense_units': (16,), 'dense_dropout': (0.2,)},
+    'separable': {'separable': True, 'filters': (32, 64, 128), 'dense_units': (64,), 'dense_dropout': (0.3,)},
+    'separable_small': {'separable': True, 'filters': (16, 32, 64), 'dense_units': (32,),
+                        'dense_dropout': (0.3,)},
+    'downsampled': {'downsample': 2, 'filters': (32, 64, 128), 'dense_units': (64,), 'dense_dropout': (0.3,)},
+    'downsampled_separable': {'downsample': 2, 'separable': True, 'filters': (16, 32, 64),
+                              'dense_units': (32,), 'dense_dropout': (0.3,)},
+}
+
+
+def tflite_graph_stats(tflite_model):
+    """
+    MAC count, estimated tensor arena and operator set of a TFLite model
+
+    MACs count convolutions and fully connected layers. The arena is
+    planned like TFLite Micro's greedy planner: activation tensors are
+    placed largest first at the lowest offset that is free for their
+    lifetime; per-tensor and per-channel overheads approximate the
+    runtime's own allocations. The operator set is what the firmware's
+    op resolver has to register.
+    """
+    interpreter = tf.lite.Interpreter(
+        model_content=tflite_model,
+        experimental_op_resolver_type=tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    )
+    interpreter.allocate_tensors()
+    tensors = {details['index']: details for details in interpreter.get_tensor_details()}
+    ops = interpreter._get_ops_details()
+    
+    # Lifetimes (first and last op) of the activation tensors
+    lifetime = {details['index']: [0, 0] for details in interpreter.get_input_details()}
+    macs = 0
+    channels = 0
+    for step, op in enumerate(ops):
+        for index in op['inputs']:
+            if index in lifetime:
+                lifetime[index][1] = step
+        for index in op['outputs']:
+            lifetime.setdefault(index, [step, step])[1] = step
+        
+        output_shape = tensors[op['outputs'][0]]['shape']
+        if op['op_name'] in ('CONV_2D', 'DEPTHWISE_CONV_2D', 'FULLY_CONNECTED'):
+            weights = tensors[op['inputs'][1]]['shape']
+            if op['op_name'] == 'CONV_2D':  # (out, kh, kw, in)
+                macs += int(np.prod(output_shape)) * int(np.prod(weights[1:]))
+            elif op['op_name'] == 'DEPTHWISE_CONV_2D':  # (1, kh, kw, out)
+                macs += int(np.prod(output_shape)) * int(weights[1] * weights[2])
+            else:  # (out, in)
+                macs += int(np.prod(output_shape)) * int(weights[1])
+            if op['op_name'] != 'FULLY_CONNECTED':
+                channels += int(output_shape[-1])
+    for details in interpreter.get_output_details():
+        lifetime.setdefault(details['index'], [len(ops), len(ops)])[1] = len(ops)
+    
+    def nbytes(index):
+        size = int(np.prod(tensors[index]['shape'])) * np.dtype(tensors[index]['dtype']).itemsize
+        return -(-size // ARENA_ALIGNMENT) * ARENA_ALIGNMENT
+    
+    placed = []  # (offset, size, first, last)
+    activation_bytes = 0
+    for index in sorted(lifetime, key=nbytes, reverse=True):
+        size = nbytes(index)
+        first, last = lifetime[index]
+        offset = 0
+        for other_offset, other_size, other_first, other_last in sorted(placed):
+            if other_last < first or last < other_first:
+                continue
+            if offset + size <= other_offset:
+                break
+            offset = max(offset, other_offset + other_size)
+        placed.append((offset, size, first, last))
+        activation_bytes = max(activation_bytes, offset + size)
+    
+    return {
+        'macs': macs,
+        'activation_bytes': activation_bytes,
+        'arena_bytes': (activation_bytes + ARENA_TENSOR_OVERHEAD_BYTES * len(tensors)
+                        + ARENA_CHANNEL_OVERHEAD_BYTES * channels),
+        'ops': sorted({op['op_name'] for op in ops}),
+    }
+
+
+@instrumented('esp32_select')
+def select_esp32_model(paths, output_dir='output', candidates=None, flash_budget_kb=ESP32_FLASH_BUDGET_KB,
+                       ram_budget_kb=ESP32_RAM_BUDGET_KB, latency_budget_ms=ESP32_LATENCY_BUDGET_MS,
+                       macs_per_second=ESP32_MACS_PER_SECOND, epochs=ESP32_CANDIDATE_EPOCHS,
+                       group_by='auto', seed=42):
+    """
+    Train a family of small CNNs and keep the most accurate one that fits the ESP32
+
+    Candidates ({name: CNN_PARAMS overrides}, ESP32_CANDIDATES by default)
+    are trained on a grouped split (one of SEARCH_FOLDS folds held out,
+    see grouped_folds), converted to full-integer TFLite and measured:
+    int8 test accuracy, flash size, estimated tensor arena, MACs and
+    estimated device latency (MACs / macs_per_second). The most accurate
+    candidate within every budget (fewest MACs on ties) is saved like a
+    --tflite CNN run. Returns the report written to esp32_report.json;
+    report['selected'] is None if nothing fits.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    candidates = candidates or ESP32_CANDIDATES
+    if group_by == 'auto':
+        group_by = 'session' if len(paths) > 1 else 'segment'
+    
+    rows, labels, window_starts, sessions, segments, label_encoder = load_search_data(paths, 'cnn')
+    fold_of = grouped_folds(labels, sessions if group_by == 'session' else segments, SEARCH_FOLDS, seed)
+    train_idx, test_idx = np.flatnonzero(fold_of != 0), np.flatnonzero(fold_of == 0)
+    
+    windows = window_view(rows)
+    window_scaler = fit_window_scaler([(windows[window_starts[train_idx]], None)])
+    X_train = scale_windows(windows[window_starts[train_idx]], window_scaler)
+    X_test = scale_windows(windows[window_starts[test_idx]], window_scaler)
+    y_train, y_test = labels[train_idx], labels[test_idx]
+    picked = np.random.default_rng(seed).choice(len(X_train), min(CALIBRATION_WINDOWS, len(X_train)), replace=False)
+    calibration = X_train[np.sort(picked)]
+    
+    budgets = {'flash_kb': flash_budget_kb, 'ram_kb': ram_budget_kb, 'latency_ms': latency_budget_ms,
+               'macs_per_second': macs_per_second}
+    print(f"\n=== ESP32 Model Selection ===")
+    print(f"{len(X_train)} train / {len(X_test)} test windows ({group_by}-grouped holdout), "
+          f"{len(candidates)} candidates, {epochs} epochs each")
+    print(f"Budgets: flash {flash_budget_kb} KB, arena {ram_budget_kb} KB, "
+          f"{latency_budget_ms} ms at {macs_per_second / 1e6:.0f} MMAC/s")
+    
+    results = []
+    best = None
+    for name, params in candidates.items():
+        print(f"  Training {name}...")
+        keras.utils.set_random_seed(seed)
+        model = build_cnn_model(X_train.shape[1:], len(label_encoder.classes_), params, verbose=False)
+        model.fit(X_train, y_train, epochs=epochs, batch_size=32, verbose=0)
+        
+        with contextlib.redirect_stdout(io.StringIO()):  # converter export chatter
+            float_model = tf.lite.TFLiteConverter.from_keras_model(model).convert()
+            int8_model = quantize_int8(model, calibration)
+        quality = tflite_report(model, float_model, int8_model, [(X_test, y_test)])
+        stats = tflite_graph_stats(int8_model)
+        
+        result = {
+            'name': name,
+            'params': dict(params),
+            'parameters': int(model.count_params()),
+            'accuracy': quality['int8']['accuracy'],
+            'float_accuracy': quality['float']['accuracy'],
+            'flash_kb': len(int8_model) / 1024,
+            'arena_kb': stats['arena_bytes'] / 1024,
+            'macs': stats['macs'],
+            'esp32_latency_ms': stats['macs'] / macs_per_second * 1000,
+            'host_latency_ms': quality['int8']['latency_p50_ms'],
+            'ops': stats['ops'],
+        }
+        result['over_budget'] = [budget for budget, over in (
+            ('flash', result['flash_kb'] > flash_budget_kb),
+            ('ram', result['arena_kb'] > ram_budget_kb),
+            ('latency', result['esp32_latency_ms'] > latency_budget_ms),
+        ) if over]
+        results.append(result)
+        
+        if not result['over_budget'] and (best is None or (result['accuracy'], -result['macs'])
+                                          > (best[0]['accuracy'], -best[0]['macs'])):
+            best = (result, model, int8_model)
+        keras.backend.clear_session()
+    
+    print(f"\n{'candidate':<22} {'int8 acc':>8} {'params':>8} {'flash KB':>9} {'arena KB':>9} "
+          f"{'MMACs':>7} {'ESP32 ms':>9} {'host ms':>8}  fits")
+    for result in sorted(results, key=lambda result: -result['accuracy']):
+        fits = '✓' if not result['over_budget'] else '✗ ' + ', '.join(result['over_budget'])
+        print(f"{result['name']:<22} {result['accuracy']:>8.4f} {result['parameters']:>8} "
+              f"{result['flash_kb']:>9.1f} {result['arena_kb']:>9.1f} {result['macs'] / 1e6:>7.2f} "
+              f"{result['esp32_latency_ms']:>9.1f} {result['host_latency_ms']:>8.3f}  {fits}")
+    
+    report = {'budgets': budgets, 'group_by': group_by, 'train_windows': len(X_train),
+              'test_windows': len(X_test), 'candidates': results,
+              'selected': best[0]['name'] if best else None}
+    with open(os.path.join(output_dir, ESP32_REPORT_FILENAME), 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    if best is None:
+        print("\n✗ No candidate fits the ESP32 budgets")
+        return report
+    
+    result, model, int8_model = best
+    model.save(os.path.join(output_dir, 'best_model.h5'))
+    joblib.dump(window_scaler, os.path.join(output_dir, WINDOW_SCALER_FILENAME))
+    save_model_meta(output_dir, 'cnn')
+    joblib.dump(label_encoder, os.path.join(output_dir, 'label_encoder.pkl'))
+    with open(os.path.join(output_dir, 'gesture_model.tflite'), 'wb') as f:
+        f.write(int8_model)
+    print(f"\n✓ Selected {result['name']}: int8 accuracy {result['accuracy']:.4f}, "
+          f"{result['flash_kb']:.1f} KB flash, ~{result['arena_kb']:.1f} KB arena, "
+          f"~{result['esp32_latency_ms']:.1f} ms per inference")
+    print(f"Ops to register in the firmware: {', '.join(result['ops'])}")
+    
+    return report
+
+
+# ===== ONNX EXPORT =====
+
+ONNX_FILENAMES = {
+    'random_forest': 'gesture_model_rf.onnx',
+    'sgd': 'gesture_model_sgd.onnx',
+    'cnn': 'gesture_model_cnn.onnx',
+}
+ONNX_OPSET = 13
+
+
+@instrumented('export_onnx')
+def export_onnx(model, model_type, output_dir, scaler=None):
+    """
+    Export a trained model to ONNX for ONNX Runtime on edge hosts
+
+    Feature models are exported together with their StandardScaler as one
+    graph taking raw window features ('features', float32 (N, num_features))
+    and returning 'probabilities'. The CNN takes standardized windows
+    ('window', float32 (N, WINDOW_SIZE, channels)) like the TFLite
+    model. Needs skl2onnx or tf2onnx respectively; returns the path written.
+    """
+    output_path = os.path.join(output_dir, ONNX_FILENAMES[model_type])
+    print(f"\n=== Exporting to ONNX ({model_type}) ===")
+    
+    if model_type == 'cnn':
+        try:
+            import tf2onnx
+        except ImportError:
+            raise ImportError("CNN ONNX export needs tf2onnx: pip install tf2onnx")
+        
+        # from_function works for both Keras 2 and Keras 3 models
+        signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name='window')]
+        forward = tf.function(lambda window: model(window, training=False), input_signature=signature)
+        tf2onnx.convert.from_function(forward, input_signature=signature, opset=ONNX_OPSET,
+                                      output_path=output_path)
+    else:
+        try:
+            from skl2onnx import convert_sklearn
+            from skl2onnx.common.data_types import FloatTensorType
+        except ImportError:
+            raise ImportError("Random Forest/SGD ONNX export needs skl2onnx: pip install skl2onnx")
+        from sklearn.pipeline import make_pipeline
+        
+        num_features = scaler.n_features_in_
+        onnx_model = convert_sklearn(
+            make_pipeline(scaler, model),
+            initial_types=[('features', FloatTensorType([None, num_features]))],
+            target_opset=ONNX_OPSET,
+            options={id(model): {'zipmap': False}},  # plain probability tensor, not a list of dicts
+        )
+        with open(output_path, 'wb') as f:
+            f.write(onnx_model.SerializeToString())
+    
+    print(f"ONNX model saved to: {output_path} ({os.path.getsize(output_path) / 1024:.1f} KB)")
+    return output_path
 
 
 # ===== MAIN PIPELINE =====
 
 def main():
     parser = argparse.ArgumentParser(description='Train gesture recognition model')
-    parser.add_argument('--data', type=str, required=True, help='Path to CSV data file')
+    parser.add_argument('--data', type=str, required=True,
+                       help='Path to CSV data file, directory of CSVs or glob pattern')
     parser.add_argument('--model_type', type=str, default='random_forest', 
-                       choices=['random_forest', 'cnn'], 
+                       choices=['random_forest', 'cnn', 'sgd'], 
                        help='Model architecture to use')
     parser.add_argument('--output_dir', type=str, default='output', 
                        help='Output directory for models')
     parser.add_argument('--tflite', action='store_true', 
-                       help='Convert to TFLite (CNN only)')
+                       help='Convert to full-integer TFLite (CNN only)')
+    parser.add_argument('--onnx', action='store_true',
+                       help='Also export the model to ONNX (needs skl2onnx or tf2onnx)')
+    parser.add_argument('--calibration_windows', type=int, default=CALIBRATION_WINDOWS,
+                       help='Training windows used to calibrate int8 quantization')
+    parser.add_argument('--max_accuracy_drop', type=float, default=MAX_ACCURACY_DROP,
+                       help='Fail --tflite if int8 test accuracy drops by more than this')
+    parser.add_argument('--max_latency_ms', type=float, default=MAX_LATENCY_MS,
+                       help='Fail --tflite if median int8 latency per window exceeds this')
+    parser.add_argument('--no_cache', action='store_true',
+                       help='Parse the CSV directly instead of using the binary cache')
+    parser.add_argument('--features', type=str, default=','.join(DEFAULT_FEATURES),
+                       help=f"Comma-separated window features for Random Forest "
+                            f"(available: {', '.join(FEATURE_REGISTRY)})")
+    parser.add_argument('--stream', action='store_true',
+                       help='Stream windows in chunks (implied when --data matches several files)')
+    parser.add_argument('--chunk_windows', type=int, default=CHUNK_WINDOWS,
+                       help='Windows per chunk in streaming mode')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Processes for windowing and feature extraction')
+    parser.add_argument('--epochs', type=int, default=CNN_EPOCHS,
+                       help='Maximum CNN training epochs (early stopping may end sooner)')
+    parser.add_argument('--feature_cache_dir', type=str, default=FEATURE_CACHE_DIR,
+                       help='Directory of the persistent window/feature cache')
+    parser.add_argument('--feature_cache_mb', type=float, default=FEATURE_CACHE_MB,
+                       help='Disk budget of the feature cache (LRU eviction)')
+    parser.add_argument('--no_feature_cache', action='store_true',
+                       help='Always recompute windows and features')
+    parser.add_argument('--search', type=str, nargs='?', const='default', default=None,
+                       help='Grouped K-fold hyperparameter search instead of one fit '
+                            '(optionally a JSON file of {parameter: [values]})')
+    parser.add_argument('--folds', type=int, default=SEARCH_FOLDS,
+                       help='Cross-validation folds for --search')
+    parser.add_argument('--group_by', type=str, default='auto', choices=['auto', 'segment', 'session'],
+                       help='Keep each label segment or capture session in one fold '
+                            '(auto: session when there are several captures)')
+    parser.add_argument('--cpus', type=int, default=None,
+                       help='CPU budget of --search (default: all cores)')
+    parser.add_argument('--trial_threads', type=int, default=1,
+                       help='Threads per --search trial; cpus // trial_threads trials run at once')
+    parser.add_argument('--max_trials', type=int, default=None,
+                       help='Evaluate a random subset of the --search grid')
+    parser.add_argument('--esp32_select', action='store_true',
+                       help='Train the ESP32 candidate CNNs and keep the most accurate that fits the budgets')
+    parser.add_argument('--candidates', type=str, default=None,
+                       help='JSON file of {name: CNN parameters} replacing the built-in ESP32 candidates')
+    parser.add_argument('--flash_budget_kb', type=float, default=ESP32_FLASH_BUDGET_KB,
+                       help='Largest int8 model for --esp32_select')
+    parser.add_argument('--ram_budget_kb', type=float, default=ESP32_RAM_BUDGET_KB,
+                       help='Largest estimated tensor arena for --esp32_select')
+    parser.add_argument('--latency_budget_ms', type=float, default=ESP32_LATENCY_BUDGET_MS,
+                       help='Longest estimated ESP32 inference for --esp32_select')
+    parser.add_argument('--esp32_macs_per_second', type=float, default=ESP32_MACS_PER_SECOND,
+                       help='Device int8 throughput used to estimate latency from MACs')
+    parser.add_argument('--candidate_epochs', type=int, default=ESP32_CANDIDATE_EPOCHS,
+                       help='Training epochs per --esp32_select candidate')
+    parser.add_argument('--select_channels', action='store_true',
+                       help='Find the smallest sensor/IMU channel mask within --max_channel_accuracy_loss')
+    parser.add_argument('--max_channel_accuracy_loss', type=float, default=MAX_CHANNEL_ACCURACY_LOSS,
+                       help='Largest grouped-CV accuracy loss (absolute) accepted by --select_channels')
+    parser.add_argument('--channel_mask', type=str, default=None,
+                       help='Train on the channels of a channel_selection.json from --select_channels')
+    parser.add_argument('--profile', action='store_true',
+                       help='Run under cProfile (profile.pstats / profile.txt in output_dir)')
+    parser.add_argument('--trace_memory', action='store_true',
+                       help='Track Python allocations with tracemalloc (added to run_report.json)')
     
     args = parser.parse_args()
+    feature_names = tuple(name.strip() for name in args.features.split(',') if name.strip())
     
-    # Load data
-    X, y, gesture_names = load_and_preprocess_data(args.data)
+    INSTRUMENTATION.start(profile=args.profile, trace_memory=args.trace_memory)
     
-    # Encode labels
-    label_encoder = LabelEncoder()
-    y_encoded = label_encoder.fit_transform(y)
+    data_paths = resolve_data_paths(args.data)
     
-    # Create windows
-    X_windows, y_windows = create_sliding_windows(X, y_encoded)
+    if args.search:
+        space = None
+        if args.search != 'default':
+            with open(args.search, 'r') as f:
+                space = json.load(f)
+        feature_cache = None
+        if not args.no_feature_cache:
+            feature_cache = FeatureCache(args.feature_cache_dir, int(args.feature_cache_mb * 1024 ** 2))
+        
+        run_search(data_paths, args.model_type, args.output_dir, space, args.folds, args.group_by,
+                   args.cpus, args.trial_threads, args.max_trials, feature_names=feature_names,
+                   feature_cache=feature_cache)
+        INSTRUMENTATION.finish(args.output_dir, {'args': vars(args)})
+        return
     
-    # Train/test split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_windows, y_windows, test_size=0.2, random_state=42, stratify=y_windows
-    )
+    if args.esp32_select:
+        candidates = None
+        if args.candidates:
+            with open(args.candidates, 'r') as f:
+                candidates = json.load(f)
+        
+        report = select_esp32_model(data_paths, args.output_dir, candidates, args.flash_budget_kb,
+                                    args.ram_budget_kb, args.latency_budget_ms, args.esp32_macs_per_second,
+                                    args.candidate_epochs, args.group_by)
+        INSTRUMENTATION.finish(args.output_dir, {'args': vars(args)})
+        if report['selected'] is None:
+            sys.exit(1)
+        return
+    
+    if args.select_channels:
+        feature_cache = None
+        if not args.no_feature_cache:
+            feature_cache = FeatureCache(args.feature_cache_dir, int(args.feature_cache_mb * 1024 ** 2))
+        
+        select_channels(data_paths, args.output_dir, args.max_channel_accuracy_loss, folds=args.folds,
+                        group_by=args.group_by, feature_names=feature_names, workers=args.workers,
+                        feature_cache=feature_cache)
+        INSTRUMENTATION.finish(args.output_dir, {'args': vars(args)})
+        return
     
-    print(f"\nTrain set: {len(X_train)} samples")
-    print(f"Test set: {len(X_test)} samples")
+    streaming = args.stream or len(data_paths) > 1
+    channel_indices = None
+    if args.channel_mask:
+        if streaming:
+            parser.error('--channel_mask needs in-memory training (one capture, no --stream)')
+        channel_indices = load_channel_mask(args.channel_mask)
+        print(f"Training on {len(channel_indices)} of {TOTAL_FEATURES} channels ({args.channel_mask})")
     
-    # Train and evaluate
-    model = train_and_evaluate(
-        X_train, X_test, y_train, y_test, 
-        label_encoder, args.model_type, args.output_dir
-    )
+    if streaming:
+        # Out-of-core: labels are encoded over the union of all captures
+        label_encoder = LabelEncoder()
+        label_encoder.fit(collect_label_names(data_paths))
+        
+        model = train_streaming(
+            data_paths, label_encoder, args.model_type, args.output_dir,
+            feature_names, args.chunk_windows, workers=args.workers, epochs=args.epochs
+        )
+    elif args.model_type == 'cnn':
+        # Load data
+        X, y, gesture_names = load_and_preprocess_data(data_paths[0], use_cache=not args.no_cache)
+        # The CNN trains on gathered windows, so the whole capture is read here
+        X = np.asarray(X)
+        if channel_indices is not None:
+            X = np.ascontiguousarray(X[:, channel_indices])
+        
+        # Encode labels
+        label_encoder = LabelEncoder()
+        y_encoded = label_encoder.fit_transform(y)
+        
+        # Create windows (split on window start rows, then gather each split)
+        window_starts, y_windows = compute_window_starts(y_encoded)
+        print(f"Created {len(window_starts)} windows of size {WINDOW_SIZE}")
+        INSTRUMENTATION.count('windows', len(window_starts))
+        
+        # Train/test split
+        starts_train, starts_test, y_train, y_test = train_test_split(
+            window_starts, y_windows, test_size=0.2, random_state=42, stratify=y_windows
+        )
+        
+        print(f"\nTrain set: {len(starts_train)} samples")
+        print(f"Test set: {len(starts_test)} samples")
+        
+        # Train and evaluate
+        windows = window_view(X)
+        model = train_and_evaluate(
+            windows[starts_train], windows[starts_test], y_train, y_test, 
+            label_encoder, args.model_type, args.output_dir, feature_names, channel_indices, args.epochs
+        )
+    else:
+        feature_cache = None
+        if not args.no_feature_cache:
+            feature_cache = FeatureCache(args.feature_cache_dir, int(args.feature_cache_mb * 1024 ** 2))
+        
+        features, y_windows, label_encoder = load_window_features(
+            data_paths[0], feature_names, args.workers, not args.no_cache, feature_cache
+        )
+        if channel_indices is not None:
+            features = features[:, channel_feature_columns(features.shape[1], channel_indices)]
+        
+        # Train/test split
+        train_idx, test_idx = train_test_split(
+            np.arange(len(y_windows)), test_size=0.2, random_state=42, stratify=y_windows
+        )
+        
+        print(f"\nTrain set: {len(train_idx)} samples")
+        print(f"Test set: {len(test_idx)} samples")
+        
+        # Train and evaluate
+        model = train_and_evaluate_features(
+            features[train_idx], features[test_idx], y_windows[train_idx], y_windows[test_idx],
+            label_encoder, args.model_type, args.output_dir, feature_names, channel_indices
+        )
+        
+        if feature_cache is not None:
+            print(f"\n{feature_cache.report()}")
     
     # Save label encoder
     joblib.dump(label_encoder, os.path.join(args.output_dir, 'label_encoder.pkl'))
     
+    if args.onnx:
+        scaler = None if args.model_type == 'cnn' else joblib.load(os.path.join(args.output_dir, 'scaler.pkl'))
+        export_onnx(model, args.model_type, args.output_dir, scaler)
+    
     # Convert to TFLite if requested (CNN only)
     if args.tflite and args.model_type == 'cnn':
+        # Calibration and test windows are standardized like the training data
+        window_scaler = joblib.load(os.path.join(args.output_dir, WINDOW_SCALER_FILENAME))
+        if streaming:
+            calibration = sample_windows(iter_window_chunks(data_paths, label_encoder, 'train',
+                                                            chunk_windows=args.chunk_windows),
+                                         args.calibration_windows)
+            test_chunks = ((scale_windows(chunk, window_scaler), labels) for chunk, labels in
+                           iter_window_chunks(data_paths, label_encoder, 'test', chunk_windows=args.chunk_windows))
+        else:
+            rng = np.random.default_rng(42)
+            picked = rng.choice(starts_train, min(args.calibration_windows, len(starts_train)), replace=False)
+            calibration = windows[np.sort(picked)]
+            test_chunks = [(scale_windows(windows[starts_test], window_scaler), y_test)]
+        calibration = scale_windows(calibration, window_scaler)
+        
         tflite_path = os.path.join(args.output_dir, 'gesture_model.tflite')
-        convert_to_tflite(model, tflite_path, quantize=True)
+        try:
+            convert_to_tflite(model, tflite_path, quantize=True, calibration_windows=calibration,
+                              test_chunks=test_chunks, max_accuracy_drop=args.max_accuracy_drop,
+                              max_latency_ms=args.max_latency_ms)
+        except RuntimeError as e:
+            INSTRUMENTATION.finish(args.output_dir, {'args': vars(args)})
+            print(f"\n✗ {e}")
+            sys.exit(1)
+    
+    INSTRUMENTATION.finish(args.output_dir, {'args': vars(args)})
     
     print("\n✓ Training complete!")
     print(f"Model saved to: {args.output_dir}/")